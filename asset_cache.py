@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+素材缓存（Pillow 和 Playwright 共用）
+1. 字节缓存：本地素材只从磁盘读一次，之后按 (路径, 修改时间, 大小) 直接返回内存里的字节，
+   供 Playwright 的请求拦截（render_service.load_html）使用。
+2. 背景图预处理：按画布尺寸 1245×1660 裁切缩放、去掉无用的 alpha 通道，结果按源文件哈希存到
+   .asset_cache/，之后每次渲染都直接用处理好的版本，不再重复解码 + 缩放。
+3. 字体：字体文件字节和 Pillow 的 ImageFont 对象按 (路径, 字号) 缓存。
+
+用法：
+    import asset_cache
+    data = asset_cache.read_bytes("assets/YouSheBiaoTiHei.ttf")
+    img = asset_cache.background_image("assets/stock_bg.png")       # Pillow：已是 1245×1660 的副本
+    font = asset_cache.truetype("/System/Library/Fonts/PingFang.ttc", 42)
+"""
+
+import os
+import io
+import hashlib
+import threading
+import mimetypes
+
+from PIL import Image, ImageFont, ImageOps
+
+import render_cache
+
+# ================= 配置区 =================
+ASSET_ROOT = "."                       # 允许通过虚拟地址访问的根目录
+MAX_MEMORY_BYTES = 256 * 1024 * 1024   # 内存缓存上限，超过后清掉最早的条目
+CACHE_DIR = os.environ.get("AUTOSHARE_ASSET_CACHE_DIR", ".asset_cache")
+CANVAS_SIZE = (1245, 1660)             # 所有封面的画布尺寸
+CACHE_VERSION = 1                      # 预处理逻辑变化时加 1
+
+# 模板里用 background-size: cover 铺满画布的背景图：浏览器请求时直接返回预处理好的版本
+BACKGROUNDS = {
+    "assets/cover_bg.png",
+    "assets/cover_template_github.png",
+    "assets/stock_bg.png",
+    "assets/cover_stock_bg.png",
+}
+# ==========================================
+
+# mimetypes 在部分系统上不认识字体类型
+_EXTRA_TYPES = {".ttf": "font/ttf", ".otf": "font/otf", ".woff": "font/woff", ".woff2": "font/woff2",
+                ".ttc": "font/collection"}
+
+_lock = threading.Lock()
+_bytes = {}       # 绝对路径 -> (mtime_ns, size, bytes)
+_total = 0
+
+
+def resolve(rel_path, root=ASSET_ROOT):
+    """把虚拟路径映射到 root 下的真实文件；越界（../ 跳出 root）或不存在时返回 None"""
+    root = os.path.abspath(root)
+    path = os.path.abspath(os.path.join(root, rel_path))
+    if path != root and not path.startswith(root + os.sep):
+        return None
+    return path if os.path.isfile(path) else None
+
+
+def content_type(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in _EXTRA_TYPES:
+        return _EXTRA_TYPES[ext]
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+def read_bytes(path):
+    """读取素材（文件修改后自动重新读取）"""
+    global _total
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    cached = _bytes.get(path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    with open(path, "rb") as f:
+        data = f.read()
+    with _lock:
+        old = _bytes.pop(path, None)
+        if old:
+            _total -= len(old[2])
+        while _bytes and _total + len(data) > MAX_MEMORY_BYTES:
+            oldest = next(iter(_bytes))
+            _total -= len(_bytes.pop(oldest)[2])
+        _bytes[path] = (stat.st_mtime_ns, stat.st_size, data)
+        _total += len(data)
+    return data
+
+
+# ---------- 背景图 ----------
+_backgrounds = {}   # 缓存键（源文件哈希 + 尺寸 + fit） -> (PNG 字节, 解码后的 Image)
+_fonts = {}         # (绝对路径, mtime_ns, 字号, index) -> ImageFont
+
+
+def _background_key(src, size, fit):
+    raw = f"v{CACHE_VERSION}:{render_cache.file_hash(src)}:{size[0]}x{size[1]}:{fit}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _prepare_background(src, size, fit):
+    """
+    解码 + 缩放到画布尺寸：
+        fit="cover"   - 与 CSS background-size: cover; background-position: center 一致（等比缩放后居中裁切）
+        fit="stretch" - 与 Image.resize(size) 一致（直接拉伸）
+    完全不透明的图去掉 alpha 通道，解码和合成都更省。
+    """
+    image = Image.open(src)
+    image.load()
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
+    if image.size != tuple(size):
+        if fit == "cover":
+            image = ImageOps.fit(image, size, method=Image.BICUBIC, centering=(0.5, 0.5))
+        else:
+            image = image.resize(size)
+    if image.mode == "RGBA" and image.getchannel("A").getextrema() == (255, 255):
+        image = image.convert("RGB")
+    return image
+
+
+def _load_background(src, size, fit):
+    key = _background_key(src, size, fit)
+    cached = _backgrounds.get(key)
+    if cached:
+        return cached
+
+    path = os.path.join(CACHE_DIR, f"bg_{key}.png")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            data = f.read()
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    else:
+        image = _prepare_background(src, size, fit)
+        buffer = io.BytesIO()
+        # 低压缩级别：编码快，解码速度与高压缩级别几乎一样
+        image.save(buffer, format="PNG", compress_level=1)
+        data = buffer.getvalue()
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    with _lock:
+        _backgrounds[key] = (data, image)
+    return data, image
+
+
+def background_bytes(src, size=CANVAS_SIZE, fit="cover"):
+    """预处理好的背景图 PNG 字节（给浏览器用）"""
+    return _load_background(src, size, fit)[0]
+
+
+def background_image(src, size=CANVAS_SIZE, fit="cover", mode=None):
+    """预处理好的背景图（给 Pillow 用），返回可以随意绘制的副本"""
+    image = _load_background(src, size, fit)[1]
+    if mode and image.mode != mode:
+        return image.convert(mode)
+    return image.copy()
+
+
+def is_background(local_path, root=ASSET_ROOT):
+    rel_path = os.path.relpath(os.path.abspath(local_path), os.path.abspath(root))
+    return rel_path.replace(os.sep, "/") in BACKGROUNDS
+
+
+def read_asset(rel_path):
+    """浏览器请求拦截用：背景图返回预处理版本，其余素材原样返回；找不到返回 None"""
+    local_path = resolve(rel_path)
+    if local_path is None:
+        return None
+    if is_background(local_path):
+        return background_bytes(local_path)
+    return read_bytes(local_path)
+
+
+# ---------- 字体 ----------
+def truetype(path, size, index=0):
+    """缓存的 ImageFont.truetype（同一字体同一字号只加载一次）；字体不存在时抛出 OSError"""
+    abs_path = os.path.abspath(path)
+    key = (abs_path, os.stat(abs_path).st_mtime_ns, size, index)
+    font = _fonts.get(key)
+    if font is None:
+        font = ImageFont.truetype(io.BytesIO(read_bytes(abs_path)), size, index=index)
+        _fonts[key] = font
+    return font
+
+
+def clear():
+    """清空内存缓存（磁盘上预处理好的背景图保留）"""
+    global _total
+    with _lock:
+        _bytes.clear()
+        _backgrounds.clear()
+        _fonts.clear()
+        _total = 0
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+异步渲染后端（playwright.async_api）
+一次运行里互不依赖的输出（封面、每一页长图、每一页美股内容）各开一个页面同时渲染，
+总耗时取决于最慢的一页，而不是所有页之和。
+
+事件循环跑在一个专用的后台线程里，调用方仍然是同步代码：
+    import async_render
+    jobs = [async_render.RenderJob(html, "slide.html", viewport) for html in slides]
+    png_list = async_render.render_many(jobs)     # 按 jobs 的顺序返回 PNG 字节
+
+所有线程共用一个浏览器和一个并发上限（流水线里并行的阶段也一起排队）。
+AUTOSHARE_RENDER_BACKEND=sync 时退回 render_service 的同步页面池逐页渲染；
+异步后端启动或渲染出错时也会自动退回同步方式重试一次。
+"""
+
+import os
+import asyncio
+import threading
+import atexit
+from dataclasses import dataclass
+
+import render_service
+import tracing
+
+# ================= 配置区 =================
+# "async"（默认）- 并发渲染；"sync" - 使用 render_service 的同步页面池逐页渲染
+BACKEND = os.environ.get("AUTOSHARE_RENDER_BACKEND", "async").lower()
+# 同时打开的页面数上限（每个页面独占一个 context）
+CONCURRENCY = int(os.environ.get("AUTOSHARE_RENDER_CONCURRENCY", "4"))
+BATCH_TIMEOUT_S = 300   # 一批任务的总超时
+# ==========================================
+
+
+@dataclass
+class RenderJob:
+    """一次截图：HTML 从内存加载（doc_path 决定相对路径怎么解析），clip 为空时截整个视口"""
+    html: str
+    doc_path: str = "index.html"
+    viewport: dict = None
+    clip: dict = None
+    name: str = "render.screenshot"   # trace 里的 span 名
+    debug_dir: str = None             # AUTOSHARE_DEBUG_HTML=1 时调试 HTML 写到这里
+
+
+class AsyncRenderService:
+    """持有异步 Playwright 和到共用浏览器的连接；只在后台事件循环线程里使用"""
+
+    def __init__(self, concurrency=CONCURRENCY):
+        self._playwright = None
+        self._browser = None
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._start_lock = asyncio.Lock()
+
+    async def _ensure_browser(self):
+        async with self._start_lock:
+            if self._browser and self._browser.is_connected():
+                return self._browser
+            from playwright.async_api import async_playwright
+
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            # 和同步服务连同一个浏览器；探测 / 启动都是阻塞调用，放到线程池里
+            endpoint = await asyncio.get_running_loop().run_in_executor(None, render_service.browser_endpoint)
+            with tracing.span("browser.connect", cat="browser", endpoint=endpoint, backend="async"):
+                self._browser = await self._playwright.chromium.connect_over_cdp(endpoint)
+            return self._browser
+
+    async def render(self, job):
+        viewport = job.viewport or render_service.DEFAULT_VIEWPORT
+        async with self._semaphore:
+            browser = await self._ensure_browser()
+            context = await browser.new_context(viewport=viewport)
+            try:
+                page = await context.new_page()
+                doc_path, html = render_service.prepare_document(job.html, job.doc_path, job.debug_dir)
+                documents = {doc_path: html}
+
+                async def handle(route, request):
+                    status, content_type, body = render_service.respond(documents, request.url)
+                    await route.fulfill(status=status, content_type=content_type, body=body)
+
+                await page.route(f"{render_service.VIRTUAL_ORIGIN}/**", handle)
+                with tracing.span("render.load_html", cat="render", doc=doc_path, backend="async"):
+                    await page.goto(f"{render_service.VIRTUAL_ORIGIN}/{doc_path}")
+                with tracing.span("render.wait_ready", cat="render", backend="async"):
+                    ready = await page.evaluate(render_service.READY_JS, render_service.READY_TIMEOUT_MS)
+                if not ready:
+                    print(f"⚠️ 页面渲染等待超过 {render_service.READY_TIMEOUT_MS}ms，直接截图")
+                with tracing.span(job.name, cat="screenshot", backend="async"):
+                    return await page.screenshot(clip=job.clip)
+            finally:
+                await context.close()
+
+    async def render_all(self, jobs):
+        return await asyncio.gather(*(self.render(job) for job in jobs))
+
+    async def close(self):
+        if self._browser:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+        self._browser = None
+        if self._playwright:
+            try:
+                await self._playwright.stop()
+            except Exception:
+                pass
+        self._playwright = None
+
+
+_lock = threading.Lock()
+_loop = None
+_thread = None
+_service = None
+_fallback = False   # 异步后端出错后置为 True
+
+
+def _get_loop():
+    """懒启动后台事件循环线程和异步渲染服务"""
+    global _loop, _thread, _service
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(target=_loop.run_forever, name="async-render", daemon=True)
+            _thread.start()
+            _service = asyncio.run_coroutine_threadsafe(_create_service(), _loop).result()
+        return _loop
+
+
+async def _create_service():
+    # Semaphore / Lock 要在事件循环里创建
+    return AsyncRenderService()
+
+
+def enabled():
+    return BACKEND == "async" and not _fallback
+
+
+def _render_sync(job):
+    """同步后端：在当前线程的页面池里逐页渲染"""
+    with render_service.acquire_page(job.viewport) as page:
+        render_service.load_html(page, job.html, job.doc_path, debug_dir=job.debug_dir)
+        with tracing.span(job.name, cat="screenshot"):
+            return page.screenshot(clip=job.clip)
+
+
+@tracing.traced("render.batch", cat="render")
+def render_many(jobs):
+    """同步接口：渲染一批互不依赖的页面，按 jobs 的顺序返回 PNG 字节"""
+    jobs = list(jobs)
+    if not jobs:
+        return []
+    if enabled():
+        future = None
+        try:
+            loop = _get_loop()
+            future = asyncio.run_coroutine_threadsafe(_service.render_all(jobs), loop)
+            return future.result(timeout=BATCH_TIMEOUT_S)
+        except Exception as e:
+            global _fallback
+            if future is not None:
+                future.cancel()
+            # 本进程后续批次直接走同步方式，不再反复尝试启动异步后端
+            _fallback = True
+            print(f"⚠️ 异步渲染失败 ({e})，改用同步方式逐页渲染")
+    return [_render_sync(job) for job in jobs]
+
+
+def render_one(html, doc_path="index.html", viewport=None, name="render.screenshot", debug_dir=None):
+    return render_many([RenderJob(html, doc_path, viewport, name=name, debug_dir=debug_dir)])[0]
+
+
+def shutdown():
+    """关闭浏览器并停掉后台事件循环"""
+    global _loop, _thread, _service
+    with _lock:
+        if _loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(_service.close(), _loop).result(timeout=10)
+        except Exception:
+            pass
+        _loop.call_soon_threadsafe(_loop.stop)
+        _thread.join(timeout=5)
+        _loop.close()
+        _loop, _thread, _service = None, None, None
+
+
+atexit.register(shutdown)
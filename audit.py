@@ -1,5 +1,69 @@
 # audit.py - 内容安全审查模块
 
+from collections import deque, namedtuple
+
+import tracing
+
+# 一条违规命中：违规词、所在字段、在该字段文本中的字符偏移
+AuditFinding = namedtuple("AuditFinding", ["word", "field", "offset"])
+
+
+class WordMatcher:
+    """
+    Aho-Corasick 多模式匹配自动机
+    词库编译一次，之后对任意文本只扫描一遍即可找出所有命中（含重叠命中）及其位置，
+    耗时与 文本长度 + 命中数 成正比，与词库大小无关。
+    """
+
+    def __init__(self, words):
+        self.words = tuple(words)
+        self._goto = [{}]      # 节点 -> {字符: 子节点}
+        self._fail = [0]
+        self._output = [()]    # 节点 -> 以该节点结尾的词（含 fail 链上的词）
+        for word in self.words:
+            if word:
+                self._insert(word)
+        self._build_links()
+
+    def _insert(self, word):
+        node = 0
+        for char in word:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            node = nxt
+        if word not in self._output[node]:
+            self._output[node] = self._output[node] + (word,)
+
+    def _build_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                state = self._fail[node]
+                while state and char not in self._goto[state]:
+                    state = self._fail[state]
+                fail = self._goto[state].get(char, 0)
+                self._fail[child] = fail if fail != child else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def finditer(self, text):
+        """单次扫描文本，依次产出 (偏移, 词)"""
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for word in output[node]:
+                yield index - len(word) + 1, word
+
+
 class ContentAuditor:
     """内容安全审查器，用于检查小红书发布内容的合规性"""
 
@@ -12,6 +76,44 @@ class ContentAuditor:
         "千万不要", "切记", "牢记", "记住"
     ]
 
+    # 编译好的自动机，词库变化时才重建
+    _matcher = None
+
+    @classmethod
+    def get_matcher(cls):
+        words = tuple(cls.FORBIDDEN_WORDS)
+        if cls._matcher is None or cls._matcher.words != words:
+            cls._matcher = WordMatcher(words)
+        return cls._matcher
+
+    @staticmethod
+    def find_forbidden_words(content, field=""):
+        """
+        找出内容中的所有违规词命中
+
+        Args:
+            content (str): 需要审查的文本内容
+            field (str): 字段名，写入每条命中记录
+
+        Returns:
+            list: AuditFinding 列表，按偏移排序
+        """
+        if not content or not isinstance(content, str):
+            return []
+        matcher = ContentAuditor.get_matcher()
+        findings = [AuditFinding(word, field, offset) for offset, word in matcher.finditer(content)]
+        findings.sort(key=lambda f: (f.offset, -len(f.word)))
+        return findings
+
+    @staticmethod
+    def format_findings(findings):
+        """把命中记录整理成错误提示（违规词按词库顺序去重）"""
+        hit_words = {f.word for f in findings}
+        found_forbidden_words = [w for w in dict.fromkeys(ContentAuditor.FORBIDDEN_WORDS) if w in hit_words]
+        error_msg = f"🚫 发现违规词汇: {', '.join(found_forbidden_words)}\n"
+        error_msg += "小红书禁止使用绝对化表述，请修改后再发布。"
+        return error_msg
+
     @staticmethod
     def audit_content(content):
         """
@@ -24,21 +126,35 @@ class ContentAuditor:
             tuple: (is_safe: bool, error_message: str)
                    is_safe=True 表示内容安全，is_safe=False 表示发现违规内容
         """
-        if not content or not isinstance(content, str):
-            return True, ""
+        findings = ContentAuditor.find_forbidden_words(content)
+        if findings:
+            return False, ContentAuditor.format_findings(findings)
 
-        found_forbidden_words = []
+        return True, ""
 
-        for word in ContentAuditor.FORBIDDEN_WORDS:
-            if word in content:
-                found_forbidden_words.append(word)
+    # data.py 中需要审查的字段：(字段名, 中文名, 取值函数)
+    DATA_FIELDS = [
+        ("cover_summary", "封面摘要", lambda data: data.cover_data.get("summary", "")),
+        ("article_title", "文章标题", lambda data: data.article_title),
+        ("simple_list_text", "榜单文本", lambda data: data.simple_list_text),
+        ("article_content_formatted", "文章内容", lambda data: data.article_content_formatted),
+    ]
 
-        if found_forbidden_words:
-            error_msg = f"🚫 发现违规词汇: {', '.join(found_forbidden_words)}\n"
-            error_msg += "小红书禁止使用绝对化表述，请修改后再发布。"
-            return False, error_msg
+    @staticmethod
+    @tracing.traced("audit.scan", cat="audit")
+    def scan_data_content():
+        """
+        扫描 data.py 中所有字段，返回全部命中记录
 
-        return True, ""
+        Returns:
+            list: AuditFinding 列表（按字段顺序、偏移排序）
+        """
+        import data
+
+        findings = []
+        for field, _, getter in ContentAuditor.DATA_FIELDS:
+            findings.extend(ContentAuditor.find_forbidden_words(getter(data), field))
+        return findings
 
     @staticmethod
     def audit_data_content():
@@ -46,35 +162,20 @@ class ContentAuditor:
         审查 data.py 中的所有内容
 
         Returns:
-            tuple: (is_safe: bool, error_message: str)
+            tuple: (is_safe: bool, error_message: str, findings: list)
         """
         try:
-            import data
-
-            # 审查封面摘要
-            summary_safe, summary_error = ContentAuditor.audit_content(data.cover_data.get("summary", ""))
-            if not summary_safe:
-                return False, f"封面摘要{summary_error}"
-
-            # 审查文章标题
-            title_safe, title_error = ContentAuditor.audit_content(data.article_title)
-            if not title_safe:
-                return False, f"文章标题{title_error}"
-
-            # 审查简单榜单文本
-            list_safe, list_error = ContentAuditor.audit_content(data.simple_list_text)
-            if not list_safe:
-                return False, f"榜单文本{list_error}"
-
-            # 审查详细文章内容
-            content_safe, content_error = ContentAuditor.audit_content(data.article_content_formatted)
-            if not content_safe:
-                return False, f"文章内容{content_error}"
+            findings = ContentAuditor.scan_data_content()
+        except Exception as e:
+            return False, f"❌ 审查过程中发生错误: {str(e)}", []
 
-            return True, "✅ 内容审查通过，所有内容符合小红书发布规范"
+        # 报错信息以第一个有违规的字段为准
+        for field, label, _ in ContentAuditor.DATA_FIELDS:
+            field_findings = [f for f in findings if f.field == field]
+            if field_findings:
+                return False, f"{label}{ContentAuditor.format_findings(field_findings)}", findings
 
-        except Exception as e:
-            return False, f"❌ 审查过程中发生错误: {str(e)}"
+        return True, "✅ 内容审查通过，所有内容符合小红书发布规范", findings
 
 def perform_content_audit():
     """
@@ -86,13 +187,15 @@ def perform_content_audit():
     print("🔍 正在进行内容安全审查...")
 
     auditor = ContentAuditor()
-    is_safe, message = auditor.audit_data_content()
+    is_safe, message, findings = auditor.audit_data_content()
 
     if is_safe:
         print(message)
         return True
     else:
         print(message)
+        for finding in findings:
+            print(f"   - 「{finding.word}」 字段 {finding.field} 第 {finding.offset} 个字符")
         print("🛑 为保护账号安全，程序已停止。请修改违规内容后重试。")
         raise SystemExit(1)
 
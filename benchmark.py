@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+性能基准测试
+用合成数据（synthetic_payloads.py）在 20 ~ 5000 条的规模下分别测量解析、分页和渲染，
+结果存成 JSON 基线；对比模式下超过阈值的变慢会被标记出来（退出码 1，可接进 CI）。
+
+用法：
+    python benchmark.py run                      # 运行并保存到 benchmark_baseline.json
+    python benchmark.py run --browser            # 额外测量浏览器渲染（较慢，默认只跑到 500 条）
+    python benchmark.py compare                  # 重新运行并与基线对比
+    python benchmark.py diff old.json new.json   # 对比两份已保存的结果
+"""
+
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import contextlib
+from datetime import datetime
+
+import synthetic_payloads as sp
+
+# ================= 配置区 =================
+BASELINE_FILE = "benchmark_baseline.json"
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.15    # 变慢超过 15% 视为回归
+COMPARE_METRIC = "min_ms"   # 对比用最快一次：受系统抖动影响最小（与 timeit 的建议一致）
+MIN_SIGNIFICANT_MS = 1.0    # 两次结果都低于这个值时不做比较（噪声）
+SLOW_CASE_SECONDS = 2.0     # 单次超过这个耗时的用例只跑一次
+BROWSER_MAX_SIZE = 500      # 浏览器用例默认的最大规模
+GROUPS = ["parse", "pagination", "render"]
+# ==========================================
+
+
+@contextlib.contextmanager
+def _quiet():
+    """被测函数里有大量 print，计时时丢掉输出"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+# ---------- 用例：每个用例接收规模，返回一个无参的计时函数 ----------
+def case_github_parse(size):
+    import main_github
+    md = sp.github_report_markdown(size)
+    return lambda: main_github.parse_mcp_text(md)
+
+
+def case_stock_format(size):
+    import fetch_stock_data
+    payload = sp.stock_news_payload(size)
+    return lambda: fetch_stock_data.format_stock_data(payload)
+
+
+def case_ph_blocks(size):
+    import gen_article
+    md = sp.ph_article_markdown(size)
+    return lambda: gen_article.build_product_blocks(md)
+
+
+def _ph_metrics(size):
+    """不启动浏览器时用的合成块几何：块高 150~450px，块间距 60px"""
+    rng = random.Random(sp.DEFAULT_SEED)
+    tops, bottoms, y = [], [], 0.0
+    for _ in range(size):
+        tops.append(y)
+        y += rng.uniform(150, 450)
+        bottoms.append(y)
+        y += 60
+    return {"tops": tops, "bottoms": bottoms, "padding": 80}
+
+
+def case_ph_page_breaks(size):
+    import gen_article
+    metrics = _ph_metrics(size)
+    return lambda: gen_article.compute_page_breaks(metrics, size)
+
+
+def _stock_data(size):
+    import fetch_stock_data
+    with _quiet():
+        return fetch_stock_data.format_stock_data(sp.stock_news_payload(size))["snapshot"].stock_data
+
+
+def case_stock_calculate_pages(size):
+    import gen_stock_pw
+    stock_data = _stock_data(size)
+    return lambda: gen_stock_pw.calculate_pages(stock_data, gen_stock_pw.LAYOUT_STANDARD)
+
+
+def case_stock_solve_pages(size):
+    import gen_stock_pw
+    stock_data = _stock_data(size)
+    return lambda: gen_stock_pw.solve_pages(stock_data)
+
+
+def case_stock_render_html(size):
+    import gen_stock_pw
+    pages = gen_stock_pw.solve_pages(_stock_data(size))
+    data = {"pages": pages, "layout": pages[0]["layout"]}
+    return lambda: gen_stock_pw.render_html("stock_article.html", data)
+
+
+def case_stock_pil_pages(size):
+    import gen_stock_pw
+    import gen_stock_pil
+    pages = gen_stock_pw.solve_pages(_stock_data(size))
+    out_dir = tempfile.mkdtemp(prefix="bench_pil_")
+    paths = [f"{out_dir}/article_p{i + 1}.png" for i in range(len(pages))]
+
+    def run():
+        gen_stock_pil.render_pages(pages, pages[0]["layout"], paths)
+    run.cleanup = lambda: shutil.rmtree(out_dir, ignore_errors=True)
+    return run
+
+
+def case_ph_slides_browser(size):
+    import render_cache
+    import gen_article
+    render_cache.ENABLED = False
+    md = sp.ph_article_markdown(size)
+    out_dir = tempfile.mkdtemp(prefix="bench_slides_")
+
+    def run():
+        gen_article.create_smart_slides("benchmark", md, output_dir=out_dir)
+    run.cleanup = lambda: shutil.rmtree(out_dir, ignore_errors=True)
+    return run
+
+
+def case_stock_capture_browser(size):
+    import gen_stock_pw
+    from render_service import acquire_page, load_html
+    pages = gen_stock_pw.solve_pages(_stock_data(size))
+    html = gen_stock_pw.render_html("stock_article.html", {"pages": pages, "layout": pages[0]["layout"]})
+    out_dir = tempfile.mkdtemp(prefix="bench_stock_")
+
+    def run():
+        with acquire_page(gen_stock_pw.VIEWPORT) as page:
+            load_html(page, html, f"{gen_stock_pw.OUTPUT_DIR}/bench_article.html")
+            saved = gen_stock_pw.capture_pages_single(page, len(pages), out_dir)
+            if saved is None:
+                gen_stock_pw.capture_pages_per_element(page, out_dir)
+
+    run.cleanup = lambda: shutil.rmtree(out_dir, ignore_errors=True)
+    return run
+
+
+# (分组, 名称, 用例, 是否需要浏览器)
+CASES = [
+    ("parse", "github.parse_mcp_text", case_github_parse, False),
+    ("parse", "stock.format_stock_data", case_stock_format, False),
+    ("parse", "ph.build_product_blocks", case_ph_blocks, False),
+    ("pagination", "ph.compute_page_breaks", case_ph_page_breaks, False),
+    ("pagination", "stock.calculate_pages", case_stock_calculate_pages, False),
+    ("pagination", "stock.solve_pages", case_stock_solve_pages, False),
+    ("render", "stock.render_html", case_stock_render_html, False),
+    ("render", "stock.pil_render_pages", case_stock_pil_pages, False),
+    ("render", "ph.create_smart_slides", case_ph_slides_browser, True),
+    ("render", "stock.capture_pages", case_stock_capture_browser, True),
+]
+
+
+# ---------- 运行 ----------
+def time_case(func, repeat):
+    """先跑一次预热并估时，慢用例只计这一次；返回每次耗时（毫秒）"""
+    with _quiet():
+        start = time.perf_counter()
+        func()
+        first = (time.perf_counter() - start) * 1000
+        if first / 1000 > SLOW_CASE_SECONDS:
+            return [first]
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def run_benchmarks(sizes, groups=GROUPS, browser=False, repeat=DEFAULT_REPEAT,
+                   browser_max_size=BROWSER_MAX_SIZE):
+    results = {}
+    for group, name, factory, needs_browser in CASES:
+        if group not in groups or (needs_browser and not browser):
+            continue
+        for size in sizes:
+            if needs_browser and size > browser_max_size:
+                continue
+            key = f"{group}/{name}@{size}"
+            with _quiet():
+                func = factory(size)
+            try:
+                samples = time_case(func, repeat)
+            except Exception as e:
+                print(f"❌ {key:<45} 失败: {e}")
+                continue
+            finally:
+                if hasattr(func, "cleanup"):
+                    func.cleanup()
+            results[key] = {
+                "group": group,
+                "name": name,
+                "size": size,
+                "median_ms": round(statistics.median(samples), 3),
+                "min_ms": round(min(samples), 3),
+                "runs": len(samples),
+            }
+            print(f"⏱️  {key:<45} 中位数 {results[key]['median_ms']:>10.3f}ms  最快 {results[key]['min_ms']:>10.3f}ms")
+
+    if browser:
+        import render_service
+        render_service.shutdown()
+
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def save_results(report, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print(f"💾 结果已保存：{path}")
+
+
+def load_results(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """按 COMPARE_METRIC 对比，返回回归列表 [(key, 基线ms, 当前ms, 比例), ...]"""
+    regressions = []
+    print(f"\n{'用例':<45} {'基线':>10} {'当前':>10} {'变化':>8}")
+    for key, now in sorted(current["results"].items()):
+        base = baseline["results"].get(key)
+        if base is None:
+            print(f"{key:<45} {'-':>10} {now[COMPARE_METRIC]:>9.2f}ms {'新增':>8}")
+            continue
+        before, after = base[COMPARE_METRIC], now[COMPARE_METRIC]
+        ratio = after / before if before > 0 else float("inf")
+        flag = ""
+        if max(before, after) >= MIN_SIGNIFICANT_MS:
+            if ratio > 1 + threshold:
+                flag = " 🔴"
+                regressions.append((key, before, after, ratio))
+            elif ratio < 1 - threshold:
+                flag = " 🟢"
+        print(f"{key:<45} {before:>9.2f}ms {after:>9.2f}ms {(ratio - 1) * 100:>+7.1f}%{flag}")
+
+    if regressions:
+        print(f"\n🔴 {len(regressions)} 个用例变慢超过 {threshold * 100:.0f}%：")
+        for key, before, after, ratio in regressions:
+            print(f"   - {key}: {before:.2f}ms → {after:.2f}ms (×{ratio:.2f})")
+    else:
+        print(f"\n✅ 没有超过 {threshold * 100:.0f}% 的性能回归")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AutoShare 性能基准测试")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_run_options(p):
+        p.add_argument("--sizes", default=",".join(map(str, sp.BENCH_SIZES)),
+                       help="逗号分隔的数据规模，默认 %(default)s")
+        p.add_argument("--only", default=",".join(GROUPS), help="只运行这些分组：parse,pagination,render")
+        p.add_argument("--browser", action="store_true", help="包含需要浏览器的渲染用例")
+        p.add_argument("--browser-max-size", type=int, default=BROWSER_MAX_SIZE)
+        p.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+
+    run_parser = sub.add_parser("run", help="运行并保存结果")
+    add_run_options(run_parser)
+    run_parser.add_argument("--output", default=BASELINE_FILE)
+
+    compare_parser = sub.add_parser("compare", help="运行并与基线对比")
+    add_run_options(compare_parser)
+    compare_parser.add_argument("--baseline", default=BASELINE_FILE)
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    compare_parser.add_argument("--output", help="同时保存本次结果")
+
+    diff_parser = sub.add_parser("diff", help="对比两份已保存的结果")
+    diff_parser.add_argument("baseline")
+    diff_parser.add_argument("current")
+    diff_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "diff":
+        regressions = compare_results(load_results(args.baseline), load_results(args.current), args.threshold)
+        return 1 if regressions else 0
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    groups = [g.strip() for g in args.only.split(",") if g.strip()]
+    report = run_benchmarks(sizes, groups, args.browser, args.repeat, args.browser_max_size)
+
+    if args.command == "run":
+        save_results(report, args.output)
+        return 0
+
+    if args.output:
+        save_results(report, args.output)
+    regressions = compare_results(load_results(args.baseline), report, args.threshold)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
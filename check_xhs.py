@@ -1,7 +1,9 @@
+import os
 import requests
 import json
 
-XHS_MCP_URL = "http://localhost:18060/mcp"
+# 可用 AUTOSHARE_XHS_MCP_URL 指向其他服务器，例如本地替身 mock_mcp_server.py
+XHS_MCP_URL = os.environ.get("AUTOSHARE_XHS_MCP_URL", "http://localhost:18060/mcp")
 
 print("🔍 正在检查小红书发布工具的详细参数...")
 
@@ -1,8 +1,10 @@
 import requests
 import json
 
-# 你的 MCP 服务器地址
-url = "https://phmcpserver-widgetinp950-8gga8iii.leapcell.dev/mcp"
+from mcp_client import MCP_URL
+
+# 你的 MCP 服务器地址（可用 AUTOSHARE_MCP_URL 覆盖）
+url = MCP_URL
 
 print("🔍 正在询问服务器有哪些工具 (tools/list)...")
 
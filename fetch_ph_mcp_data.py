@@ -6,42 +6,17 @@
 
 import json
 import datetime
-import urllib.request
 import sys
 
+from mcp_client import get_client
+
 def call_ph_mcp_server():
     """调用 ph-mcp-server 的 get_latest_products 工具"""
     print("📡 正在调用 ph-mcp-server...")
 
     try:
-        # 构建 MCP JSON-RPC 请求
-        mcp_request = {
-            'jsonrpc': '2.0',
-            'id': 1,
-            'method': 'tools/call',
-            'params': {
-                'name': 'get_latest_products',
-                'arguments': {}
-            }
-        }
-
-        # 发送请求到 ph-mcp-server
-        req = urllib.request.Request(
-            'https://phmcpserver-widgetinp950-8gga8iii.leapcell.dev/mcp',
-            data=json.dumps(mcp_request).encode('utf-8'),
-            headers={'Content-Type': 'application/json'}
-        )
-
-        with urllib.request.urlopen(req) as response:
-            result = json.loads(response.read().decode())
-
-        if 'result' not in result or 'content' not in result['result']:
-            print("❌ ph-mcp-server 返回数据格式错误")
-            return None
-
-        # 解析返回的 JSON 字符串
-        content_text = result['result']['content'][0]['text']
-        api_result = json.loads(content_text)
+        # 通过共享 MCP 客户端调用（带超时、重试和熔断），返回的文本按 JSON 解析
+        api_result = get_client().call_tool_json('get_latest_products')
 
         print("✅ 成功调用 ph-mcp-server API")
         print(f"📅 数据日期: {api_result.get('date')}")
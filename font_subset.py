@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+按需字体子集化
+封面 / 长图实际只用到几十个字，却每次都要加载完整的 YouSheBiaoTiHei（1.4MB）或系统 CJK 字体（几十 MB）。
+这里收集每次渲染真正用到的字符，用 fontTools 切出只包含这些字形的小字体：
+1. 浏览器：load_html 前把 HTML 里 @font-face 引用的本地字体换成子集（有 brotli 时输出 WOFF2，否则 TTF），
+   子集通过虚拟地址 /_font_subset/<文件名> 从内存返回。
+2. Pillow：truetype(path, size, text) 只加载文本用到的字形。
+子集按 (字体文件哈希, 字符集合) 缓存到 .asset_cache/fonts/，同样的文字只切一次。
+没有安装 fontTools（可选依赖）或切子集失败时，自动退回完整字体，渲染结果不变。
+
+用法：
+    import font_subset
+    html = font_subset.subset_html(html, "stock_output/cover.html")
+    font = font_subset.truetype("assets/YouSheBiaoTiHei.ttf", 38, "截止 12月04日 收盘")
+"""
+
+import os
+import re
+import io
+import hashlib
+import threading
+import posixpath
+from html import unescape
+from html.parser import HTMLParser
+
+import asset_cache
+import render_cache
+import tracing
+
+try:
+    from fontTools import subset as ft_subset
+    from fontTools.ttLib import TTFont
+except ImportError:
+    ft_subset = None
+
+try:
+    import brotli  # noqa: F401  fontTools 输出 WOFF2 需要 brotli
+    WOFF2_AVAILABLE = True
+except ImportError:
+    WOFF2_AVAILABLE = False
+
+# ================= 配置区 =================
+# 设为 off 关闭子集化，直接使用完整字体
+ENABLED = os.environ.get("AUTOSHARE_FONT_SUBSET", "on").lower() != "off"
+CACHE_DIR = os.path.join(asset_cache.CACHE_DIR, "fonts")
+URL_PREFIX = "_font_subset/"      # 浏览器请求子集字体用的虚拟路径
+MAX_CODEPOINTS = 4000             # 字符数超过这个值时子集化不划算，直接用完整字体
+MAX_MEMORY_ENTRIES = 128
+CACHE_VERSION = 1                 # 子集化参数变化时加 1
+
+# FreeType 自动 hinting 用来测量对齐区域（blue zones）的参考字（见 FreeType afblue.dat）。
+# 子集里缺了这些字，hinting 结果会变，字形出现 1px 级的偏移；每个子集都带上，保证和完整字体逐像素一致。
+HINTING_REFERENCE = (
+    "THEZOCQSHEZLOCUSfijkdbhuxzroescpqgjy"
+    "他们你來們到和地对對就席我时時會来為能舰說说这這齊军同已愿既星是景民照现現理用置要軍那配里開雷露面顾"
+    "个为人他以们你來個們到和大对對就我时時有来為要說说主些因它想意理生當看着置者自著裡过还进進過道還里面"
+    "些们你來們到和地她将將就年得情最样樣理能說说这這通即吗吧听呢品响嗎師師收断斷明眼間间际陈限除陳随際隨"
+    "事前學将將情想或政斯新样樣民沒没然特现現球第經谁起例別别制动動吗嗎增指明朝期构物确种調调費费那都間间"
+)
+# ==========================================
+
+_lock = threading.Lock()
+_subsets = {}      # 文件名 -> 字体字节
+_failed = set()    # 切子集失败过的字体（不再重试，直接用完整字体）
+
+_FONT_FACE_RE = re.compile(r"@font-face\s*\{[^}]*\}", re.IGNORECASE)
+_SRC_RE = re.compile(r"src\s*:[^;}]*;?", re.IGNORECASE)
+_URL_RE = re.compile(r"url\(\s*(['\"]?)([^'\")]+)\1\s*\)", re.IGNORECASE)
+_REFERENCE_CODEPOINTS = {ord(c) for c in HINTING_REFERENCE}
+
+
+def available():
+    return ENABLED and ft_subset is not None
+
+
+# ---------- 收集字符 ----------
+class _TextCollector(HTMLParser):
+    """收集 HTML 中会显示出来的文字（跳过 <style> / <script>）"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.chars = set()
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("style", "script"):
+            self._skip += 1
+
+    def handle_endtag(self, tag):
+        if tag in ("style", "script") and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.chars.update(data)
+
+
+def collect_codepoints(text):
+    """文本里用到的码位（排序后的列表）；总是带上空格和 hinting 参考字"""
+    codepoints = {ord(c) for c in text if not c.isspace() or c == " "}
+    codepoints.add(0x20)
+    codepoints.update(_REFERENCE_CODEPOINTS)
+    return sorted(codepoints)
+
+
+def html_text(html):
+    collector = _TextCollector()
+    collector.feed(html)
+    collector.close()
+    return "".join(collector.chars)
+
+
+# ---------- 切子集 ----------
+def _subset_name(font_path, codepoints, flavor, index):
+    ext = "woff2" if flavor == "woff2" else "ttf"
+    raw = f"v{CACHE_VERSION}:{render_cache.file_hash(font_path)}:{index}:{flavor}:" + ",".join(map(str, codepoints))
+    digest = hashlib.sha256(raw.encode()).hexdigest()[:24]
+    stem = os.path.splitext(os.path.basename(font_path))[0]
+    return f"{stem}-{digest}.{ext}"
+
+
+def _build_subset(font_path, codepoints, flavor, index):
+    options = ft_subset.Options()
+    options.flavor = flavor
+    options.layout_features = ["*"]   # 保留连字、竖排等排版特性，和完整字体的效果一致
+    options.name_IDs = ["*"]
+    options.notdef_outline = True
+    font = TTFont(font_path, fontNumber=index, lazy=True)
+    subsetter = ft_subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    buffer = io.BytesIO()
+    ft_subset.save_font(font, buffer, options)
+    font.close()
+    return buffer.getvalue()
+
+
+def subset_file(font_path, text, flavor=None, index=0):
+    """
+    切出只包含 text 中字符的子集，返回 (文件名, 磁盘路径)；
+    不可用、字符太多或失败时返回 None（调用方使用完整字体）。
+    flavor：None 为 TTF，"woff2" 为 WOFF2（需要 brotli）。
+    """
+    if not available() or font_path in _failed:
+        return None
+    codepoints = collect_codepoints(text)
+    if len(codepoints) > MAX_CODEPOINTS + len(_REFERENCE_CODEPOINTS):
+        return None
+
+    name = _subset_name(font_path, codepoints, flavor, index)
+    path = os.path.join(CACHE_DIR, name)
+    if name in _subsets or os.path.exists(path):
+        return name, path
+
+    try:
+        with tracing.span("font.subset", cat="render", font=os.path.basename(font_path), chars=len(codepoints)):
+            data = _build_subset(font_path, codepoints, flavor, index)
+    except Exception as e:
+        print(f"⚠️ 字体子集化失败，使用完整字体 {font_path}: {e}")
+        _failed.add(font_path)
+        return None
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    _remember(name, data)
+    return name, path
+
+
+def _remember(name, data):
+    with _lock:
+        while len(_subsets) >= MAX_MEMORY_ENTRIES:
+            _subsets.pop(next(iter(_subsets)))
+        _subsets[name] = data
+
+
+def read_subset(name):
+    """浏览器请求拦截用：按文件名返回子集字体字节，找不到返回 None"""
+    data = _subsets.get(name)
+    if data is not None:
+        return data
+    if os.path.basename(name) != name:
+        return None
+    path = os.path.join(CACHE_DIR, name)
+    if not os.path.isfile(path):
+        return None
+    with open(path, "rb") as f:
+        data = f.read()
+    _remember(name, data)
+    return data
+
+
+# ---------- 浏览器 ----------
+def _local_font(url, doc_path):
+    """@font-face 里的相对地址 -> 项目内的字体文件；远程 / data: 地址返回 None"""
+    if re.match(r"^[a-z][a-z0-9+.-]*:", url, re.IGNORECASE):
+        return None
+    if url.startswith("/"):
+        rel_path = url.lstrip("/")
+    else:
+        rel_path = posixpath.normpath(posixpath.join(posixpath.dirname(doc_path), url))
+    return asset_cache.resolve(rel_path)
+
+
+def subset_html(html, doc_path="index.html"):
+    """
+    把 HTML 中 @font-face 引用的本地字体换成只包含页面文字的子集。
+    按整页文字切子集（不区分哪些元素用了哪个字体），结果是实际用字的超集，显示效果不变。
+    """
+    if not available() or "@font-face" not in html:
+        return html
+    text = None
+    flavor = "woff2" if WOFF2_AVAILABLE else None
+    css_format = "woff2" if flavor == "woff2" else "truetype"
+
+    def replace_face(match):
+        nonlocal text
+        block = match.group(0)
+        src = _SRC_RE.search(block)
+        url = _URL_RE.search(src.group(0)) if src else None
+        font_path = _local_font(unescape(url.group(2)), doc_path) if url else None
+        if font_path is None:
+            return block
+        if text is None:
+            text = html_text(html)
+        result = subset_file(font_path, text, flavor)
+        if result is None:
+            return block
+        new_src = f"src: url('/{URL_PREFIX}{result[0]}') format('{css_format}');"
+        return block[:src.start()] + new_src + block[src.end():]
+
+    return _FONT_FACE_RE.sub(replace_face, html)
+
+
+# ---------- Pillow ----------
+def truetype(path, size, text, index=0):
+    """只包含 text 字形的 ImageFont；子集不可用时退回 asset_cache.truetype 加载完整字体"""
+    result = subset_file(path, text, None, index)
+    if result is None:
+        return asset_cache.truetype(path, size, index)
+    return asset_cache.truetype(result[1], size)
+
+
+def clear():
+    """清空内存缓存（磁盘上的子集文件保留）"""
+    with _lock:
+        _subsets.clear()
+        _failed.clear()
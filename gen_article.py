@@ -1,8 +1,11 @@
 import os
 import markdown
 import textwrap
-from jinja2 import Template
-from playwright.sync_api import sync_playwright
+import template_registry
+from render_service import acquire_page, wait_until_ready
+import async_render
+import render_cache
+import tracing
 
 # ==================== 尺寸配置：1245 × 1660 ====================
 PAGE_WIDTH = 1245
@@ -16,84 +19,222 @@ MARGIN_BOTTOM = 50       # 底部边距（安全区域）
 # 分页高度限制（实际可用高度）
 MAX_PAGE_HEIGHT_FIRST = PAGE_HEIGHT - MARGIN_TOP_FIRST - MARGIN_BOTTOM   # 1385
 MAX_PAGE_HEIGHT_OTHERS = PAGE_HEIGHT - MARGIN_TOP_OTHERS - MARGIN_BOTTOM # 1505
+
+# 分页模式：
+#   "single_pass" - 所有 product-block 一次性排版，一次 evaluate 读回全部高度，在 Python 里算分页（默认）
+#   "trial"       - 旧逻辑：每加一个产品就整页重排一次测量高度（保留作兜底/对照）
+PAGINATION_MODE = "single_pass"
 # ================================================================
 
+SLIDE_VIEWPORT = {'width': PAGE_WIDTH, 'height': PAGE_HEIGHT}
+MEASURE_VIEWPORT = {'width': PAGE_WIDTH, 'height': 3000}
+
+# 一次性读回所有块的几何信息（块的上下边界 + 容器高度）
+MEASURE_BLOCKS_JS = """
+() => {
+    const container = document.querySelector('.container');
+    const blocks = Array.from(container.querySelectorAll('.product-block'));
+    const rects = blocks.map(b => b.getBoundingClientRect());
+    return {
+        tops: rects.map(r => r.top),
+        bottoms: rects.map(r => r.bottom),
+        container_height: container.getBoundingClientRect().height
+    };
+}
+"""
+
+@tracing.traced("article.get_html_height", cat="layout")
 def get_html_height(page, html_content, template_content, is_first_page):
     """计算 HTML 内容的高度"""
-    template = Template(template_content)
+    template = template_registry.from_string(template_content)
     full_html = template.render(content_html=html_content, is_first_page=is_first_page)
     page.set_content(full_html, wait_until="domcontentloaded")
+    wait_until_ready(page)
     height = page.evaluate("document.querySelector('.container').scrollHeight")
     # 加上顶部边距
     margin_top = MARGIN_TOP_FIRST if is_first_page else MARGIN_TOP_OTHERS
     return height + margin_top
 
-def render_final_image(page, template_content, html_content, filename, is_first_page):
-    """渲染最终图片"""
-    template = Template(template_content)
-    final_html = template.render(content_html=html_content, is_first_page=is_first_page)
-    current_dir = os.getcwd()
-    temp_path = os.path.join(current_dir, "temp_render.html")
-    with open(temp_path, "w", encoding="utf-8") as f:
-        f.write(final_html)
-    page.goto(f"file://{temp_path}")
-    # 设置视口为 1245 × 1660
-    page.set_viewport_size({'width': PAGE_WIDTH, 'height': PAGE_HEIGHT})
-    page.screenshot(path=filename)
-    if os.path.exists(temp_path):
-        os.remove(temp_path)
-    print(f"✅ 已生成：{filename} (尺寸: {PAGE_WIDTH}×{PAGE_HEIGHT})")
-
-def create_smart_slides(title, raw_content):
-    """创建智能分页的幻灯片"""
-    print(f"正在进行智能排版计算（尺寸：{PAGE_WIDTH}×{PAGE_HEIGHT}）...")
-    with open('article_template.html', 'r', encoding='utf-8') as f:
-        template_content = f.read()
+@tracing.traced("article.measure_blocks", cat="layout")
+def measure_blocks(page, product_html_list, template_content):
+    """
+    单次排版测量：把所有产品块用 <hr> 拼进同一个文档，只 set_content 一次，
+    一次 evaluate 读回每个块的上下边界。
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch()
-        # 使用足够高的 viewport 用于计算高度
-        page = browser.new_page(viewport={'width': PAGE_WIDTH, 'height': 3000})
-        
-        full_text = textwrap.dedent(raw_content).strip()
-        raw_sections = [s for s in full_text.split('## ') if s.strip()]
-        
-        product_html_list = []
-        for section in raw_sections:
-            # --- 强制修复简介位置 ---
-            section = section.replace("\n简介：", "\n\n简介：")
-            
-            md_text = "## " + section
-            html_part = markdown.markdown(md_text)
-            product_html_list.append(f'<div class="product-block">{html_part}</div>')
-
-        current_page_products = []
-        page_count = 1
+    product-block 没有上内边距，h2 的 margin-top 会穿透到块外（与 <hr> 的外边距折叠），
+    所以块本身的高度与它是否是页面第一个块无关，分隔线间距直接用相邻块的实际间隔。
+
+    Returns:
+        dict: tops / bottoms（每个块的上下边界）和 padding（容器除块以外的额外高度）
+    """
+    template = template_registry.from_string(template_content)
+    full_html = template.render(content_html="<hr>".join(product_html_list), is_first_page=True)
+    page.set_content(full_html, wait_until="domcontentloaded")
+    # 字体没加载完时行高会变，必须等就绪后再测量
+    wait_until_ready(page)
+    metrics = page.evaluate(MEASURE_BLOCKS_JS)
+
+    tops, bottoms = metrics["tops"], metrics["bottoms"]
+    padding = metrics["container_height"] - (bottoms[-1] - tops[0]) if tops else 0
+    return {"tops": tops, "bottoms": bottoms, "padding": padding}
+
+def block_range_height(metrics, first, last, is_first_page):
+    """计算第 first..last 个块单独成页时的高度，等价于 get_html_height 的结果"""
+    extent = metrics["padding"] + metrics["bottoms"][last] - metrics["tops"][first]
+    # 与 Chromium 的 scrollHeight 一致：按像素四舍五入（.5 进位）
+    height = int(extent + 0.5)
+    margin_top = MARGIN_TOP_FIRST if is_first_page else MARGIN_TOP_OTHERS
+    return height + margin_top
+
+@tracing.traced("article.page_breaks", cat="layout")
+def compute_page_breaks(metrics, block_count):
+    """
+    按测量结果在 Python 里分页，逻辑与逐个试排的旧循环完全一致。
+
+    Returns:
+        list: 每页包含的块下标列表，例如 [[0, 1, 2], [3, 4], ...]
+    """
+    pages = []
+    current = []
+    for index in range(block_count):
+        is_first_page = not pages
+        first = current[0] if current else index
+        height = block_range_height(metrics, first, index, is_first_page)
+
+        # 根据页面类型选择不同的高度限制
+        max_height = MAX_PAGE_HEIGHT_FIRST if is_first_page else MAX_PAGE_HEIGHT_OTHERS
+
+        if height < max_height:
+            current.append(index)
+        else:
+            if current:
+                pages.append(current)
+            current = [index]
+
+    if current:
+        pages.append(current)
+    return pages
+
+@tracing.traced("article.page_breaks_trial", cat="layout")
+def compute_page_breaks_trial(page, product_html_list, template_content):
+    """旧的分页逻辑：每加一个产品就整页重新排版测量一次（O(n²) 次排版）"""
+    pages = []
+    current = []
+    for index, product_html in enumerate(product_html_list):
+        is_first_page = not pages
+        trial_list = [product_html_list[i] for i in current] + [product_html]
+        trial_html_str = "<hr>".join(trial_list)
+        height = get_html_height(page, trial_html_str, template_content, is_first_page)
+
+        # 根据页面类型选择不同的高度限制
+        max_height = MAX_PAGE_HEIGHT_FIRST if is_first_page else MAX_PAGE_HEIGHT_OTHERS
+
+        if height < max_height:
+            current.append(index)
+        else:
+            if current:
+                pages.append(current)
+            current = [index]
+
+    if current:
+        pages.append(current)
+    return pages
+
+def build_product_blocks(raw_content):
+    """把 Markdown 长文按 ## 拆成产品块，每块转成 <div class="product-block"> HTML"""
+    full_text = textwrap.dedent(raw_content).strip()
+    raw_sections = [s for s in full_text.split('## ') if s.strip()]
+    
+    product_html_list = []
+    for section in raw_sections:
+        # --- 强制修复简介位置 ---
+        section = section.replace("\n简介：", "\n\n简介：")
         
-        for product_html in product_html_list:
-            is_first_page = (page_count == 1)
-            trial_list = current_page_products + [product_html]
-            trial_html_str = "<hr>".join(trial_list)
-            height = get_html_height(page, trial_html_str, template_content, is_first_page)
-            
-            # 根据页面类型选择不同的高度限制
-            max_height = MAX_PAGE_HEIGHT_FIRST if is_first_page else MAX_PAGE_HEIGHT_OTHERS
-            
-            if height < max_height:
-                current_page_products.append(product_html)
+        md_text = "## " + section
+        html_part = markdown.markdown(md_text)
+        product_html_list.append(f'<div class="product-block">{html_part}</div>')
+    return product_html_list
+
+def render_slide_html(template_content, html_content, is_first_page):
+    """套模板得到单页的完整 HTML"""
+    template = template_registry.from_string(template_content)
+    return template.render(content_html=html_content, is_first_page=is_first_page)
+
+def render_final_images(slides):
+    """
+    并发渲染各页（每页一个独立页面，见 async_render）并写到对应文件。
+    slides: [(filename, final_html, cache_key), ...]
+    """
+    # 虚拟文档按页命名（slide_N.html），打开调试 HTML 时各页写到输出目录里互不覆盖
+    jobs = [async_render.RenderJob(final_html, os.path.splitext(os.path.basename(filename))[0] + ".html",
+                                   SLIDE_VIEWPORT, name="article.screenshot", debug_dir=os.path.dirname(filename))
+            for filename, final_html, _ in slides]
+    for (filename, _, cache_key), png_bytes in zip(slides, async_render.render_many(jobs)):
+        render_cache.write_output(filename, png_bytes)
+        if cache_key:
+            render_cache.store_bytes(cache_key, png_bytes)
+        print(f"✅ 已生成：{filename} (尺寸: {PAGE_WIDTH}×{PAGE_HEIGHT})")
+
+def paginate(page, product_html_list, template_content):
+    """按当前分页模式计算每页包含的块下标"""
+    if not product_html_list:
+        return []
+    if PAGINATION_MODE == "trial":
+        return compute_page_breaks_trial(page, product_html_list, template_content)
+    metrics = measure_blocks(page, product_html_list, template_content)
+    return compute_page_breaks(metrics, len(product_html_list))
+
+def create_smart_slides(title, raw_content, output_dir="."):
+    """创建智能分页的幻灯片，输出 output_dir/slide_N.png，按页码顺序返回图片路径"""
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"正在进行智能排版计算（尺寸：{PAGE_WIDTH}×{PAGE_HEIGHT}）...")
+    template_content = template_registry.template_source('article_template.html')
+
+    product_html_list = build_product_blocks(raw_content)
+
+    # 分页结果只取决于模板和全部产品块，同样的输入直接复用上次的分页
+    pagination_key = render_cache.make_key(template_content, "\0".join(product_html_list),
+                                           MEASURE_VIEWPORT, extra=f"pages:{PAGINATION_MODE}")
+    page_groups = render_cache.fetch_json(pagination_key)
+
+    def plan_slides(groups):
+        slides = []
+        for page_index, group in enumerate(groups, 1):
+            final_str = "<hr>".join(product_html_list[i] for i in group)
+            final_html = render_slide_html(template_content, final_str, page_index == 1)
+            filename = os.path.join(output_dir, f"slide_{page_index}.png")
+            key = render_cache.make_key(template_content, final_html, SLIDE_VIEWPORT)
+            slides.append((filename, final_html, key))
+        return slides
+
+    def fetch_cached(slides):
+        """把命中缓存的页放到位，返回仍需渲染的页"""
+        pending = []
+        for filename, final_html, key in slides:
+            if render_cache.fetch(key, filename):
+                print(f"♻️ 复用缓存：{filename}")
             else:
-                if current_page_products:
-                    final_str = "<hr>".join(current_page_products)
-                    render_final_image(page, template_content, final_str, f"slide_{page_count}.png", page_count == 1)
-                    page_count += 1
-                current_page_products = [product_html]
-        
-        if current_page_products:
-            final_str = "<hr>".join(current_page_products)
-            render_final_image(page, template_content, final_str, f"slide_{page_count}.png", page_count == 1)
+                pending.append((filename, final_html, key))
+        return pending
+
+    # 分页已缓存且每一页都命中时，完全不启动浏览器
+    slides = plan_slides(page_groups) if page_groups is not None else None
+    pending = fetch_cached(slides) if slides is not None else []
+
+    if slides is None:
+        # 使用足够高的 viewport 用于计算高度
+        with acquire_page(MEASURE_VIEWPORT) as page:
+            page_groups = paginate(page, product_html_list, template_content)
+        render_cache.store_json(pagination_key, page_groups)
+        slides = plan_slides(page_groups)
+        pending = fetch_cached(slides)
+
+    # 分页确定后各页互不依赖，同时渲染
+    if pending:
+        render_final_images(pending)
 
-        browser.close()
-        print(f"\n✅ 共生成 {page_count} 页，每页尺寸：{PAGE_WIDTH}×{PAGE_HEIGHT}")
+    print(f"\n✅ 共生成 {len(slides)} 页，每页尺寸：{PAGE_WIDTH}×{PAGE_HEIGHT}")
+    return [filename for filename, _, _ in slides]
 
 if __name__ == "__main__":
     pass
\ No newline at end of file
@@ -1,6 +1,6 @@
 from PIL import Image, ImageDraw, ImageFont
 import os
-from data_stock import stock_data
+import stock_store
 
 # ================= 配置区 =================
 CANVAS_WIDTH = 1080
@@ -41,6 +41,7 @@ def create_new_page():
 
 def generate_stock_article():
     print("📄 正在生成美股排版 (字体修复版)...")
+    stock_data = stock_store.load_latest().stock_data
     
     # 准备输出目录
     output_dir = "stock_output"
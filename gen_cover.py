@@ -1,47 +1,41 @@
 import os
-from jinja2 import Template
-from playwright.sync_api import sync_playwright
+import template_registry
+import async_render
+import render_cache
 
-def create_cover(date_text, main_text):
+VIEWPORT = {'width': 1245, 'height': 1660}
+# 模板引用的本地素材，参与缓存键计算
+COVER_ASSETS = ["assets/cover_bg.png"]
+
+def create_cover(date_text, main_text, output_dir="."):
+    """生成 output_dir/final_cover.png，返回图片路径"""
     print(f"正在生成封面：日期={date_text}, 文字={main_text}...")
     
-    # 1. 获取当前路径
-    current_dir = os.getcwd()
-    
-    # 2. 读取 HTML 模具
-    with open('cover_template.html', 'r', encoding='utf-8') as f:
-        template_content = f.read()
+    # 1. 读取 HTML 模具
+    template_content = template_registry.template_source('cover_template.html')
     
-    # 3. 填入文字
-    template = Template(template_content)
+    # 2. 填入文字
+    template = template_registry.get_template('cover_template.html')
     html_rendered = template.render(date_text=date_text, main_text=main_text)
+
+    # 内容没变就直接复用上次的截图，不启动浏览器
+    os.makedirs(output_dir, exist_ok=True)
+    output_filename = os.path.join(output_dir, "final_cover.png")
+    cache_key = render_cache.make_key(template_content, html_rendered, VIEWPORT, COVER_ASSETS)
+    if render_cache.fetch(cache_key, output_filename):
+        print(f"♻️ 封面内容未变化，复用缓存：{output_filename}")
+        return output_filename
     
-    # ---【关键修改】---
-    # 我们不再直接塞内容，而是先把填好的 HTML 保存为一个临时文件
-    # 这样浏览器打开它时，绝对能找到旁边的图片
-    temp_html_path = os.path.join(current_dir, "temp_cover.html")
-    with open(temp_html_path, "w", encoding="utf-8") as f:
-        f.write(html_rendered)
-    
-    # 4. 启动浏览器拍照
-    with sync_playwright() as p:
-        browser = p.chromium.launch()
-        page = browser.new_page(viewport={'width': 1245, 'height': 1660})
-        
-        # 让浏览器打开这个本地文件 (file://...)
-        # 这比 set_content 稳定 100 倍
-        page.goto(f"file://{temp_html_path}")
-        
-        output_filename = "final_cover.png"
-        page.screenshot(path=output_filename)
-        
-        browser.close()
-        
-    # (可选) 删掉临时文件，保持干净
-    if os.path.exists(temp_html_path):
-        os.remove(temp_html_path)
+    # 3. 启动浏览器拍照
+    # HTML 直接从内存加载，cover_bg.png 等相对路径的素材由渲染服务的请求拦截返回，不再写临时文件
+    png_bytes = async_render.render_one(html_rendered, "cover.html", VIEWPORT, name="ph.cover.screenshot",
+                                         debug_dir=output_dir)
+
+    render_cache.write_output(output_filename, png_bytes)
+    render_cache.store_bytes(cache_key, png_bytes)
 
     print(f"✅ 成功！封面已保存为：{output_filename}")
+    return output_filename
 
 if __name__ == "__main__":
     test_date = "2025.11.21"
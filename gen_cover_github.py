@@ -1,6 +1,9 @@
 import os
-from jinja2 import Template
-from playwright.sync_api import sync_playwright
+import template_registry
+import async_render
+import render_cache
+
+VIEWPORT = {'width': 1245, 'height': 1660}
 
 # 你的封面配置参数 (严格按照要求)
 COVER_CONFIG = {
@@ -74,37 +77,34 @@ HTML_TEMPLATE = """
 </html>
 """
 
-def create_github_cover(date_str, headline_str):
+def create_github_cover(date_str, headline_str, output_dir="."):
+    """生成 output_dir/final_cover_github.png，返回图片路径"""
     print(f"🎨 [GitHub] 正在生成封面：日期={date_str}...")
-    current_dir = os.getcwd()
     
     # 渲染 HTML
-    template = Template(HTML_TEMPLATE)
+    template = template_registry.from_string(HTML_TEMPLATE)
     html_rendered = template.render(
         bg_image=COVER_CONFIG["bg_image"],
         c=COVER_CONFIG,
         date_str=date_str,
         headline_str=headline_str
     )
+
+    # 内容没变就直接复用上次的截图，不启动浏览器
+    os.makedirs(output_dir, exist_ok=True)
+    output_filename = os.path.join(output_dir, "final_cover_github.png")
+    cache_key = render_cache.make_key(HTML_TEMPLATE, html_rendered, VIEWPORT, [COVER_CONFIG["bg_image"]])
+    if render_cache.fetch(cache_key, output_filename):
+        print(f"♻️ GitHub 封面内容未变化，复用缓存：{output_filename}")
+        return output_filename
     
-    temp_html_path = os.path.join(current_dir, "temp_github_cover.html")
-    with open(temp_html_path, "w", encoding="utf-8") as f:
-        f.write(html_rendered)
-        
     # 截图
-    with sync_playwright() as p:
-        browser = p.chromium.launch()
-        # 视口大小必须与封面尺寸一致
-        page = browser.new_page(viewport={'width': 1245, 'height': 1660})
-        page.goto(f"file://{temp_html_path}")
-        
-        output_filename = "final_cover_github.png"
-        page.screenshot(path=output_filename)
-        
-        browser.close()
-        
-    if os.path.exists(temp_html_path):
-        os.remove(temp_html_path)
+    # 视口大小必须与封面尺寸一致；HTML 从内存加载，背景图由渲染服务的请求拦截返回
+    png_bytes = async_render.render_one(html_rendered, "github_cover.html", VIEWPORT, name="github.cover.screenshot",
+                                         debug_dir=output_dir)
+
+    render_cache.write_output(output_filename, png_bytes)
+    render_cache.store_bytes(cache_key, png_bytes)
         
     print(f"✅ GitHub 封面已保存：{output_filename}")
     return output_filename
\ No newline at end of file
@@ -1,7 +1,10 @@
 from PIL import Image, ImageDraw, ImageFont
+import asset_cache
+import font_subset
 import os
-from datetime import datetime, timedelta
-from data_stock import stock_data
+import market_calendar
+import render_cache
+import tracing
 
 # ================= 配置区 =================
 CANVAS_WIDTH = 1245
@@ -12,57 +15,61 @@ CANVAS_HEIGHT = 1660
 FONT_PATH = "/System/Library/Fonts/PingFang.ttc"
 
 
-def load_font(size):
+def load_font(size, text):
     try:
-        return ImageFont.truetype(FONT_PATH, size)
+        # 只加载 text 用到的字形（PingFang.ttc 有几十 MB）
+        return font_subset.truetype(FONT_PATH, size, text)
     except OSError:
         print(f"⚠️ 依然找不到字体: {FONT_PATH}，尝试使用默认")
         return ImageFont.load_default()
 
 
-def get_yesterday_cn_date():
+def get_session_cn_date(session_date=None):
     """
-    计算"今天 - 1 天"的日期，并格式化为 `M月D日`，例如 12月4日。
-    说明：这里严格按照 MASTER_WORKFLOW 中"美股封面日期=今天日期-1"的要求，
-    不再直接使用 data_stock 里的 date_str，避免时差或缓存导致偏差。
+    报告的收盘日，格式化为 `M月D日`，例如 12月4日。
+    session_date 为快照的交易日期（date 或 YYYY-MM-DD，补跑旧日期时必须传）；
+    不传时按交易日历（见 market_calendar.py）取最近一个已经收盘的交易日，长周末、节假日之后也是真正的收盘日。
     """
-    yesterday = datetime.now() - timedelta(days=1)
-    return yesterday.strftime("%m月%d日")
+    return market_calendar.session_date(session_date).strftime("%m月%d日")
 
 
-def generate_stock_cover():
+@tracing.traced("stock.cover.draw", cat="render")
+def generate_stock_cover(output_dir="stock_output", session_date=None):
+    """生成 output_dir/cover_final.png，返回图片路径；session_date 见 get_session_cn_date"""
     print("📈 正在生成美股封面...")
 
     # 1. 背景处理
     bg_path = "assets/cover_stock_bg.png"
     # 如果没有专属背景，创建一个深蓝色的酷炫背景
     if os.path.exists(bg_path):
-        img = Image.open(bg_path).convert("RGBA")
-        img = img.resize((CANVAS_WIDTH, CANVAS_HEIGHT))
+        # 预处理好的背景按源文件哈希缓存，不再每次解码 + 转换 + 缩放
+        img = asset_cache.background_image(bg_path, (CANVAS_WIDTH, CANVAS_HEIGHT), fit="stretch", mode="RGBA")
     else:
         img = Image.new("RGBA", (CANVAS_WIDTH, CANVAS_HEIGHT), (20, 25, 40))
 
     draw = ImageDraw.Draw(img)
 
     # 2. 绘制日期
-    # 需求更新：封面日期固定为“今天日期-1”，例如在 12 月 5 日生成时显示“截止 12月4日 收盘”
-    cn_date = get_yesterday_cn_date()
+    # 封面日期为最近一个已收盘的交易日，例如在 12 月 5 日早上生成时显示“截止 12月4日 收盘”
+    cn_date = get_session_cn_date(session_date)
     full_date_text = f"截止 {cn_date} 收盘"
 
     font_size = 42  # ✅ 字号加大
-    font = load_font(font_size)
+    font = load_font(font_size, full_date_text)
 
     # 坐标：左 74, 顶 640 (只改变位置，其他不变)
     draw.text((74, 640), full_date_text, font=font, fill="#FFFFFF")
 
-    # 3. 保存到专属文件夹
-    output_dir = "stock_output"
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    # 3. 保存到本次运行的目录
+    os.makedirs(output_dir, exist_ok=True)
 
     output_path = os.path.join(output_dir, "cover_final.png")
-    img.save(output_path)
+    # 旧文件可能是渲染缓存条目的硬链接，先删掉再写
+    render_cache.prepare_output(output_path)
+    with tracing.span("stock.cover.encode", cat="encode"):
+        img.save(output_path)
     print(f"✅ 美股封面已生成: {output_path}")
+    return output_path
 
 
 if __name__ == "__main__":
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+美股页面的 Pillow 渲染器（不启动浏览器）
+直接按 templates/stock_article.html / stock_cover.html 的 CSS 几何画图，消费与 gen_stock_pw 相同的
+分页结果（solve_pages / calculate_pages 输出的 page["content"] 与 layout）：
+    标题 emoji（115px，行高 1.1）→ 色条 115×23 圆角 5 → 行列表（39px，行高 1.5，字间距 0.6px，gap）→ 页码
+
+字体：按 TEXT_FONTS 顺序找第一个存在的 CJK 字体，最后兜底项目自带的 assets/YouSheBiaoTiHei.ttf；
+某个字在当前字体里没有字形时逐字回退到下一个字体。Emoji 用系统彩色 emoji 字体，找不到时画矢量图标。
+每个 (字体, 字号, 字) 的字形只测量 + 光栅化一次，之后直接贴图；各页在进程池里并行绘制并编码 PNG。
+
+用法：
+    AUTOSHARE_STOCK_RENDERER=pillow python main_stock.py   # 美股日报改用本渲染器
+    python gen_stock_pil.py                                 # 直接按最新快照出图
+"""
+
+import os
+import re
+import sys
+import json
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image, ImageDraw, ImageFont
+
+import asset_cache
+import font_subset
+import render_cache
+import stock_store
+import tracing
+
+# ================= 配置区 =================
+# 与 templates/stock_article.html 保持一致
+PAGE_WIDTH = 1245
+PAGE_HEIGHT = 1660
+PADDING_TOP = 115
+PADDING_LEFT = 92
+PAGE_BG = "#F9F9F9"
+
+EMOJI_TITLE_SIZE = 115
+EMOJI_TITLE_LINE_HEIGHT = 1.1
+EMOJI_TITLE_MARGIN = 17
+BAR_WIDTH = 115
+BAR_HEIGHT = 23
+BAR_RADIUS = 5
+HEADER_MARGIN = 35
+BAR_COLORS = {"bg-red": "#FF4D44", "bg-green": "#7DC067"}
+
+ROW_FONT_SIZE = 39
+ROW_LINE_HEIGHT = 1.5
+ROW_LETTER_SPACING = 0.6
+ROW_COLOR = "#333333"
+ARROW_SIZE = 35
+ARROW_MARGIN = 14
+
+PAGE_NUMBER_SIZE = 28
+PAGE_NUMBER_COLOR = "#cccccc"
+PAGE_NUMBER_BOTTOM = 46
+PAGE_NUMBER_RIGHT = 58
+
+# 与 templates/stock_cover.html 保持一致
+COVER_BG = "assets/stock_bg.png"
+COVER_FONT = "assets/YouSheBiaoTiHei.ttf"
+COVER_FONT_SIZE = 38
+COVER_TEXT_POS = (74, 640)
+COVER_TEXT_COLOR = "#FFFFFF"
+
+# 正文字体候选 (路径, TTC 序号)，按顺序取第一个存在的；AUTOSHARE_STOCK_FONT 可指定字体放到最前面
+TEXT_FONTS = [
+    ("/System/Library/Fonts/PingFang.ttc", 0),                          # macOS 苹方
+    ("/usr/share/fonts/opentype/noto/NotoSansCJK-Medium.ttc", 2),       # Debian / Ubuntu（序号 2 为简体中文）
+    ("/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc", 2),
+    ("/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc", 2),           # Arch / Fedora
+    ("C:/Windows/Fonts/msyh.ttc", 0),                                   # Windows 微软雅黑
+    ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 0),             # 只有西文，配合下面的兜底字体
+    (COVER_FONT, 0),                                                    # 项目自带，保证一定有字体可用
+]
+# 彩色 emoji 字体候选 (路径, 位图字号)：位图字体只能按固定字号加载，画完再缩放
+EMOJI_FONTS = [
+    ("/System/Library/Fonts/Apple Color Emoji.ttc", 160),
+    ("/usr/share/fonts/truetype/noto/NotoColorEmoji.ttf", 109),
+    ("/usr/share/fonts/noto/NotoColorEmoji.ttf", 109),
+    ("C:/Windows/Fonts/seguiemj.ttf", 109),
+]
+RENDER_WORKERS = min(4, os.cpu_count() or 1)
+RENDER_VERSION = 1   # 绘制逻辑变化时加 1，让旧的渲染缓存失效
+# ==========================================
+
+_EMOJI_RE = re.compile("([\U0001F300-\U0001FAFF\u2600-\u27BF]\uFE0F?)")
+_ARROW = "➡️"
+
+_fonts = {}       # (路径, 序号, 字号) -> FreeTypeFont
+_glyphs = {}      # (字号, 字) -> (mask, left, top, advance)
+_emoji = {}       # (emoji, 字号) -> (RGBA, left, top, advance)
+_coverage = {}    # (路径, 序号, 字) -> 是否有字形
+
+
+# ---------- 字体 ----------
+def text_font_chain():
+    """实际存在的正文字体 [(路径, 序号), ...]"""
+    candidates = list(TEXT_FONTS)
+    override = os.environ.get("AUTOSHARE_STOCK_FONT")
+    if override:
+        candidates.insert(0, (override, 0))
+    return [(path, index) for path, index in candidates if os.path.isfile(path)]
+
+
+def emoji_font():
+    for path, size in EMOJI_FONTS:
+        if os.path.isfile(path):
+            return path, size
+    return None
+
+
+def _font(path, index, size):
+    key = (path, index, size)
+    font = _fonts.get(key)
+    if font is None:
+        font = asset_cache.truetype(path, size, index)
+        _fonts[key] = font
+    return font
+
+
+def _has_glyph(path, index, ch):
+    """
+    字体里有没有这个字：没有字形时 FreeType 画的是 .notdef（通常是方框），
+    与一个必然不存在的码位比较外框、步进和像素，全都相同就认为没有。
+    """
+    key = (path, index, ch)
+    found = _coverage.get(key)
+    if found is None:
+        font = _font(path, index, ROW_FONT_SIZE)
+        missing = "\U0010FFFD"
+        found = True
+        if font.getbbox(ch) == font.getbbox(missing) and font.getlength(ch) == font.getlength(missing):
+            found = _render_mask(font, ch).tobytes() != _render_mask(font, missing).tobytes()
+        _coverage[key] = found
+    return found
+
+
+def _pick_font(ch, size):
+    chain = text_font_chain()
+    if not chain:
+        return ImageFont.load_default(size)
+    if not ch.isspace():
+        for path, index in chain:
+            if _has_glyph(path, index, ch):
+                return _font(path, index, size)
+    return _font(*chain[0], size)
+
+
+def primary_metrics(size):
+    """首选字体的 (ascent, descent)：CSS 按第一个可用字体计算行盒基线"""
+    chain = text_font_chain()
+    font = _font(*chain[0], size) if chain else ImageFont.load_default(size)
+    return font.getmetrics()
+
+
+def _render_mask(font, ch):
+    left, top, right, bottom = font.getbbox(ch, anchor="ls")
+    mask = Image.new("L", (max(1, right - left), max(1, bottom - top)))
+    ImageDraw.Draw(mask).text((-left, -top), ch, font=font, fill=255, anchor="ls")
+    return mask
+
+
+def glyph(ch, size):
+    """缓存的字形：(灰度蒙版或 None, 相对基线的左偏移, 上偏移, 步进宽度)"""
+    key = (size, ch)
+    cached = _glyphs.get(key)
+    if cached is None:
+        font = _pick_font(ch, size)
+        left, top, right, bottom = font.getbbox(ch, anchor="ls")
+        mask = _render_mask(font, ch) if right > left and bottom > top else None
+        cached = (mask, left, top, font.getlength(ch))
+        _glyphs[key] = cached
+    return cached
+
+
+def text_width(text, size, letter_spacing=0.0):
+    return sum(glyph(ch, size)[3] + letter_spacing for ch in text)
+
+
+def draw_text(img, x, baseline, text, size, color, letter_spacing=0.0):
+    """逐字贴缓存好的字形（CSS letter-spacing 加在每个字后面），返回结束时的 x"""
+    for ch in text:
+        mask, left, top, advance = glyph(ch, size)
+        if mask is not None:
+            img.paste(color, (round(x) + left, baseline + top), mask)
+        x += advance + letter_spacing
+    return x
+
+
+# ---------- Emoji ----------
+def _vector_emoji(seq, size):
+    """没有彩色 emoji 字体时的矢量图标（4 倍尺寸绘制后缩小，边缘平滑）"""
+    scale = 4
+    s = size * scale
+    icon = Image.new("RGBA", (s, s), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(icon)
+    if seq.startswith("➡"):
+        draw.rounded_rectangle((0, 0, s - 1, s - 1), radius=s // 5, fill="#3D8BFD")
+        mid = s // 2
+        draw.rectangle((s * 0.2, mid - s * 0.08, s * 0.6, mid + s * 0.08), fill="#FFFFFF")
+        draw.polygon([(s * 0.55, s * 0.25), (s * 0.82, mid), (s * 0.55, s * 0.75)], fill="#FFFFFF")
+    else:
+        up = seq.startswith("📈")
+        draw.rounded_rectangle((s * 0.04, s * 0.04, s * 0.96, s * 0.96), radius=s // 8,
+                               fill="#FFFFFF", outline="#D0D0D0", width=max(1, s // 40))
+        for i in range(1, 4):
+            y = s * (0.04 + 0.23 * i)
+            draw.line((s * 0.12, y, s * 0.88, y), fill="#E6E6E6", width=max(1, s // 60))
+        points = [(0.14, 0.78), (0.34, 0.56), (0.50, 0.66), (0.68, 0.40), (0.86, 0.20)]
+        if not up:
+            points = [(x, 1 - y) for x, y in points]
+        draw.line([(s * x, s * y) for x, y in points], fill=BAR_COLORS["bg-red" if up else "bg-green"],
+                  width=max(2, s // 14), joint="curve")
+    icon = icon.resize((size, size), Image.LANCZOS)
+    # 与文字基线对齐：图标底部略低于基线（和 emoji 字体的下伸部分相当）
+    return icon, 0, -round(size * 0.88), size
+
+
+def _font_emoji(seq, size, path, native):
+    font = ImageFont.truetype(path, native)
+    left, top, right, bottom = font.getbbox(seq, mode="RGBA", anchor="ls")
+    if right <= left or bottom <= top:
+        return None
+    image = Image.new("RGBA", (right - left, bottom - top), (0, 0, 0, 0))
+    ImageDraw.Draw(image).text((-left, -top), seq, font=font, anchor="ls", embedded_color=True)
+    ratio = size / native
+    scaled = image.resize((max(1, round(image.width * ratio)), max(1, round(image.height * ratio))), Image.LANCZOS)
+    return scaled, round(left * ratio), round(top * ratio), font.getlength(seq) * ratio
+
+
+def emoji_image(seq, size):
+    key = (seq, size)
+    cached = _emoji.get(key)
+    if cached is None:
+        found = emoji_font()
+        if found:
+            try:
+                cached = _font_emoji(seq, size, *found)
+            except OSError:
+                cached = None
+        if cached is None:
+            cached = _vector_emoji(seq, size)
+        _emoji[key] = cached
+    return cached
+
+
+def draw_emoji(img, x, baseline, seq, size):
+    icon, left, top, advance = emoji_image(seq, size)
+    img.paste(icon, (round(x) + left, baseline + top), icon)
+    return x + advance
+
+
+# ---------- 页面 ----------
+def _baseline(top, line_height, size):
+    """CSS 行盒里的基线：半行距 + ascent"""
+    ascent, descent = primary_metrics(size)
+    return round(top + (line_height - (ascent + descent)) / 2 + ascent)
+
+
+def draw_row(img, x, y, text):
+    line_height = ROW_FONT_SIZE * ROW_LINE_HEIGHT
+    baseline = _baseline(y, line_height, ROW_FONT_SIZE)
+    for part in _EMOJI_RE.split(text.strip()):
+        if not part:
+            continue
+        if part == _ARROW:
+            # 模板里的 .arrow-icon：左右各 14px 外边距，字号 35
+            x = draw_emoji(img, x + ARROW_MARGIN, baseline, part, ARROW_SIZE) + ARROW_MARGIN + ROW_LETTER_SPACING
+        elif _EMOJI_RE.fullmatch(part):
+            x = draw_emoji(img, x, baseline, part, ROW_FONT_SIZE) + ROW_LETTER_SPACING
+        else:
+            x = draw_text(img, x, baseline, part, ROW_FONT_SIZE, ROW_COLOR, ROW_LETTER_SPACING)
+    return line_height
+
+
+def draw_header(img, y, block):
+    line_height = EMOJI_TITLE_SIZE * EMOJI_TITLE_LINE_HEIGHT
+    baseline = _baseline(y, line_height, EMOJI_TITLE_SIZE)
+    draw_emoji(img, PADDING_LEFT, baseline, block["emoji"], EMOJI_TITLE_SIZE)
+    y += line_height + EMOJI_TITLE_MARGIN
+    color = BAR_COLORS.get(block.get("color_class"), BAR_COLORS["bg-red"])
+    ImageDraw.Draw(img).rounded_rectangle(
+        (PADDING_LEFT, round(y), PADDING_LEFT + BAR_WIDTH - 1, round(y) + BAR_HEIGHT - 1),
+        radius=BAR_RADIUS, fill=color)
+    return line_height + EMOJI_TITLE_MARGIN + BAR_HEIGHT + HEADER_MARGIN
+
+
+def draw_page(page, layout, number):
+    """画一页：与模板一样从上往下排 header / spacer / list，右下角页码"""
+    page_layout = page.get("layout") or layout
+    img = Image.new("RGB", (PAGE_WIDTH, PAGE_HEIGHT), PAGE_BG)
+    y = PADDING_TOP
+    for block in page["content"]:
+        if block["type"] == "header":
+            y += draw_header(img, y, block)
+        elif block["type"] == "spacer":
+            y += page_layout["spacer"]
+        elif block["type"] == "list":
+            for i, row in enumerate(block["rows"]):
+                if i:
+                    y += page_layout["gap"]
+                y += draw_row(img, PADDING_LEFT, y, row["text"])
+
+    label = str(number)
+    ascent, descent = primary_metrics(PAGE_NUMBER_SIZE)
+    x = PAGE_WIDTH - PAGE_NUMBER_RIGHT - text_width(label, PAGE_NUMBER_SIZE)
+    draw_text(img, x, PAGE_HEIGHT - PAGE_NUMBER_BOTTOM - descent, label, PAGE_NUMBER_SIZE, PAGE_NUMBER_COLOR)
+    return img
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """
+    绘制进程池懒创建一次、之后复用，工作进程里的字形缓存也跨批次保留。
+    流水线里这时已经有其他线程在跑，fork 可能把别的线程持有的锁带进子进程而卡死，所以用 forkserver（或 spawn）。
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS, mp_context=multiprocessing.get_context(method))
+        return _pool
+
+
+def _reset_pool(pool):
+    """工作进程异常退出后进程池不可再用，丢掉让下次重建"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def _render_page_file(page, layout, number, path):
+    """子进程：画一页并编码写盘（字形缓存在每个工作进程里各自积累）"""
+    draw_page(page, layout, number).save(path, format="PNG")
+    return path
+
+
+@tracing.traced("stock.pil.render_pages", cat="render")
+def render_pages(pages, layout, paths, numbers=None, workers=RENDER_WORKERS):
+    """把分页结果画成 PNG，返回写入的路径；numbers 为页码（默认 1..N）"""
+    numbers = numbers or list(range(1, len(pages) + 1))
+    for path in paths:
+        render_cache.prepare_output(path)
+    if workers <= 1 or len(pages) <= 1:
+        return [_render_page_file(p, layout, n, path) for p, n, path in zip(pages, numbers, paths)]
+
+    pool = _get_pool()
+    try:
+        futures = [pool.submit(_render_page_file, p, layout, n, path) for p, n, path in zip(pages, numbers, paths)]
+        return [f.result() for f in futures]
+    except BrokenProcessPool:
+        _reset_pool(pool)
+        raise
+
+
+@tracing.traced("stock.pil.render_cover", cat="render")
+def render_cover(date_str, path):
+    """按 stock_cover.html 画封面：背景 cover 铺满，YouSheBiaoTiHei 38px 白字"""
+    img = asset_cache.background_image(COVER_BG, (PAGE_WIDTH, PAGE_HEIGHT), fit="cover", mode="RGB")
+    text = f"截止 {date_str} 收盘"
+    font = font_subset.truetype(COVER_FONT, COVER_FONT_SIZE, text)
+    ImageDraw.Draw(img).text(COVER_TEXT_POS, text, font=font, fill=COVER_TEXT_COLOR, anchor="la")
+    render_cache.prepare_output(path)
+    img.save(path, format="PNG")
+    return path
+
+
+# ---------- 任务 ----------
+def _cache_source():
+    return f"pillow-v{RENDER_VERSION}:{render_cache.file_hash(__file__)}"
+
+
+def _font_assets():
+    assets = [path for path, _ in text_font_chain()]
+    found = emoji_font()
+    if found:
+        assets.append(found[0])
+    return assets
+
+
+def run_task(snapshot=None, output_dir=None, session_date=None):
+    """与 gen_stock_pw.run_task 相同的输出（cover_final.png + article_pN.png），全程不启动浏览器"""
+    import gen_stock_pw
+
+    snapshot = snapshot or stock_store.load_latest()
+    output_dir = output_dir or gen_stock_pw.OUTPUT_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    viewport = {"width": PAGE_WIDTH, "height": PAGE_HEIGHT}
+    source = _cache_source()
+    print("🖌️ 使用 Pillow 渲染美股图片（不启动浏览器）...")
+
+    # 1. 封面
+    date_str = gen_stock_pw.get_session_cn_date(session_date)
+    cover_path = os.path.join(output_dir, "cover_final.png")
+    cover_key = render_cache.make_key(source, date_str, viewport, [COVER_BG, COVER_FONT], extra="cover")
+    if render_cache.fetch(cover_key, cover_path):
+        print(f"   ♻️ 封面复用缓存: {cover_path}")
+    else:
+        render_cover(date_str, cover_path)
+        render_cache.store(cover_key, cover_path)
+        print(f"   ✅ 已保存: {cover_path}")
+
+    # 2. 内容页：每页单独缓存，只重画内容变化的页
+    pages, layout = gen_stock_pw.get_smart_pages(snapshot.stock_data)
+    assets = _font_assets()
+    todo = []
+    for number, page in enumerate(pages, 1):
+        save_path = os.path.join(output_dir, f"article_p{number}.png")
+        content = json.dumps({"page": page, "layout": layout}, ensure_ascii=False, sort_keys=True)
+        key = render_cache.make_key(source, content, viewport, assets, extra=f"page{number}")
+        if render_cache.fetch(key, save_path):
+            print(f"   ♻️ 复用缓存: {save_path}")
+        else:
+            todo.append((number, page, save_path, key))
+
+    if todo:
+        saved = render_pages([t[1] for t in todo], layout, [t[2] for t in todo], numbers=[t[0] for t in todo])
+        for (_, _, _, key), save_path in zip(todo, saved):
+            render_cache.store(key, save_path)
+            print(f"   ✅ 已保存: {save_path}")
+
+
+if __name__ == "__main__":
+    tracing.setup(sys.argv[1:])
+    run_task()
@@ -1,12 +1,17 @@
 import os
-import importlib
-from datetime import datetime, timedelta
-from jinja2 import Environment, FileSystemLoader
-from playwright.sync_api import sync_playwright
-import data_stock
+import math
+import template_registry
+from render_service import acquire_page, load_html
+import stock_store
+import image_tiles
+import render_cache
+import async_render
+import market_calendar
+import tracing
 
 # ================= 配置区 =================
-TEMPLATE_DIR = "templates"
+# 单独运行本脚本时的默认输出目录；流水线会传入本次运行的目录（见 workspace.py）。
+# 同时也是虚拟文档所在的目录：模板里的 ../assets 相对它解析到项目根目录的 assets/
 OUTPUT_DIR = "stock_output"
 
 # 页面基础参数 - 修改为 1245×1660
@@ -15,6 +20,20 @@ PAGE_HEIGHT = 1660  # 1440 * 1.153 = 1660
 PADDING_TOP = 115   # 100 * 1.153 = 115
 PADDING_BOTTOM = 115  # 100 * 1.153 = 115
 AVAILABLE_HEIGHT = PAGE_HEIGHT - PADDING_TOP - PADDING_BOTTOM  # 1430
+PAGE_WIDTH = 1245
+PAGE_GAP = 50       # .page 的 margin-bottom，各页在文档中纵向堆叠
+
+# 内容页截图方式（只对同步后端 AUTOSHARE_RENDER_BACKEND=sync 生效；默认的异步后端每页单独一个文档并发截图）：
+#   "single"      - 整页截一次图，在 Python 里按几何切成 article_pN.png（默认）
+#   "per_element" - 每个 .page 单独 element.screenshot（兜底，像素与 single 一致）
+CAPTURE_MODE = "single"
+# 渲染器："browser" - Playwright 截图（默认）；"pillow" - gen_stock_pil 直接画图，不启动浏览器
+RENDERER = os.environ.get("AUTOSHARE_STOCK_RENDERER", "browser").lower()
+MAX_SINGLE_CAPTURE_HEIGHT = 16384  # Chromium 单张截图的安全高度上限，超过则走逐页截图
+
+VIEWPORT = {"width": PAGE_WIDTH, "height": PAGE_HEIGHT}
+# 封面模板引用的本地素材，参与缓存键计算
+COVER_ASSETS = ["assets/stock_bg.png", "assets/YouSheBiaoTiHei.ttf"]
 
 # === 布局方案配置 ===
 # 1. 标准宽松模式 (默认) - 所有尺寸按 1.153 比例缩放
@@ -33,13 +52,25 @@ LAYOUT_TIGHT = {
     "h_header": 208  # 180 * 1.153 = 208
 }
 
-if not os.path.exists(OUTPUT_DIR):
-    os.makedirs(OUTPUT_DIR)
+def interpolate_layout(loose, tight, t):
+    """在两套布局之间插值（t=0 为 loose，t=1 为 tight）；高度向上取整，保证不会算少"""
+    return {
+        "gap": round(loose["gap"] + (tight["gap"] - loose["gap"]) * t),
+        "spacer": math.ceil(loose["spacer"] + (tight["spacer"] - loose["spacer"]) * t),
+        "h_row": math.ceil(loose["h_row"] + (tight["h_row"] - loose["h_row"]) * t),
+        "h_header": math.ceil(loose["h_header"] + (tight["h_header"] - loose["h_header"]) * t),
+    }
 
+# 3. 分页求解器可选的布局（按优先级从宽松到紧凑排列，每一页可以单独选择）
+LAYOUT_PRESETS = [
+    LAYOUT_STANDARD,
+    interpolate_layout(LAYOUT_STANDARD, LAYOUT_TIGHT, 0.5),
+    LAYOUT_TIGHT,
+]
+
+@tracing.traced("stock.render_html", cat="render")
 def render_html(template_name, data):
-    env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
-    template = env.get_template(template_name)
-    return template.render(**data)
+    return template_registry.render(template_name, **data)
 
 # === 核心：通用分页计算器 ===
 def calculate_pages(stock_data, layout):
@@ -133,92 +164,262 @@ def calculate_pages(stock_data, layout):
     start_new_page()
     return pages
 
+# === 最优分页求解器 ===
+def extract_sections(stock_data):
+    """与 calculate_pages 相同的取数规则，返回 (上涨行列表, 下跌行列表)"""
+    stock_content = stock_data.get("stock_content_formatted", "")
+    content_lines = [line.strip() for line in stock_content.split('\n') if line.strip()] if stock_content else []
+    up_lines = [line for line in content_lines if line.startswith('📈')]
+    down_lines = [line for line in content_lines if line.startswith('📉')]
+    # 下跌优先使用 stock_content_formatted 中的数据，如果没有则使用 down_list
+    return up_lines, down_lines or stock_data.get("down_list", [])
+
+def page_height(n_up, n_down, layout):
+    """一页放 n_up 条上涨 + n_down 条下跌时占用的高度"""
+    height = 0
+    if n_up:
+        height += layout["h_header"] + n_up * layout["h_row"]
+    if n_up and n_down:
+        height += layout["spacer"]
+    if n_down:
+        height += layout["h_header"] + n_down * layout["h_row"]
+    return height
+
+def build_page(up_rows, down_rows, layout):
+    """把一页的上涨/下跌行组装成模板需要的 block 列表"""
+    content = []
+    if up_rows:
+        content.append({"type": "header", "emoji": "📈", "color_class": "bg-red"})
+        content.append({"type": "list", "rows": [{"text": item} for item in up_rows]})
+    if up_rows and down_rows:
+        content.append({"type": "spacer"})
+    if down_rows:
+        content.append({"type": "header", "emoji": "📉", "color_class": "bg-green"})
+        content.append({"type": "list", "rows": [{"text": item} for item in down_rows]})
+    return {"content": content, "layout": layout}
+
+def solve_pages(stock_data, presets=None):
+    """
+    动态规划求最优分页：把「上涨 + 下跌」看成一个序列，切成若干连续段，每段一页、每页单独选布局。
+
+    目标按优先级依次最小化（字典序）：
+        1. 页数
+        2. 孤儿页数（只有 1 行的页面）
+        3. 布局紧凑程度（能用宽松布局就不用紧凑布局）
+        4. 各页行数的平方和（页数固定时，平方和越小各页越均衡）
+
+    复杂度 O(N × 每页最大行数 × 布局数)，几百上千只股票也是毫秒级。
+    """
+    presets = presets or LAYOUT_PRESETS
+    up_lines, down_lines = extract_sections(stock_data)
+    n_up = len(up_lines)
+    total = n_up + len(down_lines)
+    if total == 0:
+        return []
+
+    INF = (math.inf,)
+    best = [INF] * (total + 1)   # best[i]: 前 i 行的最优代价
+    choice = [None] * (total + 1) # choice[i]: (上一页结束位置, 布局下标)
+    best[0] = (0, 0, 0, 0)
+
+    for start in range(total):
+        if best[start] == INF:
+            continue
+        for rank, layout in enumerate(presets):
+            for end in range(start + 1, total + 1):
+                ups = max(0, min(end, n_up) - start)
+                downs = (end - start) - ups
+                # 单行也放不下时仍允许单独成页，避免无解
+                if page_height(ups, downs, layout) > AVAILABLE_HEIGHT and end > start + 1:
+                    break
+                rows = end - start
+                orphan = 1 if rows <= 1 and total > 1 else 0
+                cost = tuple(a + b for a, b in zip(best[start], (1, orphan, rank, rows * rows)))
+                if cost < best[end]:
+                    best[end] = cost
+                    choice[end] = (start, rank)
+
+    # 回溯
+    pages = []
+    end = total
+    while end > 0:
+        start, rank = choice[end]
+        ups = up_lines[start:min(end, n_up)] if start < n_up else []
+        downs = down_lines[max(start, n_up) - n_up:end - n_up] if end > n_up else []
+        pages.append(build_page(ups, downs, presets[rank]))
+        end = start
+    pages.reverse()
+    return pages
+
 # === 智能布局优化器 ===
+@tracing.traced("stock.solve_pages", cat="layout")
 def get_smart_pages(stock_data):
     print("🤖 正在计算最佳布局...")
-    
-    # 1. 先试用【标准布局】计算
-    pages_std = calculate_pages(stock_data, LAYOUT_STANDARD)
-    
-    if len(pages_std) <= 1:
-        print("   -> 内容较少，使用标准布局 (1页)")
-        return pages_std, LAYOUT_STANDARD
-    
-    last_page = pages_std[-1]
-    item_count = 0
-    for block in last_page["content"]:
-        if block["type"] == "list":
-            item_count += len(block["rows"])
-    
-    if item_count <= 1:
-        print(f"   ⚠️ 发现孤儿页 (最后一页只有 {item_count} 条数据)！尝试压缩...")
-        pages_tight = calculate_pages(stock_data, LAYOUT_TIGHT)
-        if len(pages_tight) < len(pages_std):
-            print("   ✅ 压缩成功！使用紧凑布局。")
-            return pages_tight, LAYOUT_TIGHT
-        else:
-            print("   ❌ 压缩失败。保持标准布局。")
-            return pages_std, LAYOUT_STANDARD
-    
-    print("   -> 布局正常，使用标准布局")
-    return pages_std, LAYOUT_STANDARD
 
-def get_yesterday_cn_date():
+    pages = solve_pages(stock_data)
+    if not pages:
+        print("   -> 没有可排版的数据")
+        return pages, LAYOUT_STANDARD
+
+    layout_names = {id(LAYOUT_STANDARD): "标准", id(LAYOUT_TIGHT): "紧凑"}
+    summary = []
+    for page in pages:
+        rows = sum(len(block["rows"]) for block in page["content"] if block["type"] == "list")
+        summary.append(f"{rows}行/{layout_names.get(id(page['layout']), '适中')}")
+    print(f"   -> 共 {len(pages)} 页：{', '.join(summary)}")
+
+    # 模板的默认样式使用第一页的布局，每页再按自己的布局覆盖
+    return pages, pages[0]["layout"]
+
+def get_session_cn_date(session_date=None):
     """
-    计算"今天 - 1 天"的日期，并格式化为 `M月D日`，例如 12月4日。
-    说明：与 gen_cover_stock 保持一致，美股封面的展示日期统一按照
-    "系统当前日期 - 1 天" 来生成，而不是直接使用 data_stock.date_str。
+    报告的收盘日，格式化为 `M月D日`，例如 12月4日（与 gen_cover_stock 保持一致）。
+    session_date 为快照的交易日期；不传时按交易日历取最近一个已经收盘的交易日。
     """
-    yesterday = datetime.now() - timedelta(days=1)
-    return yesterday.strftime("%m月%d日")
+    return market_calendar.session_date(session_date).strftime("%m月%d日")
+
 
+def render_page_html(page, number, layout=None):
+    """单独一页的 HTML（页码为 number），异步后端每页一个文档并发渲染"""
+    return render_html("stock_article.html", {
+        "pages": [page],
+        "layout": page.get("layout") or layout,
+        "page_offset": number - 1,
+    })
 
-def run_task():
-    import data_stock
-    importlib.reload(data_stock)
+
+def capture_pages_per_element(page, output_dir):
+    """逐个 .page 元素截图（每页一次合成 + 编码）"""
+    saved = []
+    page_elements = page.query_selector_all(".page")
+    for index, element in enumerate(page_elements):
+        save_path = os.path.join(output_dir, f"article_p{index + 1}.png")
+        with tracing.span("stock.page.screenshot", cat="screenshot", page=index + 1):
+            element.screenshot(path=save_path)
+        saved.append(save_path)
+    return saved
+
+def capture_pages_single(page, page_count, output_dir):
+    """
+    整页只截一次图，按已知几何（1245×1660，页间距 50px）切成单页，PNG 编码放到进程池。
+    文档尺寸与预期不符时返回 None，由调用方回退到逐页截图。
+    """
+    if page_count == 0:
+        return []
+    size = page.evaluate("[document.documentElement.scrollWidth, document.documentElement.scrollHeight]")
+    expected_height = page_count * (PAGE_HEIGHT + PAGE_GAP) - PAGE_GAP
+    if size[0] < PAGE_WIDTH or size[1] < expected_height or size[1] > MAX_SINGLE_CAPTURE_HEIGHT:
+        return None
+
+    with tracing.span("stock.fullpage.screenshot", cat="screenshot", pages=page_count):
+        png_bytes = page.screenshot(full_page=True)
+    boxes = image_tiles.tile_boxes(page_count, PAGE_WIDTH, PAGE_HEIGHT, PAGE_GAP)
+    paths = [os.path.join(output_dir, f"article_p{i + 1}.png") for i in range(page_count)]
+    return image_tiles.slice_png(png_bytes, boxes, paths)
+
+def run_task(snapshot=None, output_dir=OUTPUT_DIR, session_date=None):
+    """
+    生成 output_dir/cover_final.png + article_pN.png；snapshot 默认最新一份快照。
+    session_date 是封面上的收盘日（流水线传快照的交易日期），不传时按交易日历计算。
+    """
+    snapshot = snapshot or stock_store.load_latest()
+    if RENDERER == "pillow":
+        import gen_stock_pil
+        gen_stock_pil.run_task(snapshot, output_dir, session_date)
+        return
+    os.makedirs(output_dir, exist_ok=True)
+
+    # 先算好两份 HTML 和缓存键：内容没变的部分直接复用上次的截图
+    cover_data = {"date_str": get_session_cn_date(session_date)}
+    html_cover = render_html("stock_cover.html", cover_data)
+    cover_path = os.path.join(output_dir, "cover_final.png")
+    cover_key = render_cache.make_key(template_registry.template_source("stock_cover.html"), html_cover, VIEWPORT, COVER_ASSETS)
+    cover_cached = render_cache.fetch(cover_key, cover_path)
+    if cover_cached:
+        print(f"   ♻️ 封面复用缓存: {cover_path}")
+
+    final_pages, final_layout = get_smart_pages(snapshot.stock_data)
+    article_source = template_registry.template_source("stock_article.html")
+    article_paths = [os.path.join(output_dir, f"article_p{i + 1}.png") for i in range(len(final_pages))]
+    # 缓存键按单页 HTML 计算：只有内容变了的页才需要重新渲染
+    page_htmls = [render_page_html(page, i + 1, final_layout) for i, page in enumerate(final_pages)]
+    article_keys = [render_cache.make_key(article_source, html, VIEWPORT) for html in page_htmls]
+    pending = []
+    for i, (key, save_path) in enumerate(zip(article_keys, article_paths)):
+        if render_cache.fetch(key, save_path):
+            print(f"   ♻️ 复用缓存: {save_path}")
+        else:
+            pending.append(i)
+
+    if cover_cached and not pending:
+        print("♻️ 封面和内容页均未变化，跳过浏览器渲染")
+        return
+
+    if async_render.enabled():
+        # 封面和每一页内容各开一个页面并发渲染
+        print(f"🚀 并发渲染美股图片（{len(pending) + (not cover_cached)} 张）...")
+        jobs, outputs = [], []
+        if not cover_cached:
+            # 虚拟路径放在 stock_output/ 下，模板里的 ../assets 才能解析到素材；
+            # 设置 AUTOSHARE_DEBUG_HTML=1 时会同时把 HTML 写到 output_dir 下的同名文件
+            jobs.append(async_render.RenderJob(html_cover, f"{OUTPUT_DIR}/debug_cover.html", VIEWPORT,
+                                               name="stock.cover.screenshot", debug_dir=output_dir))
+            outputs.append((cover_path, cover_key))
+        for i in pending:
+            jobs.append(async_render.RenderJob(page_htmls[i], f"{OUTPUT_DIR}/debug_article_p{i + 1}.html", VIEWPORT,
+                                               name="stock.page.screenshot", debug_dir=output_dir))
+            outputs.append((article_paths[i], article_keys[i]))
+        for (save_path, key), png_bytes in zip(outputs, async_render.render_many(jobs)):
+            render_cache.write_output(save_path, png_bytes)
+            render_cache.store_bytes(key, png_bytes)
+            print(f"   ✅ 已保存: {save_path}")
+        return
 
     print("🚀 启动 Playwright (智能孤儿控制版)...")
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch()
-        page = browser.new_page()
+    with acquire_page(VIEWPORT) as page:
         
         # 1. 封面
-        cover_data = {"date_str": get_yesterday_cn_date()}
-        html_cover = render_html("stock_cover.html", cover_data)
-        
-        cover_html_path = os.path.join(OUTPUT_DIR, "debug_cover.html")
-        with open(cover_html_path, "w", encoding="utf-8") as f:
-            f.write(html_cover)
-            
-        page.set_viewport_size({"width": 1245, "height": 1660})
-        page.goto(f"file://{os.path.abspath(cover_html_path)}")
-        page.wait_for_timeout(500) 
-        page.screenshot(path=os.path.join(OUTPUT_DIR, "cover_final.png"))
+        if not cover_cached:
+            # 虚拟路径放在 stock_output/ 下，模板里的 ../assets 才能解析到素材；
+            # 设置 AUTOSHARE_DEBUG_HTML=1 时会同时把 HTML 写到 output_dir 下的同名文件
+            page.set_viewport_size(VIEWPORT)
+            load_html(page, html_cover, f"{OUTPUT_DIR}/debug_cover.html", debug_dir=output_dir)
+            with tracing.span("stock.cover.screenshot", cat="screenshot"):
+                png_bytes = page.screenshot()
+            render_cache.write_output(cover_path, png_bytes)
+            render_cache.store_bytes(cover_key, png_bytes)
+
+        # 2. 内容页：整体一次截图
+        if not pending:
+            return
 
-        # 2. 内容页
-        final_pages, final_layout = get_smart_pages(data_stock.stock_data)
-        
         html_article = render_html("stock_article.html", {
             "pages": final_pages,
             "layout": final_layout
         })
+        page.set_viewport_size(VIEWPORT)
+        load_html(page, html_article, f"{OUTPUT_DIR}/debug_article.html", debug_dir=output_dir)
+
+        # 部分页可能刚从缓存硬链接过来，写之前先删掉，不能原地覆盖缓存条目
+        for save_path in article_paths:
+            render_cache.prepare_output(save_path)
         
-        article_html_path = os.path.join(OUTPUT_DIR, "debug_article.html")
-        with open(article_html_path, "w", encoding="utf-8") as f:
-            f.write(html_article)
-            
-        page.set_viewport_size({"width": 1245, "height": 1660})
-        page.goto(f"file://{os.path.abspath(article_html_path)}")
-        page.wait_for_timeout(500)
-        
-        page_elements = page.query_selector_all(".page")
-        for index, element in enumerate(page_elements):
-            save_path = os.path.join(OUTPUT_DIR, f"article_p{index + 1}.png")
-            element.screenshot(path=save_path)
-            print(f"   ✅ 已保存: {save_path}")
+        saved = None
+        if CAPTURE_MODE == "single":
+            try:
+                saved = capture_pages_single(page, len(final_pages), output_dir)
+            except Exception as e:
+                print(f"   ⚠️ 整页截图切片失败 ({e})，回退到逐页截图")
+        if saved is None:
+            saved = capture_pages_per_element(page, output_dir)
+
+        if len(saved) == len(article_keys):
+            for key, save_path in zip(article_keys, saved):
+                render_cache.store(key, save_path)
 
-        browser.close()
+        for save_path in saved:
+            print(f"   ✅ 已保存: {save_path}")
 
 if __name__ == "__main__":
     run_task()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+GitHub Trending 榜单快照 + 本地对比
+每天解析出的完整榜单存成 github_snapshots/YYYY-MM-DD.json（格式与 stock_snapshots/ 相同的思路），
+任意两天之间可以算出新上榜 / 跌出榜 / 排名变化：两边都按小写 owner/repo 建好索引，集合运算一次完成，O(n)。
+服务器返回的日报缺少「新上榜」段落时，main_github 用这里的对比结果代替，不用放弃当天的发布，也不用重新抓取。
+
+用法：
+    import github_history
+    github_history.save_snapshot("2025-11-21", report.repos)
+    previous = github_history.previous_date("2025-11-21")
+    changes = github_history.diff(report, github_history.load_snapshot(previous))
+    changes.entered      # 新上榜（按今天的排名）
+
+命令行：
+    python github_history.py diff [--date YYYY-MM-DD] [--against YYYY-MM-DD]
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+from dataclasses import dataclass, field, asdict
+
+import github_trending
+
+# ================= 配置区 =================
+STORE_DIR = "github_snapshots"
+SCHEMA_VERSION = 1
+# ==========================================
+
+_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+# 路径 -> (mtime_ns, TrendingReport)
+_cache = {}
+
+
+@dataclass
+class TrendingDiff:
+    entered: list = field(default_factory=list)   # 新上榜的 TrendingRepo（按今天的排名）
+    exited: list = field(default_factory=list)    # 跌出榜的 TrendingRepo（按之前的排名）
+    moved: list = field(default_factory=list)     # (TrendingRepo, 之前排名, 今天排名)，两边都在榜、排名变了的
+
+    @property
+    def entered_names(self):
+        return [item.name for item in self.entered]
+
+
+# ---------- 对比 ----------
+def _rank(item):
+    try:
+        return int(item.rank)
+    except ValueError:
+        return None
+
+
+def diff(current, previous):
+    """
+    两份 TrendingReport 的差异（按忽略大小写的 owner/repo 对应），O(n)。
+    只是大小写不同的重复名字按第一次出现的写法对应；完全同名的重复条目取最后出现的那条
+    （与 TrendingReport.details 以及日报长图的匹配结果一致）。
+    """
+    result = TrendingDiff()
+    for lower, name in current.by_lower.items():
+        item = current.details[name]
+        old_name = previous.by_lower.get(lower)
+        if old_name is None:
+            result.entered.append(item)
+            continue
+        old_rank, new_rank = _rank(previous.details[old_name]), _rank(item)
+        if old_rank is not None and new_rank is not None and old_rank != new_rank:
+            result.moved.append((item, old_rank, new_rank))
+    result.exited = [previous.details[name] for lower, name in previous.by_lower.items()
+                     if lower not in current.by_lower]
+    return result
+
+
+# ---------- 读写 ----------
+def _snapshot_path(date, store_dir):
+    if not _DATE_RE.match(date):
+        raise ValueError(f"日期格式错误: {date!r}，应为 YYYY-MM-DD")
+    return os.path.join(store_dir, f"{date}.json")
+
+
+def _atomic_write(path, text):
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def save_snapshot(date, repos, store_dir=STORE_DIR):
+    """保存某一天的完整榜单（TrendingRepo 列表，按榜单顺序），返回文件路径"""
+    os.makedirs(store_dir, exist_ok=True)
+    path = _snapshot_path(date, store_dir)
+    payload = {
+        "version": SCHEMA_VERSION,
+        "date": date,
+        "repos": [asdict(item) for item in repos],
+    }
+    _atomic_write(path, json.dumps(payload, ensure_ascii=False, indent=1))
+    return path
+
+
+def load_snapshot(date, store_dir=STORE_DIR):
+    """读取某一天的榜单，返回带索引的 TrendingReport（按文件修改时间缓存）"""
+    path = _snapshot_path(date, store_dir)
+    mtime = os.stat(path).st_mtime_ns
+    cached = _cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    if payload.get("version") != SCHEMA_VERSION:
+        raise ValueError(f"不支持的快照版本: {payload.get('version')}")
+
+    report = github_trending.from_repos(github_trending.TrendingRepo(**r) for r in payload["repos"])
+    _cache[path] = (mtime, report)
+    return report
+
+
+def list_dates(store_dir=STORE_DIR):
+    """已保存的日期（升序）"""
+    if not os.path.isdir(store_dir):
+        return []
+    return sorted(name[:-5] for name in os.listdir(store_dir)
+                  if name.endswith(".json") and _DATE_RE.match(name[:-5]))
+
+
+def previous_date(date, store_dir=STORE_DIR):
+    """date 之前最近的一份快照日期；没有时返回 None"""
+    earlier = [d for d in list_dates(store_dir) if d < date]
+    return earlier[-1] if earlier else None
+
+
+def new_entries(report, date, store_dir=STORE_DIR):
+    """
+    用本地快照补出「新上榜」：与 date 之前最近的一份快照对比。
+    返回 (TrendingDiff, 对比的日期)；没有更早的快照时返回 (None, None)。
+    """
+    against = previous_date(date, store_dir)
+    if against is None:
+        return None, None
+    return diff(report, load_snapshot(against, store_dir)), against
+
+
+# ---------- 命令行 ----------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GitHub Trending 榜单快照对比")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("diff", help="对比两天的榜单")
+    p.add_argument("--date", help="默认最新一份快照")
+    p.add_argument("--against", help="默认 --date 之前最近的一份快照")
+    args = parser.parse_args(argv)
+
+    dates = list_dates()
+    date = args.date or (dates[-1] if dates else None)
+    against = args.against or (previous_date(date) if date else None)
+    if not date or not against:
+        print(f"❌ {STORE_DIR}/ 下至少需要两份快照")
+        return 1
+
+    changes = diff(load_snapshot(date), load_snapshot(against))
+    print(f"📊 {against} -> {date}")
+    print(f"🆕 新上榜 {len(changes.entered)} 个")
+    for item in changes.entered:
+        print(f"   #{item.rank} {item.name}")
+    print(f"📉 跌出榜 {len(changes.exited)} 个")
+    for item in changes.exited:
+        print(f"   #{item.rank} {item.name}")
+    print(f"↕️ 排名变化 {len(changes.moved)} 个")
+    for item, old_rank, new_rank in sorted(changes.moved, key=lambda m: m[2]):
+        print(f"   {item.name}: #{old_rank} -> #{new_rank}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+GitHub Trending 日报解析
+get_github_trending_report 返回的 markdown 只从头到尾扫一遍：各段落的边界用 str.find 定位，
+不再对整篇文本反复 split 复制；解析的同时建好名字索引（原名 / 小写 owner/repo / 小写仓库名），
+新上榜匹配详情是 O(1) 查表（原来每个名字都要把整张表按小写比较一遍）。
+
+输出与原来的 main_github.parse_mcp_text 完全一致（包括各种边界情况）。
+
+用法：
+    import github_trending
+    report = github_trending.parse_report(md_text)
+    repo = report.lookup("Owner/Repo")          # 先精确匹配，再忽略大小写
+    new_names, details_map, simple_list = report.legacy()
+"""
+
+import re
+from dataclasses import dataclass, field
+
+# ================= 配置区 =================
+NEW_MARKER = "新上榜"
+DROPPED_MARKER = "跌出榜"
+LIST_MARKER = "今日榜单"
+REPO_MARKER = "### #"
+# ==========================================
+
+_NEW_ENTRY_RE = re.compile(r"-\s+#\d+\s+([^\n\r]+)")
+_DESC_PREFIX_RE = re.compile(r"\**简介\**:")
+
+
+@dataclass
+class TrendingRepo:
+    rank: str
+    name: str
+    stars: str = "N/A"
+    pr: str = "N/A"
+    lang: str = "Unknown"
+    desc: str = "暂无简介"
+
+    @property
+    def repo(self):
+        """不带 owner 的仓库名"""
+        return self.name.rsplit("/", 1)[-1]
+
+    def to_dict(self):
+        # 字段都是字符串，不用 asdict 的递归深拷贝
+        return {"rank": self.rank, "name": self.name, "stars": self.stars,
+                "pr": self.pr, "lang": self.lang, "desc": self.desc}
+
+
+@dataclass
+class TrendingReport:
+    new_names: list = field(default_factory=list)
+    repos: list = field(default_factory=list)       # 榜单顺序（重复出现的仓库保留每一条）
+    details: dict = field(default_factory=dict)     # 原名 -> TrendingRepo（重复时后出现的覆盖）
+    by_lower: dict = field(default_factory=dict)    # 小写 owner/repo -> 第一个出现的原名
+    by_repo: dict = field(default_factory=dict)     # 小写仓库名 -> [原名, ...]
+    has_new_section: bool = False                   # 日报里是否有「新上榜」段落（没有时可用本地快照对比补上）
+
+    def _add(self, item):
+        name = item.name
+        self.repos.append(item)
+        if name not in self.details:
+            lower = name.lower()
+            self.by_lower.setdefault(lower, name)
+            self.by_repo.setdefault(lower.rsplit("/", 1)[-1], []).append(name)
+        self.details[name] = item
+
+    def lookup(self, name):
+        """与旧逻辑一致：先精确匹配，再按小写比较取榜单里第一个匹配的仓库"""
+        item = self.details.get(name)
+        if item is None:
+            key = self.by_lower.get(name.lower())
+            item = self.details.get(key) if key is not None else None
+        return item
+
+    def lookup_repo(self, repo):
+        """按不带 owner 的仓库名查找（忽略大小写），可能有多个同名仓库"""
+        return [self.details[n] for n in self.by_repo.get(repo.rsplit("/", 1)[-1].lower(), [])]
+
+    def simple_list(self):
+        """「排名. 名字」列表（榜单顺序，发布正文用）"""
+        return [f"{item.rank}. {item.name}" for item in self.repos]
+
+    def legacy(self):
+        """旧接口的返回值：(new_names, all_details_map, simple_list_ordered)"""
+        details_map = {name: item.to_dict() for name, item in self.details.items()}
+        return self.new_names, details_map, self.simple_list()
+
+
+def _section(text, marker, start=0):
+    """marker 第一次出现之后、第二次出现之前的范围 (begin, end)；没有 marker 返回 None"""
+    pos = text.find(marker, start)
+    if pos < 0:
+        return None
+    begin = pos + len(marker)
+    end = text.find(marker, begin)
+    return begin, (end if end >= 0 else len(text))
+
+
+def _parse_new_names(text):
+    bounds = _section(text, NEW_MARKER)
+    if bounds is None:
+        return []
+    begin, end = bounds
+    # 新上榜段落到「跌出榜」为止；没有跌出榜时到「今日榜单」为止
+    stop = text.find(DROPPED_MARKER, begin, end)
+    if stop < 0:
+        stop = text.find(LIST_MARKER, begin, end)
+    if stop >= 0:
+        end = stop
+    return [m.group(1).strip() for m in _NEW_ENTRY_RE.finditer(text, begin, end)]
+
+
+def _parse_repo(chunk):
+    """一个「### #」块 -> TrendingRepo；标题行不完整时返回 None"""
+    lines = chunk.strip().split("\n")
+    parts = lines[0].strip().split(" ", 1)
+    if len(parts) < 2:
+        return None
+    item = TrendingRepo(rank=parts[0].strip(), name=parts[1].strip())
+    for line in lines[1:]:
+        if "⭐" in line:
+            cells = line.split("|")
+            item.stars = cells[0].replace("⭐", "").strip()
+            if len(cells) >= 2:
+                item.pr = cells[1].replace("PR:", "").strip()
+            if len(cells) >= 3:
+                item.lang = cells[2].strip()
+        if "简介" in line:
+            item.desc = _DESC_PREFIX_RE.sub("", line).strip()
+    return item
+
+
+def _parse_repos(text, report):
+    bounds = _section(text, LIST_MARKER)
+    if bounds is None:
+        return
+    pos, end = bounds
+    while pos <= end:
+        nxt = text.find(REPO_MARKER, pos, end)
+        chunk_end = nxt if nxt >= 0 else end
+        if not text[pos:chunk_end].isspace() and chunk_end > pos:
+            item = _parse_repo(text[pos:chunk_end])
+            if item is not None:
+                report._add(item)
+        if nxt < 0:
+            break
+        pos = nxt + len(REPO_MARKER)
+
+
+def from_repos(repos):
+    """由 TrendingRepo 列表（如本地快照）构建带索引的 TrendingReport"""
+    report = TrendingReport()
+    for item in repos:
+        report._add(item)
+    return report
+
+
+def parse_report(md_text):
+    """解析日报 markdown，返回 TrendingReport"""
+    report = TrendingReport()
+    if not md_text:
+        return report
+    text = md_text.replace("\\n", "\n")
+    report.has_new_section = NEW_MARKER in text
+    report.new_names = _parse_new_names(text)
+    _parse_repos(text, report)
+    return report
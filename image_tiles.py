@@ -0,0 +1,83 @@
+"""
+整页截图切片工具
+把一张纵向堆叠的多页截图按固定几何切成单页 PNG，编码放到进程池里并行完成。
+"""
+
+import io
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image
+
+import tracing
+
+# ================= 配置区 =================
+ENCODE_WORKERS = min(4, os.cpu_count() or 1)
+# ==========================================
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _encode_tile(mode, size, raw, path):
+    """子进程：把原始像素编码成 PNG 写盘"""
+    Image.frombytes(mode, size, raw).save(path, format="PNG")
+    return path
+
+
+def _get_pool():
+    """
+    编码进程池懒创建一次、之后复用。
+    调用方所在进程已经有浏览器线程在跑，fork 出的子进程可能继承其他线程持有的锁而卡死，
+    所以工作进程用 forkserver 启动（不支持的平台用 spawn）。
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=ENCODE_WORKERS, mp_context=multiprocessing.get_context(method))
+        return _pool
+
+
+def _reset_pool(pool):
+    """工作进程异常退出后进程池不可再用，丢掉让下次重建"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def tile_boxes(count, width, height, gap):
+    """第 i 页在整张截图中的区域：纵向依次排列，页间距 gap"""
+    return [(0, i * (height + gap), width, i * (height + gap) + height) for i in range(count)]
+
+
+@tracing.traced("tiles.slice_png", cat="encode")
+def slice_png(png_bytes, boxes, paths, workers=ENCODE_WORKERS):
+    """
+    解码一次整页截图，按 boxes 裁出各页，像素原样保留（不做颜色模式转换）。
+    workers <= 1 时在当前进程里串行编码，否则交给共用的编码进程池（ENCODE_WORKERS 个进程）。
+
+    Returns:
+        list: 写入的文件路径
+    """
+    image = Image.open(io.BytesIO(png_bytes))
+    image.load()
+    if boxes and (boxes[-1][2] > image.width or boxes[-1][3] > image.height):
+        raise ValueError(f"截图尺寸 {image.size} 小于预期的切片范围 {boxes[-1]}")
+
+    tiles = [image.crop(box) for box in boxes]
+    if workers <= 1 or len(tiles) <= 1:
+        return [_encode_tile(t.mode, t.size, t.tobytes(), p) for t, p in zip(tiles, paths)]
+
+    pool = _get_pool()
+    try:
+        futures = [pool.submit(_encode_tile, t.mode, t.size, t.tobytes(), p) for t, p in zip(tiles, paths)]
+        return [f.result() for f in futures]
+    except BrokenProcessPool:
+        _reset_pool(pool)
+        raise
@@ -1,14 +1,13 @@
 import os
-import glob
+import sys
+import importlib
 import subprocess
-import data
 from datetime import datetime # 引入时间模块
 from gen_cover import create_cover
 from gen_article import create_smart_slides
 from audit import perform_content_audit
-
-def get_absolute_path(filename):
-    return os.path.join(os.getcwd(), filename)
+import tracing
+import workspace
 
 def copy_to_clipboard(text):
     try:
@@ -19,72 +18,101 @@ def copy_to_clipboard(text):
     except Exception as e:
         print(f"⚠️ 剪贴板复制失败 (可能是非Mac系统): {e}")
 
-def run_automation():
-    # 安全审查：检查内容是否符合小红书规范
-    perform_content_audit()
+# ==========================================
+# 🧩 流水线阶段（run_all.py 的 DAG 调度器按阶段调用，ctx 在各阶段间传递数据）
+# 图片写到 ctx["workspace"]（本次运行独立的 runs/ph/<日期>/<运行编号>/），publish 时切换 latest
+# ==========================================
+@tracing.traced("ph.load", cat=tracing.STAGE)
+def stage_load(ctx):
+    """读取 data.py（由 Agent 按 MASTER_WORKFLOW 写入）"""
+    import data
+    importlib.reload(data) # 强制刷新，确保读到最新写入的数据
+    ctx["data"] = data
 
-    print("🚀 开始执行 PH 榜单生成任务...")
-    
     # --- 核心修改：获取电脑系统的真实日期 ---
+    now = datetime.now()
     # 格式：2025.11.22
-    today_date = datetime.now().strftime("%Y.%m.%d")
+    ctx["today_date"] = now.strftime("%Y.%m.%d")
     # 格式：2025年11月22日 (用于标题)
-    today_date_cn = datetime.now().strftime("%Y年%m月%d日")
-    
-    print(f"📅 锁定今日日期：{today_date}")
-    
+    ctx["today_date_cn"] = now.strftime("%Y年%m月%d日")
+    print(f"📅 锁定今日日期：{ctx['today_date']}")
+    ctx["workspace"] = workspace.create("ph", now.strftime("%Y-%m-%d"))
+    print(f"📁 本次输出目录：{ctx['workspace'].path}")
+    return data
+
+@tracing.traced("ph.audit", cat=tracing.STAGE)
+def stage_audit(ctx):
+    # 安全审查：检查内容是否符合小红书规范
+    return perform_content_audit()
+
+@tracing.traced("ph.cover", cat=tracing.STAGE)
+def stage_cover(ctx):
     # 1. 生成封面
     # 强制使用系统日期，无视 data.py 里的旧日期
-    create_cover(today_date, data.cover_data["summary"])
-    cover_path = get_absolute_path("final_cover.png")
-    
-    # 2. 生成长图
-    for f in glob.glob("slide_*.png"):
-        os.remove(f)
-    
+    cover = create_cover(ctx["today_date"], ctx["data"].cover_data["summary"], output_dir=ctx["workspace"].path)
+    ctx["cover_path"] = os.path.abspath(cover)
+    return ctx["cover_path"]
+
+@tracing.traced("ph.slides", cat=tracing.STAGE)
+def stage_slides(ctx):
+    # 2. 生成长图（本次运行的目录是新建的，不用先清理旧的 slide_*.png）
     # 确保长图标题的日期也自动更新
-    real_title = data.article_title
-    if "202" in real_title: 
-        real_title = f"Product Hunt 每日排行榜 - {today_date_cn}"
-        
+    real_title = ctx["data"].article_title
+    if "202" in real_title:
+        real_title = f"Product Hunt 每日排行榜 - {ctx['today_date_cn']}"
+
     # 注意：这里使用 data.article_content_formatted 生成图片，图片里要有详细内容
-    create_smart_slides(real_title, data.article_content_formatted)
-    
-    # 排序图片
-    slides = sorted(glob.glob("slide_*.png"), key=lambda x: int(x.split('_')[1].split('.')[0]))
-    slide_paths = [get_absolute_path(s) for s in slides]
-    
+    slides = create_smart_slides(real_title, ctx["data"].article_content_formatted, output_dir=ctx["workspace"].path)
+    ctx["slide_paths"] = [os.path.abspath(s) for s in slides]
+    return ctx["slide_paths"]
+
+@tracing.traced("ph.publish", cat=tracing.STAGE)
+def stage_publish(ctx):
     # 3. 拼装发布信息
-    all_images = [cover_path] + slide_paths
+    all_images = [ctx["cover_path"]] + ctx["slide_paths"]
     images_str = " ".join(f'"{img}"' for img in all_images)
-    
+
     # --- 关键修改：正文只保留榜单列表，去掉详细长文，符合小红书字数限制 ---
     # 格式严格按照你的要求：今日榜单（总榜）\n今日总榜（总榜前 20）...
-    full_body = f"今日榜单（总榜）\n\n{data.simple_list_text}"
+    full_body = f"今日榜单（总榜）\n\n{ctx['data'].simple_list_text}"
 
     # 4. 拼装 MCP 指令 - 恢复长标题
-    final_title = f"Product Hunt 每日排行榜 - {today_date_cn}"
+    final_title = f"Product Hunt 每日排行榜 - {ctx['today_date_cn']}"
 
     # 修改前（容易出错）：
     # tag=#产品[话题]# #ai[话题]# #agent[话题]# ...
-    
+
     # 修改后（更稳定）：
     # 只写关键词，让 MCP 自动去联想匹配
     mcp_command = f"""
 发布小红书笔记，标题={final_title} 正文={full_body}
 tag=#产品 #AI #Agent #排行榜 #效率工具 #独立开发 #数据 #科技 添加合集=Product Hunt 每日热榜 配图={images_str}
     """
-    
+
     print("\n" + "="*20 + " MCP 调用指令 " + "="*20)
     print(mcp_command.strip())
     print("="*50)
-    
+
     copy_to_clipboard(mcp_command.strip())
     print("📋 指令已复制到剪贴板！")
-    
+    ctx["workspace"].publish()
+    return mcp_command.strip()
+
+def run_automation():
+    ctx = {}
+    stage_load(ctx)
+
+    # 安全审查：检查内容是否符合小红书规范
+    stage_audit(ctx)
+
+    print("🚀 开始执行 PH 榜单生成任务...")
+    stage_cover(ctx)
+    stage_slides(ctx)
+    stage_publish(ctx)
+
     # 打开文件夹
-    cwd = os.getcwd()
-    os.system(f"open {cwd}")
+    os.system(f'open "{ctx["workspace"].path}"')
 
 if __name__ == "__main__":
-    run_automation()
\ No newline at end of file
+    tracing.setup(sys.argv[1:])
+    run_automation()
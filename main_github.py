@@ -1,21 +1,21 @@
 import os
-import glob
+import sys
 import subprocess
-import requests
-import re
 import json
 from datetime import datetime
 from gen_cover_github import create_github_cover
 from gen_article import create_smart_slides
+from pipeline import StageSkipped
+from mcp_client import get_client
+import github_trending
+import github_history
+import tracing
+import workspace
 
 # ================= 配置区域 =================
-PH_MCP_URL = "https://phmcpserver-widgetinp950-8gga8iii.leapcell.dev/mcp"
 PH_TOOL_NAME = "get_github_trending_report" 
 # ===========================================
 
-def get_absolute_path(filename):
-    return os.path.join(os.getcwd(), filename)
-
 def copy_to_clipboard(text):
     try:
         process = subprocess.Popen('pbcopy', env={'LANG': 'en_US.UTF-8'}, stdin=subprocess.PIPE)
@@ -25,73 +25,57 @@ def copy_to_clipboard(text):
 
 def fetch_data_from_leapcell():
     print("🕸️ 正在连接 MCP 服务器抓取数据...")
-    payload = {
-        "jsonrpc": "2.0",
-        "method": "tools/call",
-        "params": {"name": PH_TOOL_NAME, "arguments": {}},
-        "id": 1
-    }
     try:
-        response = requests.post(PH_MCP_URL, json=payload, timeout=60)
-        resp_json = response.json()
-        if "result" in resp_json and "content" in resp_json["result"]:
-            for item in resp_json["result"]["content"]:
-                if item.get("type") == "text":
-                    raw_text = item.get("text")
-                    try:
-                        inner_json = json.loads(raw_text)
-                        if "markdown_content" in inner_json:
-                            return inner_json["markdown_content"]
-                    except:
-                        return raw_text
+        result = get_client().call_tool(PH_TOOL_NAME)
+        for item in result["content"]:
+            if item.get("type") == "text":
+                raw_text = item.get("text")
+                try:
+                    inner_json = json.loads(raw_text)
+                    if "markdown_content" in inner_json:
+                        return inner_json["markdown_content"]
+                except:
+                    return raw_text
         return None
     except Exception as e:
         print(f"❌ 数据抓取失败: {e}")
         return None
 
+@tracing.traced("github.parse_markdown", cat="parse")
+def parse_report(md_text):
+    """解析逻辑见 github_trending.py"""
+    return github_trending.parse_report(md_text)
+
 def parse_mcp_text(md_text):
-    if not md_text: return [], {}, []
-    md_text = md_text.replace("\\n", "\n")
+    """返回 (新上榜名字列表, 名字 -> 详情 dict, 「排名. 名字」列表)"""
+    return parse_report(md_text).legacy()
 
-    # 1. 新上榜
-    new_names = []
-    try:
-        if "新上榜" in md_text:
-            part1 = md_text.split("新上榜")[1]
-            section = part1.split("跌出榜")[0] if "跌出榜" in part1 else part1.split("今日榜单")[0]
-            matches = re.findall(r"-\s+#\d+\s+([^\n\r]+)", section)
-            new_names = [m.strip() for m in matches]
-    except: pass
-
-    # 2. 详情
-    all_details_map = {}
-    simple_list_ordered = []
-    if "今日榜单" in md_text:
-        list_section = md_text.split("今日榜单")[1]
-        chunks = list_section.split("### #")
-        for chunk in chunks:
-            if not chunk.strip(): continue
-            lines = chunk.strip().split('\n')
-            if not lines: continue
-            parts = lines[0].strip().split(" ", 1)
-            if len(parts) < 2: continue
-            
-            item = {"rank": parts[0].strip(), "name": parts[1].strip(), "stars": "N/A", "pr": "N/A", "lang": "Unknown", "desc": "暂无简介"}
-            for line in lines[1:]:
-                if "⭐" in line:
-                    try:
-                        s = line.split("|")
-                        if len(s)>=1: item['stars'] = s[0].replace("⭐", "").strip()
-                        if len(s)>=2: item['pr'] = s[1].replace("PR:", "").strip()
-                        if len(s)>=3: item['lang'] = s[2].strip()
-                    except: pass
-                if "简介" in line:
-                    item['desc'] = re.sub(r"\**简介\**:", "", line).strip()
-            
-            all_details_map[item['name']] = item
-            simple_list_ordered.append(f"{item['rank']}. {item['name']}")
-
-    return new_names, all_details_map, simple_list_ordered
+def fill_new_names(report, date):
+    """
+    保存当天的完整榜单；日报缺少「新上榜」段落时，改用与之前快照的本地对比结果。
+    返回新上榜名字列表。
+    """
+    new_names = report.new_names
+    if not report.has_new_section:
+        try:
+            changes, against = github_history.new_entries(report, date)
+        except Exception as e:
+            changes, against = None, None
+            print(f"⚠️ 读取本地榜单快照失败: {e}")
+        if changes is None:
+            print("⚠️ 日报里没有「新上榜」段落，本地也没有更早的榜单快照可供对比")
+        else:
+            new_names = changes.entered_names
+            print(f"⚠️ 日报里没有「新上榜」段落，改用与 {against} 的本地快照对比："
+                  f"新上榜 {len(changes.entered)}，跌出榜 {len(changes.exited)}，排名变化 {len(changes.moved)}")
+
+    # 有榜单才保存，避免一份空的日报覆盖掉当天已有的快照
+    if report.repos:
+        try:
+            github_history.save_snapshot(date, report.repos)
+        except Exception as e:
+            print(f"⚠️ 保存榜单快照失败: {e}")
+    return new_names
 
 def generate_smart_headline(new_names):
     if not new_names: return "GitHub 热榜\n全球开发者关注的开源趋势"
@@ -99,65 +83,89 @@ def generate_smart_headline(new_names):
     names_str = "、".join(short_names[:-1]) + "和" + short_names[-1] if len(short_names) > 1 else short_names[0]
     return f"{names_str}强势上榜，\n引领今日开源技术新关注。"
 
-def format_slides_content(new_names, all_details_map):
+def format_slides_content(new_names, report):
+    """新上榜项目的长图 Markdown；名字用解析时建好的索引匹配（先精确，再忽略大小写），返回 (文本, 匹配到的个数)"""
     text = ""
     count = 0
     added = set()
     for name in new_names:
-        target = all_details_map.get(name)
-        if not target:
-            for k, v in all_details_map.items():
-                if name.lower() == k.lower():
-                    target = v; break
-        
-        if target and target['name'] not in added:
-            text += f"## {target['rank']}. {target['name']}\n"
-            text += f"**⭐ {target['stars']} | PR: {target['pr']} | 语言: {target['lang']}**\n"
-            text += f"> 简介：{target['desc']}\n\n"
-            added.add(target['name'])
+        target = report.lookup(name)
+        if target and target.name not in added:
+            text += f"## {target.rank}. {target.name}\n"
+            text += f"**⭐ {target.stars} | PR: {target.pr} | 语言: {target.lang}**\n"
+            text += f"> 简介：{target.desc}\n\n"
+            added.add(target.name)
             count += 1
     return text, count
 
-def run_github_automation():
-    print("🚀 AutoShare: GitHub Trending 自动发布任务启动")
-    
-    # 1. 抓取与解析
+# ==========================================
+# 🧩 流水线阶段（run_all.py 的 DAG 调度器按阶段调用，ctx 在各阶段间传递数据）
+# 图片写到 ctx["workspace"]（本次运行独立的 runs/github/<日期>/<运行编号>/），publish 时切换 latest
+# ==========================================
+class FetchFailed(RuntimeError):
+    """抓取阶段拿不到数据；流水线里按失败处理，单独运行时提示后退出"""
+
+
+@tracing.traced("github.fetch", cat=tracing.STAGE)
+def stage_fetch(ctx):
+    # 1. 抓取
     raw_md = fetch_data_from_leapcell()
-    if not raw_md: return
-    new_names, all_details_map, simple_list_ordered = parse_mcp_text(raw_md)
-    
+    if not raw_md:
+        raise FetchFailed("MCP 数据抓取失败")
+    ctx["raw_md"] = raw_md
+    return len(raw_md)
+
+@tracing.traced("github.parse", cat=tracing.STAGE)
+def stage_parse(ctx):
+    # 解析
+    now = datetime.now()
+    report = parse_report(ctx["raw_md"])
+    new_names = fill_new_names(report, now.strftime("%Y-%m-%d"))
+
     if not new_names:
-        print("🛑 今日无新上榜产品，跳过。")
-        return
-        
+        raise StageSkipped("今日无新上榜产品，跳过。")
+
     print(f"📊 发现 {len(new_names)} 个新产品，准备生成素材...")
 
-    # 2. 生成图片
-    today_date = datetime.now().strftime("%Y.%m.%d")
-    today_date_cn = datetime.now().strftime("%Y年%m月%d日")
-    
-    headline = generate_smart_headline(new_names)
-    cover_path = get_absolute_path(create_github_cover(today_date, headline))
-    
-    article_formatted, count = format_slides_content(new_names, all_details_map)
+    article_formatted, count = format_slides_content(new_names, report)
     if count == 0:
-        print("🛑 无法匹配详细信息，终止。")
-        return
-        
-    for f in glob.glob("slide_*.png"): os.remove(f)
-    create_smart_slides(f"GitHub Trending 新上榜 - {today_date_cn}", article_formatted)
-    
-    slides = sorted(glob.glob("slide_*.png"), key=lambda x: int(x.split('_')[1].split('.')[0]))
-    slide_paths = [get_absolute_path(s) for s in slides]
-    all_images = [cover_path] + slide_paths
-    
-    # 3. 准备发布内容
-    final_title = f"【GitHubTrending 热榜】{today_date_cn}"
-    simple_list_text = "\n".join(simple_list_ordered)
+        raise StageSkipped("无法匹配详细信息，终止。")
+
+    ctx["today_date"] = now.strftime("%Y.%m.%d")
+    ctx["today_date_cn"] = now.strftime("%Y年%m月%d日")
+    ctx["new_names"] = new_names
+    ctx["simple_list_ordered"] = report.simple_list()
+    ctx["article_formatted"] = article_formatted
+    ctx["workspace"] = workspace.create("github", now.strftime("%Y-%m-%d"))
+    print(f"📁 本次输出目录：{ctx['workspace'].path}")
+    return count
+
+@tracing.traced("github.cover", cat=tracing.STAGE)
+def stage_cover(ctx):
+    # 2. 生成封面
+    headline = generate_smart_headline(ctx["new_names"])
+    ctx["cover_path"] = os.path.abspath(create_github_cover(ctx["today_date"], headline, output_dir=ctx["workspace"].path))
+    return ctx["cover_path"]
+
+@tracing.traced("github.slides", cat=tracing.STAGE)
+def stage_slides(ctx):
+    # 3. 生成长图（本次运行的目录是新建的，不用先清理旧的 slide_*.png）
+    slides = create_smart_slides(f"GitHub Trending 新上榜 - {ctx['today_date_cn']}", ctx["article_formatted"],
+                                 output_dir=ctx["workspace"].path)
+    ctx["slide_paths"] = [os.path.abspath(s) for s in slides]
+    return ctx["slide_paths"]
+
+@tracing.traced("github.publish", cat=tracing.STAGE)
+def stage_publish(ctx):
+    all_images = [ctx["cover_path"]] + ctx["slide_paths"]
+
+    # 4. 准备发布内容
+    final_title = f"【GitHubTrending 热榜】{ctx['today_date_cn']}"
+    simple_list_text = "\n".join(ctx["simple_list_ordered"])
     full_body = f"今日总榜\n{simple_list_text}"
     tags = "#githubtrending #ai #ai工具 #AIGC #开发者选项 #算法 #自动化 #工作流 #转码 #开发"
 
-    # 4. 生成指令文本 (供 Agent 读取)
+    # 5. 生成指令文本 (供 Agent 读取)
     # 我们把图片路径列表转成 JSON 格式的字符串，方便 Agent 识别
     mcp_instruction = {
         "action": "publish_content",
@@ -165,17 +173,39 @@ def run_github_automation():
         "content": full_body + "\n\n" + tags,
         "images": all_images
     }
-    
+
     print("\n" + "="*20 + " 任务完成：请 Agent 执行以下指令 " + "="*20)
     # 这里直接打印出结构化的 JSON，方便 AI 读取
     print(json.dumps(mcp_instruction, indent=2, ensure_ascii=False))
     print("="*50)
-    
+
     # 同时复制一段可读性强的到剪贴板，给人看
     human_cmd = f"发布小红书 标题={final_title} 正文=... 图片数={len(all_images)}"
     copy_to_clipboard(human_cmd)
+    ctx["workspace"].publish()
+    return mcp_instruction
+
+def run_github_automation():
+    print("🚀 AutoShare: GitHub Trending 自动发布任务启动")
+    ctx = {}
+
+    try:
+        stage_fetch(ctx)
+    except FetchFailed as e:
+        print(f"❌ {e}")
+        return
+    try:
+        stage_parse(ctx)
+    except StageSkipped as e:
+        print(f"🛑 {e}")
+        return
+
+    stage_cover(ctx)
+    stage_slides(ctx)
+    stage_publish(ctx)
 
-    os.system(f"open {os.getcwd()}")
+    os.system(f'open "{ctx["workspace"].path}"')
 
 if __name__ == "__main__":
-    run_github_automation()
\ No newline at end of file
+    tracing.setup(sys.argv[1:])
+    run_github_automation()
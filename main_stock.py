@@ -1,99 +1,155 @@
 import os
 import sys
-import subprocess
-import importlib
-from datetime import datetime
+from pipeline import StageSkipped
+import market_calendar
+import tracing
+import workspace
 
 # ==========================================
 # 🛑 核心逻辑 1：美股休市自动检查
 # ==========================================
-def check_market_status():
+def is_market_closed():
     """
-    检查今天是否为美股休市对应的亚洲时间。
-    美股周六/周日休市 -> 对应亚洲时间 周日/周一。
+    检查最近一个已收盘的美东自然日是否休市（周末、NYSE 节假日、临时休市），规则见 market_calendar.py。
+    例如亚洲时间周日/周一早上对应美股周六/周日，感恩节次日早上对应感恩节当天。
     """
-    # weekday(): 0=周一, 6=周日
-    today_weekday = datetime.now().weekday()
-    
-    if today_weekday == 6 or today_weekday == 0:
+    return market_calendar.is_market_closed()
+
+def closed_message():
+    day = market_calendar.last_closed_day()
+    return f"美股 {day.isoformat()} 休市（{market_calendar.closed_reason(day)}），无新数据"
+
+def check_market_status():
+    if is_market_closed():
         print("\n" + "="*40)
-        print("💤 检测到今天是亚洲时间 周日/周一")
-        print("💤 对应美股周末休市，无新数据。")
+        print(f"💤 {closed_message()}")
         print("💤 任务自动跳过！")
         print("="*40 + "\n")
         sys.exit(0) # 正常退出，不报错
 
 # ==========================================
-# 🔄 核心逻辑 2：数据获取与生成
+# 🧩 流水线阶段（run_all.py 的 DAG 调度器按阶段调用，ctx 在各阶段间传递数据）
+# 图片写到 ctx["workspace"]（本次运行独立的 runs/stock/<交易日>/<运行编号>/），publish 时切换 latest；
+# ctx["trading_date"] 指定时读取那一天的快照（补跑），否则读最新快照
 # ==========================================
-def run_stock_automation():
-    # 1. 先检查是否休市
-    check_market_status()
+@tracing.traced("stock.market_check", cat=tracing.STAGE)
+def stage_market_check(ctx):
+    if is_market_closed():
+        raise StageSkipped(closed_message())
+    return True
 
-    print("🚀 开始执行美股日报任务...")
-
-    # 2. 强制获取最新数据 (调用 fetch_stock_data.py)
+@tracing.traced("stock.fetch", cat=tracing.STAGE)
+def stage_fetch(ctx):
+    # 强制获取最新数据 (这一步会写入 stock_snapshots/<交易日>.json)
     print("📡 正在从 MCP 服务器抓取最新美股数据...")
-    try:
-        # 这一步会重写 data_stock.py
-        subprocess.run(["python3", "fetch_stock_data.py"], check=True)
-    except subprocess.CalledProcessError:
-        print("❌ 数据获取失败，终止任务")
-        sys.exit(1)
+    import fetch_stock_data
+    if not fetch_stock_data.main():
+        raise RuntimeError("数据获取失败")
+    return True
 
-    # 3. 动态重新加载数据 (防止缓存)
-    try:
-        import data_stock
-        importlib.reload(data_stock) # 强制刷新，确保读到刚写入的数据
-        print(f"📅 获取数据日期：{data_stock.date_str}")
-
-        # 验证数据结构完整性
-        required_attrs = ['stock_list_text', 'stock_content_formatted', 'TOPICS', 'date_str', 'stock_data']
-        missing_attrs = [attr for attr in required_attrs if not hasattr(data_stock, attr)]
-        if missing_attrs:
-            print(f"❌ data_stock.py 缺少必要属性: {missing_attrs}")
-            sys.exit(1)
+@tracing.traced("stock.load", cat=tracing.STAGE)
+def stage_load(ctx):
+    # 读取快照（按文件修改时间缓存，不存在字节码缓存问题）
+    import stock_store
+    trading_date = ctx.get("trading_date")
+    snapshot = stock_store.load_snapshot(trading_date) if trading_date else stock_store.load_latest()
+    print(f"📅 获取数据日期：{snapshot.date}")
 
-        print("✅ 数据结构验证通过")
-    except ImportError:
-        print("❌ 找不到 data_stock.py，请检查数据获取步骤")
-        sys.exit(1)
-    except Exception as e:
-        print(f"❌ 数据加载失败: {e}")
-        sys.exit(1)
+    # 验证数据完整性
+    if not snapshot.records:
+        raise ValueError("美股快照中没有任何股票记录")
 
-    # 4. 生成封面
+    print("✅ 数据结构验证通过")
+    ctx["snapshot"] = snapshot
+    ctx["workspace"] = workspace.create("stock", snapshot.date)
+    print(f"📁 本次输出目录：{ctx['workspace'].path}")
+    return snapshot.date
+
+@tracing.traced("stock.cover", cat=tracing.STAGE)
+def stage_cover(ctx):
+    # 封面失败不影响长图（gen_stock_pw 也会生成封面），只给出警告
     print("🎨 正在生成美股封面...")
     try:
         from gen_cover_stock import generate_stock_cover
         # 直接调用封面生成函数
-        generate_stock_cover()
+        # 封面日期用快照的交易日，补跑旧日期时也是那一天的收盘
+        generate_stock_cover(output_dir=ctx["workspace"].path, session_date=ctx["snapshot"].date)
     except Exception as e:
         print(f"⚠️ 封面生成出错: {e}")
         # 如果不知道具体参数，可以根据你的 gen_cover_stock.py 自行调整
 
-    # 5. 生成长图
+@tracing.traced("stock.slides", cat=tracing.STAGE)
+def stage_slides(ctx):
     print("🎨 正在生成美股长图...")
+    # 调用 gen_stock_pw.py (Playwright 生成器)；AUTOSHARE_STOCK_RENDERER=pillow 时改用 gen_stock_pil 直接画图
+    import gen_stock_pw
+    gen_stock_pw.run_task(ctx["snapshot"], output_dir=ctx["workspace"].path, session_date=ctx["snapshot"].date)
+
+@tracing.traced("stock.publish", cat=tracing.STAGE)
+def stage_publish(ctx):
+    ctx["workspace"].publish()
+    print("\n" + "="*40)
+    print(f"✅ 美股图片生成完毕！保存在 {ctx['workspace'].path}")
+    print("="*40 + "\n")
+    return ctx["workspace"].path
+
+# ==========================================
+# 🔄 核心逻辑 2：数据获取与生成
+# ==========================================
+def run_stock_automation(trading_date=None):
+    """trading_date 指定时为补跑：直接用已保存的那一天的快照重新出图，不检查休市、不抓取"""
+    ctx = {"trading_date": trading_date}
+
+    if trading_date:
+        print(f"🔁 补跑 {trading_date} 的美股日报...")
+    else:
+        # 1. 先检查是否休市
+        check_market_status()
+
+        print("🚀 开始执行美股日报任务...")
+
+        # 2. 强制获取最新数据
+        try:
+            stage_fetch(ctx)
+        except Exception:
+            print("❌ 数据获取失败，终止任务")
+            sys.exit(1)
+
+    # 3. 读取最新数据快照
+    try:
+        stage_load(ctx)
+    except FileNotFoundError:
+        print("❌ 找不到美股数据快照，请检查数据获取步骤")
+        sys.exit(1)
+    except Exception as e:
+        print(f"❌ 数据加载失败: {e}")
+        sys.exit(1)
+
+    # 4. 生成封面
+    stage_cover(ctx)
+
+    # 5. 生成长图
     try:
-        # 调用 gen_stock_pw.py (Playwright 生成器)
-        # 假设该文件可以直接运行，或者有一个 run/create 函数
-        # 这里使用 subprocess 直接调用文件最稳妥，避免函数名猜错
-        subprocess.run(["python3", "gen_stock_pw.py"], check=True)
+        stage_slides(ctx)
     except Exception as e:
         print(f"❌ 长图生成失败: {e}")
         sys.exit(1)
 
     # 6. 成功提示
-    print("\n" + "="*40)
-    print("✅ 美股图片生成完毕！保存在 stock_output 文件夹")
-    print("="*40 + "\n")
+    stage_publish(ctx)
 
     # 打开文件夹方便查看
-    cwd = os.getcwd()
     try:
-        os.system(f"open {os.path.join(cwd, 'stock_output')}")
+        os.system(f'open "{ctx["workspace"].path}"')
     except:
         pass
 
 if __name__ == "__main__":
-    run_stock_automation()
\ No newline at end of file
+    # python main_stock.py [--date YYYY-MM-DD]
+    args = tracing.setup(sys.argv[1:])
+    date_arg = None
+    if len(args) >= 2 and args[0] == "--date":
+        date_arg = args[1]
+    elif args and args[0].startswith("--date="):
+        date_arg = args[0].split("=", 1)[1]
+    run_stock_automation(date_arg)
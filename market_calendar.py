@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+美股交易日历（NYSE）
+按年预先算好休市日和提前收盘日（13:00 收盘）并缓存，时间统一换算到 America/New_York 再判断，
+运行环境在亚洲哪个时区都不影响结果。
+
+规则：
+- 休市：元旦、马丁·路德·金纪念日、总统日、耶稣受难日、阵亡将士纪念日、六月节（2022 起）、独立日、
+  劳动节、感恩节、圣诞节；落在周六的提前到周五、落在周日的顺延到周一（元旦落在周六时不补休），
+  另加 SPECIAL_CLOSURES 里的临时休市（国葬日、飓风等）。
+- 提前收盘：独立日前一天（7 月 3 日为周一至周四）、感恩节次日、平安夜（12 月 24 日为周一至周四）。
+
+用法：
+    import market_calendar
+    market_calendar.last_trading_session()       # 最近一个已经收盘的交易日（美东日期）
+    market_calendar.is_market_closed()           # 最近一个已收盘的自然日是否休市（没有新的收盘数据）
+    market_calendar.is_trading_day(date(2025, 12, 25))   # False
+"""
+
+import sys
+import threading
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+# ================= 配置区 =================
+MARKET_TZ = ZoneInfo("America/New_York")
+REGULAR_CLOSE = time(16, 0)
+EARLY_CLOSE = time(13, 0)
+JUNETEENTH_SINCE = 2022
+
+# 临时休市（不在固定规则里）
+SPECIAL_CLOSURES = {
+    date(2012, 10, 29): "飓风桑迪",
+    date(2012, 10, 30): "飓风桑迪",
+    date(2018, 12, 5): "老布什国葬日",
+    date(2025, 1, 9): "卡特国葬日",
+}
+# ==========================================
+
+_lock = threading.Lock()
+_years = {}   # 年份 -> (休市日 {date: 名称}, 提前收盘日 set)
+
+
+# ---------- 节假日规则 ----------
+def _nth_weekday(year, month, weekday, n):
+    """某月第 n 个星期几（weekday: 0=周一）；n=-1 表示最后一个"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year, month + 1, 1) - timedelta(days=1) if month < 12 else date(year, 12, 31)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year):
+    """公历复活节（匿名算法）"""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = (h + l - 7 * m + 114) % 31 + 1
+    return date(year, month, day)
+
+
+def _observed(day):
+    """周六的节日提前到周五，周日的顺延到周一"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def _build_year(year):
+    holidays = {}
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:   # 元旦落在周六时 NYSE 不补休（上一年 12 月 31 日照常交易）
+        holidays[_observed(new_year)] = "元旦"
+    holidays[_nth_weekday(year, 1, 0, 3)] = "马丁·路德·金纪念日"
+    holidays[_nth_weekday(year, 2, 0, 3)] = "总统日"
+    holidays[_easter(year) - timedelta(days=2)] = "耶稣受难日"
+    holidays[_nth_weekday(year, 5, 0, -1)] = "阵亡将士纪念日"
+    if year >= JUNETEENTH_SINCE:
+        holidays[_observed(date(year, 6, 19))] = "六月节"
+    holidays[_observed(date(year, 7, 4))] = "独立日"
+    holidays[_nth_weekday(year, 9, 0, 1)] = "劳动节"
+    thanksgiving = _nth_weekday(year, 11, 3, 4)
+    holidays[thanksgiving] = "感恩节"
+    holidays[_observed(date(year, 12, 25))] = "圣诞节"
+    holidays.update({day: name for day, name in SPECIAL_CLOSURES.items() if day.year == year})
+
+    early = {thanksgiving + timedelta(days=1)}
+    for day in (date(year, 7, 3), date(year, 12, 24)):
+        if day.weekday() <= 3 and day not in holidays:
+            early.add(day)
+    return holidays, early
+
+
+def _tables(year):
+    tables = _years.get(year)
+    if tables is None:
+        with _lock:
+            tables = _years.setdefault(year, _build_year(year))
+    return tables
+
+
+def holidays(year):
+    """某年的休市日 {date: 名称}（只含工作日）"""
+    return {day: name for day, name in _tables(year)[0].items() if day.weekday() < 5}
+
+
+def early_closes(year):
+    """某年提前收盘（13:00）的交易日"""
+    return set(_tables(year)[1])
+
+
+# ---------- 查询 ----------
+def closed_reason(day):
+    """休市原因（周末或节日名）；交易日返回 None"""
+    if day.weekday() >= 5:
+        return "周末"
+    return _tables(day.year)[0].get(day)
+
+
+def is_trading_day(day):
+    return closed_reason(day) is None
+
+
+def is_early_close(day):
+    return day in _tables(day.year)[1]
+
+
+def session_close(day):
+    """某天的收盘时间（美东，带时区）；休市日按常规收盘时间计算"""
+    close = EARLY_CLOSE if is_early_close(day) else REGULAR_CLOSE
+    return datetime.combine(day, close, tzinfo=MARKET_TZ)
+
+
+def previous_trading_day(day):
+    """day 之前（不含 day）最近的交易日"""
+    day -= timedelta(days=1)
+    while not is_trading_day(day):
+        day -= timedelta(days=1)
+    return day
+
+
+def to_market_time(now=None):
+    """任意时区的时间换算成美东时间；不带时区的按本机时区理解，默认当前时间"""
+    if now is None:
+        return datetime.now(timezone.utc).astimezone(MARKET_TZ)
+    if now.tzinfo is None:
+        now = now.astimezone()
+    return now.astimezone(MARKET_TZ)
+
+
+def last_closed_day(now=None):
+    """now 之前最近一个「已经过了收盘时间」的自然日（美东日期），不管当天是否交易"""
+    now = to_market_time(now)
+    day = now.date()
+    return day if now >= session_close(day) else day - timedelta(days=1)
+
+
+def last_trading_session(now=None):
+    """now 之前最近一个已经收盘的交易日（美东日期）"""
+    day = last_closed_day(now)
+    return day if is_trading_day(day) else previous_trading_day(day)
+
+
+def session_date(value=None):
+    """
+    报告对应的交易日：value 可以是 date 或 YYYY-MM-DD 字符串（例如快照的交易日期，补跑时用它），
+    不传时按当前时间取最近一个已收盘的交易日
+    """
+    if value is None:
+        return last_trading_session()
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+
+def is_market_closed(now=None):
+    """
+    最近一个已收盘的自然日是否休市：是的话这次运行拿不到新的收盘数据，应当直接跳过。
+    例如亚洲时间周日 / 周一早上对应美东周六 / 周日，感恩节次日早上对应感恩节当天。
+    """
+    return not is_trading_day(last_closed_day(now))
+
+
+if __name__ == "__main__":
+    year = int(sys.argv[1]) if len(sys.argv) > 1 else date.today().year
+    print(f"📅 {year} 年 NYSE 休市日：")
+    for day, name in sorted(holidays(year).items()):
+        print(f"   {day.isoformat()} {name}")
+    print("⏰ 提前收盘（13:00）：")
+    for day in sorted(early_closes(year)):
+        print(f"   {day.isoformat()}")
+    session = last_trading_session()
+    print(f"🔔 最近一个已收盘的交易日：{session.isoformat()}（今天{'休市，跳过' if is_market_closed() else '有新数据'}）")
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+ph-mcp-server 的共享 JSON-RPC 客户端
+所有抓取脚本都通过这里访问 MCP：连接池复用 keep-alive 连接、gzip 压缩、
+每次调用都有超时、带抖动的重试，以及连续失败后的熔断。
+
+用法：
+    from mcp_client import get_client
+    result = get_client().call_tool_json("get_latest_products")
+
+    # 三个数据源并发抓取，总耗时 ≈ 最慢的那一个
+    from mcp_client import fetch_all
+    results = fetch_all()
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import threading
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import tracing
+
+# ================= 配置区 =================
+# 可用 AUTOSHARE_MCP_URL 指向其他服务器，例如本地替身 mock_mcp_server.py
+MCP_URL = os.environ.get("AUTOSHARE_MCP_URL", "https://phmcpserver-widgetinp950-8gga8iii.leapcell.dev/mcp")
+
+CONNECT_TIMEOUT = 10     # 建立连接超时（秒）
+READ_TIMEOUT = 60        # 等待响应超时（秒）
+MAX_RETRIES = 3          # 失败后最多重试次数（不含第一次）
+BACKOFF_BASE = 0.5       # 重试退避基数（秒），按 2^n 增长并加随机抖动
+BACKOFF_MAX = 8          # 单次退避上限（秒）
+POOL_SIZE = 8            # 连接池大小
+
+BREAKER_THRESHOLD = 5    # 连续失败这么多次后熔断
+BREAKER_COOLDOWN = 60    # 熔断后多少秒放行一次试探请求
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# 批量抓取：结果键 -> 工具名
+DEFAULT_BATCH = {
+    "products": "get_latest_products",
+    "stock": "get_latest_stock_news",
+    "github": "get_github_trending_report",
+}
+# ==========================================
+
+
+class MCPError(Exception):
+    """MCP 调用失败（网络错误重试耗尽、服务端返回 error、数据格式错误）"""
+
+
+class CircuitOpenError(MCPError):
+    """熔断中，直接拒绝请求"""
+
+
+class CircuitBreaker:
+    """
+    连续失败计数熔断器：closed → open → (冷却后) half-open → closed/open
+    只统计服务不可用（连接错误、超时、5xx）；half-open 时只放行一个试探请求，其余并发请求照常拒绝。
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        self._probe_started = None   # 试探请求发出的时间；试探中途异常退出时，超过 cooldown 允许下一个试探
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            now = time.monotonic()
+            if now - self._opened_at < self.cooldown:
+                raise CircuitOpenError(f"MCP 服务连续失败 {self._failures} 次，熔断中")
+            if self._probe_started is not None and now - self._probe_started < self.cooldown:
+                raise CircuitOpenError("MCP 服务熔断中，试探请求尚未返回")
+            # 冷却结束：只放行这一次试探请求，结果出来前其他请求仍被拒绝
+            self._probe_started = now
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probe_started is not None or self._failures >= self.threshold:
+                # 试探失败或连续失败达到阈值：重新熔断计时
+                self._opened_at = time.monotonic()
+                self._probe_started = None
+
+
+def _is_outage(error, status):
+    """连接错误、超时、5xx 算服务不可用；4xx 和响应体解析失败不算"""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, requests.HTTPError):
+        return status is None or status >= 500
+    return False
+
+
+class MCPClient:
+    def __init__(self, url=MCP_URL, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), max_retries=MAX_RETRIES):
+        self.url = url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.breaker = CircuitBreaker()
+        self._ids = itertools.count(1)
+        self._id_lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+        })
+
+    def _next_id(self):
+        with self._id_lock:
+            return next(self._ids)
+
+    @staticmethod
+    def _backoff(attempt):
+        # full jitter：在 [0, min(上限, 基数 * 2^n)] 之间随机等待，避免多个请求同时重试
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+    def request(self, method, params=None, timeout=None):
+        """发送一个 JSON-RPC 请求，返回 result 字段"""
+        payload = {
+            "jsonrpc": "2.0",
+            "id": self._next_id(),
+            "method": method,
+            "params": params or {},
+        }
+        timeout = timeout or self.timeout
+        last_error = None
+
+        for attempt in range(self.max_retries + 1):
+            self.breaker.before_call()
+            try:
+                with tracing.span(f"mcp.{method}", cat="fetch", attempt=attempt,
+                                  tool=payload["params"].get("name")):
+                    response = self.session.post(self.url, json=payload, timeout=timeout)
+                    if response.status_code in RETRY_STATUS:
+                        raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+                    response.raise_for_status()
+                    body = response.json()
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError, ValueError) as e:
+                status = e.response.status_code if isinstance(e, requests.HTTPError) and e.response is not None else None
+                if _is_outage(e, status):
+                    self.breaker.record_failure()
+                else:
+                    # 服务端有响应（4xx、返回的不是 JSON）：说明服务可用，不计入熔断
+                    self.breaker.record_success()
+                last_error = e
+                retryable = not isinstance(e, requests.HTTPError) or status is None or status in RETRY_STATUS
+                if not retryable or attempt >= self.max_retries:
+                    break
+                delay = self._backoff(attempt)
+                print(f"⚠️ MCP 请求失败 ({e})，{delay:.1f}s 后第 {attempt + 1} 次重试...")
+                time.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            if "error" in body:
+                raise MCPError(f"MCP 返回错误: {body['error']}")
+            if "result" not in body:
+                raise MCPError("MCP 返回数据格式错误：缺少 result")
+            return body["result"]
+
+        raise MCPError(f"MCP 请求失败: {last_error}")
+
+    def list_tools(self, timeout=None):
+        return self.request("tools/list", timeout=timeout).get("tools", [])
+
+    def call_tool(self, name, arguments=None, timeout=None):
+        """调用工具，返回 result（包含 content 列表）"""
+        result = self.request("tools/call", {"name": name, "arguments": arguments or {}}, timeout=timeout)
+        if "content" not in result:
+            raise MCPError(f"工具 {name} 返回数据格式错误：缺少 content")
+        return result
+
+    def call_tool_text(self, name, arguments=None, timeout=None):
+        """调用工具，返回第一段 text 内容"""
+        for item in self.call_tool(name, arguments, timeout)["content"]:
+            if item.get("type", "text") == "text" and "text" in item:
+                return item["text"]
+        raise MCPError(f"工具 {name} 没有返回文本内容")
+
+    def call_tool_json(self, name, arguments=None, timeout=None):
+        """调用工具，把返回的文本按 JSON 解析"""
+        text = self.call_tool_text(name, arguments, timeout)
+        try:
+            with tracing.span(f"mcp.decode:{name}", cat="parse", chars=len(text)):
+                return json.loads(text)
+        except ValueError as e:
+            raise MCPError(f"工具 {name} 返回的不是 JSON: {e}")
+
+    def batch(self, calls, timeout=None):
+        """
+        并发调用多个工具，总耗时约等于最慢的那一个。
+
+        Args:
+            calls (dict): 结果键 -> 工具名，或 结果键 -> (工具名, 参数)
+
+        Returns:
+            dict: 结果键 -> result；失败的键对应 MCPError 实例，不会影响其他调用
+        """
+        def run(spec):
+            name, arguments = (spec, None) if isinstance(spec, str) else spec
+            try:
+                return self.call_tool(name, arguments, timeout)
+            except MCPError as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=max(1, len(calls))) as pool:
+            futures = {key: pool.submit(run, spec) for key, spec in calls.items()}
+            return {key: future.result() for key, future in futures.items()}
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """进程内共享的客户端（共享连接池和熔断状态）"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = MCPClient()
+        return _client
+
+
+def fetch_all(calls=None, timeout=None):
+    """并发抓取 Product Hunt / 美股 / GitHub 三个数据源"""
+    return get_client().batch(calls or DEFAULT_BATCH, timeout=timeout)
+
+
+if __name__ == "__main__":
+    # 诊断：并发抓取三个数据源并打印耗时
+    start = time.perf_counter()
+    results = fetch_all()
+    elapsed = time.perf_counter() - start
+    ok = True
+    for key, result in results.items():
+        if isinstance(result, Exception):
+            ok = False
+            print(f"❌ {key}: {result}")
+        else:
+            size = sum(len(item.get("text", "")) for item in result["content"])
+            print(f"✅ {key}: {size} 字符")
+    print(f"⏱️ 并发抓取总耗时 {elapsed:.2f}s")
+    sys.exit(0 if ok else 1)
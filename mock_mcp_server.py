@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+本地 MCP 替身服务器（asyncio）
+离线开发和压测用：实现 tools/list 以及 get_latest_products / get_latest_stock_news /
+get_github_trending_report / publish_content 四个工具，数据来自录制的 fixture 或合成数据，
+可以注入延迟和错误，单进程即可承载大量并发连接（HTTP/1.1 keep-alive）。
+
+用法：
+    python mock_mcp_server.py serve                          # 合成数据，监听 127.0.0.1:18061
+    python mock_mcp_server.py serve --size 1000 --latency 200 --error-rate 0.1
+    python mock_mcp_server.py serve --fixtures fixtures/mcp  # 回放录制的数据
+    python mock_mcp_server.py record --out fixtures/mcp      # 从真实服务器录制 fixture
+    python mock_mcp_server.py loadtest --clients 50 --requests 1000
+
+让脚本连到替身服务器：
+    export AUTOSHARE_MCP_URL=http://127.0.0.1:18061/mcp
+    export AUTOSHARE_XHS_MCP_URL=http://127.0.0.1:18061/mcp
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+import synthetic_payloads as sp
+
+# ================= 配置区 =================
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 18061
+DEFAULT_FIXTURE_DIR = os.path.join("fixtures", "mcp")
+DEFAULT_SIZE = 20            # 合成数据的条数
+MAX_BODY_BYTES = 10 * 1024 * 1024
+BACKLOG = 1024
+# ==========================================
+
+TOOLS = [
+    {
+        "name": "get_latest_products",
+        "description": "获取最新的 Product Hunt 每日榜单",
+        "inputSchema": {"type": "object", "properties": {}},
+    },
+    {
+        "name": "get_latest_stock_news",
+        "description": "获取最新的美股涨跌新闻",
+        "inputSchema": {"type": "object", "properties": {}},
+    },
+    {
+        "name": "get_github_trending_report",
+        "description": "获取 GitHub Trending 日报（新上榜 / 跌出榜 / 今日榜单）",
+        "inputSchema": {"type": "object", "properties": {}},
+    },
+    {
+        "name": "publish_content",
+        "description": "发布小红书图文笔记",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "title": {"type": "string", "description": "笔记标题"},
+                "content": {"type": "string", "description": "笔记正文"},
+                "images": {"type": "array", "items": {"type": "string"}, "description": "图片的本地路径"},
+                "topics": {"type": "array", "items": {"type": "string"}, "description": "话题标签"},
+            },
+            "required": ["title", "content", "images"],
+        },
+    },
+]
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+def _text_result(text):
+    return {"content": [{"type": "text", "text": text}]}
+
+
+def synthetic_results(size=DEFAULT_SIZE, seed=sp.DEFAULT_SEED):
+    """工具名 -> tools/call 的 result，格式与真实服务器一致（text 里是 JSON 字符串）"""
+    return {
+        "get_latest_products": _text_result(json.dumps(sp.ph_api_payload(size, seed), ensure_ascii=False)),
+        "get_latest_stock_news": _text_result(json.dumps(sp.stock_news_payload(size, seed), ensure_ascii=False)),
+        "get_github_trending_report": _text_result(json.dumps(
+            {"markdown_content": sp.github_report_markdown(size, seed)}, ensure_ascii=False)),
+    }
+
+
+def load_fixtures(fixture_dir):
+    """读取录制的 <工具名>.json（内容是 tools/call 的 result），缺失的工具用合成数据补齐"""
+    results = {}
+    for tool in TOOLS:
+        path = os.path.join(fixture_dir, f"{tool['name']}.json")
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                results[tool["name"]] = json.load(f)
+    return results
+
+
+class MockMCPServer:
+    def __init__(self, results, latency_ms=0, jitter_ms=0, error_rate=0.0, rpc_error_rate=0.0, seed=None):
+        self.results = results
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rpc_error_rate = rpc_error_rate
+        self.rng = random.Random(seed)
+        self.published = []
+        self.stats = {"connections": 0, "requests": 0, "http_errors": 0, "rpc_errors": 0, "methods": {}}
+        self._server = None
+
+    # ---------- JSON-RPC ----------
+    def _rpc_error(self, req_id, code, message):
+        self.stats["rpc_errors"] += 1
+        return {"jsonrpc": "2.0", "id": req_id, "error": {"code": code, "message": message}}
+
+    def _call_tool(self, req_id, params):
+        name = params.get("name")
+        arguments = params.get("arguments") or {}
+        if name == "publish_content":
+            note_id = f"mock-{len(self.published) + 1:06d}"
+            self.published.append({"id": note_id, "arguments": arguments, "at": time.time()})
+            images = arguments.get("images") or []
+            text = f"发布成功（模拟）：{arguments.get('title', '')}，共 {len(images)} 张图片，笔记 ID {note_id}"
+            return {"jsonrpc": "2.0", "id": req_id, "result": _text_result(text)}
+        if name not in self.results:
+            return self._rpc_error(req_id, -32602, f"未知工具: {name}")
+        return {"jsonrpc": "2.0", "id": req_id, "result": self.results[name]}
+
+    def handle_rpc(self, message):
+        req_id = message.get("id")
+        method = message.get("method")
+        methods = self.stats["methods"]
+        methods[method] = methods.get(method, 0) + 1
+
+        if self.rpc_error_rate and self.rng.random() < self.rpc_error_rate:
+            return self._rpc_error(req_id, -32000, "注入的服务端错误")
+        if method == "initialize":
+            return {"jsonrpc": "2.0", "id": req_id, "result": {
+                "protocolVersion": "2024-11-05",
+                "capabilities": {"tools": {}},
+                "serverInfo": {"name": "autoshare-mock-mcp", "version": "1.0"},
+            }}
+        if method == "ping":
+            return {"jsonrpc": "2.0", "id": req_id, "result": {}}
+        if method == "tools/list":
+            return {"jsonrpc": "2.0", "id": req_id, "result": {"tools": TOOLS}}
+        if method == "tools/call":
+            return self._call_tool(req_id, message.get("params") or {})
+        return self._rpc_error(req_id, -32601, f"不支持的方法: {method}")
+
+    # ---------- HTTP ----------
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, 'OK')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def _read_request(self, reader):
+        """读取一个 HTTP 请求，连接关闭时返回 None"""
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        parts = request_line.decode("latin-1").split()
+        if len(parts) < 2:
+            return None
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+        length = int(headers.get("content-length") or 0)
+        if length > MAX_BODY_BYTES:
+            return parts[0], parts[1], headers, None
+        body = await reader.readexactly(length) if length else b""
+        return parts[0], parts[1], headers, body
+
+    async def handle_connection(self, reader, writer):
+        self.stats["connections"] += 1
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                self.stats["requests"] += 1
+
+                if body is None:
+                    await self._respond(writer, 413, {"error": "请求体过大"}, False)
+                    break
+                if method == "GET" and path.rstrip("/") == "/stats":
+                    await self._respond(writer, 200, self.snapshot_stats(), keep_alive)
+                elif method != "POST":
+                    await self._respond(writer, 405, {"error": "只支持 POST"}, keep_alive)
+                else:
+                    await self._handle_post(writer, body, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_post(self, writer, body, keep_alive):
+        delay = self.latency_ms + (self.rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.stats["http_errors"] += 1
+            await self._respond(writer, 503, {"error": "注入的 503"}, keep_alive)
+            return
+        try:
+            message = json.loads(body or b"{}")
+        except ValueError:
+            await self._respond(writer, 400, self._rpc_error(None, -32700, "JSON 解析失败"), keep_alive)
+            return
+        if isinstance(message, list):
+            payload = [self.handle_rpc(m) for m in message]
+        else:
+            payload = self.handle_rpc(message)
+        await self._respond(writer, 200, payload, keep_alive)
+
+    def snapshot_stats(self):
+        stats = dict(self.stats)
+        stats["methods"] = dict(self.stats["methods"])
+        stats["published"] = len(self.published)
+        return stats
+
+    # ---------- 生命周期 ----------
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self._server = await asyncio.start_server(self.handle_connection, host, port, backlog=BACKLOG)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        port = await self.start(host, port)
+        print(f"🧪 MCP 替身服务器已启动：http://{host}:{port}/mcp（统计：GET /stats，Ctrl+C 退出）")
+        async with self._server:
+            await self._server.serve_forever()
+
+
+def start_in_thread(results=None, host=DEFAULT_HOST, port=0, **options):
+    """
+    在后台线程里启动替身服务器（port=0 自动选端口），供压测脚本或临时联调使用。
+
+    Returns:
+        tuple: (url, server, stop)；调用 stop() 关闭服务器
+    """
+    server = MockMCPServer(results or synthetic_results(), **options)
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    bound = {}
+
+    def run():
+        asyncio.set_event_loop(loop)
+        bound["port"] = loop.run_until_complete(server.start(host, port))
+        started.set()
+        loop.run_forever()
+
+    thread = threading.Thread(target=run, name="mock-mcp", daemon=True)
+    thread.start()
+    started.wait()
+
+    def stop():
+        async def close():
+            server._server.close()
+            await server._server.wait_closed()
+        asyncio.run_coroutine_threadsafe(close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+
+    return f"http://{host}:{bound['port']}/mcp", server, stop
+
+
+# ---------- 命令行 ----------
+def record(out_dir):
+    """用真实服务器（或 AUTOSHARE_MCP_URL 指向的服务器）录制三个数据源的 result"""
+    from mcp_client import get_client, DEFAULT_BATCH
+    os.makedirs(out_dir, exist_ok=True)
+    ok = True
+    for key, tool in DEFAULT_BATCH.items():
+        try:
+            result = get_client().call_tool(tool)
+        except Exception as e:
+            ok = False
+            print(f"❌ {tool} 录制失败: {e}")
+            continue
+        path = os.path.join(out_dir, f"{tool}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=1)
+        print(f"✅ 已录制 {tool} → {path}")
+    return ok
+
+
+def loadtest(url, clients, total, tool):
+    """并发压测：clients 个线程共享一个 MCPClient，共发 total 次 tools/call"""
+    from mcp_client import MCPClient
+    client = MCPClient(url=url)
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(_):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            client.call_tool(tool)
+        except Exception:
+            with lock:
+                errors += 1
+            return
+        with lock:
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - start
+    client.close()
+
+    print(f"📊 {total} 次请求，{clients} 并发，耗时 {elapsed:.2f}s，吞吐 {total / elapsed:.1f} req/s，失败 {errors}")
+    if latencies:
+        latencies.sort()
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"   延迟 p50 {statistics.median(latencies):.1f}ms / p95 {p95:.1f}ms / 最大 {latencies[-1]:.1f}ms")
+    return errors == 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地 MCP 替身服务器")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = sub.add_parser("serve", help="启动替身服务器")
+    serve_parser.add_argument("--host", default=DEFAULT_HOST)
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument("--fixtures", help="录制的 fixture 目录（缺失的工具用合成数据）")
+    serve_parser.add_argument("--size", type=int, default=DEFAULT_SIZE, help="合成数据条数")
+    serve_parser.add_argument("--seed", type=int, default=sp.DEFAULT_SEED)
+    serve_parser.add_argument("--latency", type=float, default=0, help="每个请求的延迟（毫秒）")
+    serve_parser.add_argument("--jitter", type=float, default=0, help="延迟的随机抖动（± 毫秒）")
+    serve_parser.add_argument("--error-rate", type=float, default=0, help="返回 HTTP 503 的概率")
+    serve_parser.add_argument("--rpc-error-rate", type=float, default=0, help="返回 JSON-RPC error 的概率")
+
+    record_parser = sub.add_parser("record", help="从真实服务器录制 fixture")
+    record_parser.add_argument("--out", default=DEFAULT_FIXTURE_DIR)
+
+    load_parser = sub.add_parser("loadtest", help="对替身（或任意）服务器做并发压测")
+    load_parser.add_argument("--url", help="目标地址；不填则在进程内启动一个替身服务器")
+    load_parser.add_argument("--clients", type=int, default=20)
+    load_parser.add_argument("--requests", type=int, default=500)
+    load_parser.add_argument("--tool", default="get_latest_stock_news")
+    load_parser.add_argument("--size", type=int, default=DEFAULT_SIZE)
+    load_parser.add_argument("--latency", type=float, default=0)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        return 0 if record(args.out) else 1
+
+    if args.command == "loadtest":
+        stop = None
+        url = args.url
+        if not url:
+            url, _, stop = start_in_thread(synthetic_results(args.size), latency_ms=args.latency)
+        try:
+            return 0 if loadtest(url, args.clients, args.requests, args.tool) else 1
+        finally:
+            if stop:
+                stop()
+
+    results = synthetic_results(args.size, args.seed)
+    if args.fixtures:
+        recorded = load_fixtures(args.fixtures)
+        print(f"📼 已加载 {len(recorded)} 个录制的 fixture：{', '.join(recorded) or '无'}")
+        results.update(recorded)
+    server = MockMCPServer(results, args.latency, args.jitter, args.error_rate, args.rpc_error_rate, args.seed)
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    print(f"👋 已退出，统计：{json.dumps(server.snapshot_stats(), ensure_ascii=False)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
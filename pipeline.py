@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+流水线 DAG 调度器
+把各任务拆成有依赖关系的阶段（抓取 → 审查 → 封面 → 长图 → 发布指令），
+互不依赖的阶段在有上限的线程池里并发执行，单个阶段失败只会跳过它的下游，不影响其他任务。
+"""
+
+import time
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import render_service
+
+# ================= 配置区 =================
+DEFAULT_WORKERS = 4     # 普通阶段（网络 / CPU）的并发上限
+BROWSER_WORKERS = 2     # 浏览器阶段的并发上限（每个线程持有自己的渲染服务）
+# ==========================================
+
+# 阶段状态
+PENDING = "pending"
+SUCCESS = "success"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class StageSkipped(Exception):
+    """阶段主动放弃（例如休市、今日无新上榜），下游阶段随之跳过，但不算失败"""
+
+
+class Stage:
+    def __init__(self, name, func, deps=(), lane="default"):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.lane = lane
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        self.started_at = None
+        self.elapsed = 0.0
+
+
+class Pipeline:
+    """
+    用法：
+        pipe = Pipeline()
+        pipe.add("ph.fetch", fetch_func)
+        pipe.add("ph.cover", cover_func, deps=["ph.fetch"], lane="browser")
+        ok = pipe.run()
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, browser_workers=BROWSER_WORKERS):
+        self.stages = {}
+        self.max_workers = max_workers
+        self.browser_workers = browser_workers
+
+    def add(self, name, func, deps=(), lane="default"):
+        if name in self.stages:
+            raise ValueError(f"重复的阶段名: {name}")
+        self.stages[name] = Stage(name, func, deps, lane)
+        return self
+
+    def _validate(self):
+        for stage in self.stages.values():
+            for dep in stage.deps:
+                if dep not in self.stages:
+                    raise ValueError(f"阶段 {stage.name} 依赖了不存在的阶段 {dep}")
+
+        # 检查环
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"阶段依赖存在环: {name}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def _execute(self, stage):
+        stage.started_at = time.time()
+        start = time.perf_counter()
+        try:
+            stage.result = stage.func()
+            stage.status = SUCCESS
+        except StageSkipped as e:
+            stage.status = SKIPPED
+            stage.error = str(e)
+        except BaseException as e:
+            # 旧脚本里大量使用 sys.exit(1)，这里统一当作失败处理，不让它结束整个进程
+            stage.status = FAILED
+            stage.error = f"{type(e).__name__}: {e}"
+            if not isinstance(e, SystemExit):
+                traceback.print_exc()
+        finally:
+            stage.elapsed = time.perf_counter() - start
+        return stage
+
+    def _ready(self, stage):
+        return all(self.stages[d].status == SUCCESS for d in stage.deps)
+
+    def _blocked(self, stage):
+        return any(self.stages[d].status in (FAILED, SKIPPED) for d in stage.deps)
+
+    def run(self):
+        """执行整个 DAG，返回 True 表示没有阶段失败"""
+        self._validate()
+        pools = {
+            "default": ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage"),
+            "browser": ThreadPoolExecutor(max_workers=self.browser_workers, thread_name_prefix="browser"),
+        }
+        running = {}
+        total_start = time.perf_counter()
+
+        try:
+            while True:
+                # 依赖失败/跳过的阶段直接标记跳过（会级联到它的下游）
+                changed = True
+                while changed:
+                    changed = False
+                    for stage in self.stages.values():
+                        if stage.status == PENDING and stage.name not in running and self._blocked(stage):
+                            stage.status = SKIPPED
+                            stage.error = "上游阶段未完成"
+                            changed = True
+
+                for stage in self.stages.values():
+                    if stage.status == PENDING and stage.name not in running and self._ready(stage):
+                        pool = pools.get(stage.lane, pools["default"])
+                        print(f"▶️  [{stage.name}] 开始")
+                        running[stage.name] = pool.submit(self._execute, stage)
+
+                if not running:
+                    break
+
+                finished, _ = wait(list(running.values()), return_when=FIRST_COMPLETED)
+                for name, future in list(running.items()):
+                    if future in finished:
+                        del running[name]
+                        stage = future.result()
+                        icon = {SUCCESS: "✅", SKIPPED: "⏭️", FAILED: "❌"}[stage.status]
+                        detail = f" - {stage.error}" if stage.error else ""
+                        print(f"{icon} [{stage.name}] {stage.elapsed:.2f}s{detail}")
+        finally:
+            _drain_browser_lane(pools["browser"], self.browser_workers)
+            for pool in pools.values():
+                pool.shutdown(wait=True)
+
+        self.total_elapsed = time.perf_counter() - total_start
+        self.print_summary()
+        return not any(s.status == FAILED for s in self.stages.values())
+
+    def print_summary(self):
+        print("\n" + "=" * 40)
+        print("📊 阶段耗时汇总")
+        print("=" * 40)
+        for stage in sorted(self.stages.values(), key=lambda s: (s.started_at or float("inf"), s.name)):
+            icon = {SUCCESS: "✅", SKIPPED: "⏭️", FAILED: "❌", PENDING: "⏸️"}[stage.status]
+            print(f"{icon} {stage.name:<20} {stage.elapsed:>7.2f}s  {stage.status}")
+        print("-" * 40)
+        print(f"⏱️  总耗时 {self.total_elapsed:.2f}s")
+        print("=" * 40 + "\n")
+
+
+def _drain_browser_lane(pool, workers):
+    """
+    Playwright 同步对象绑定在创建它的线程上，只能由该线程关闭。
+    每个浏览器线程各领一个关闭任务：Barrier 保证同一个线程不会领到两个。
+    """
+    barrier = threading.Barrier(workers)
+
+    def close_in_thread():
+        try:
+            barrier.wait(timeout=5)
+        except threading.BrokenBarrierError:
+            pass
+        render_service.shutdown()
+
+    for future in [pool.submit(close_in_thread) for _ in range(workers)]:
+        future.result()
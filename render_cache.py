@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+内容寻址的渲染缓存
+缓存键 = hash(模板源码, 渲染后的 HTML, 视口, 引用的素材文件哈希)。
+命中时直接把上次渲染的 PNG 硬链接（跨盘时复制）到输出位置；所有页面都命中时完全不启动浏览器。
+按文件修改时间做 LRU，总大小超过上限时淘汰最久未用的条目（写入时累加大小，只在越过上限时才扫描目录）。
+背景图预处理（asset_cache）和字体子集化（font_subset）的版本号也计入缓存键，两者的输出变了旧截图自动失效。
+
+用法：
+    key = render_cache.make_key(template_source, html, viewport, assets=["assets/cover_bg.png"])
+    if not render_cache.fetch(key, "final_cover.png"):
+        ...渲染到 final_cover.png...
+        render_cache.store(key, "final_cover.png")
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import threading
+
+# ================= 配置区 =================
+CACHE_DIR = os.environ.get("AUTOSHARE_RENDER_CACHE_DIR", ".render_cache")
+MAX_CACHE_BYTES = 512 * 1024 * 1024   # 缓存总大小上限，超过后按 LRU 淘汰
+EVICT_TO_RATIO = 0.9                   # 一次淘汰到上限的 90%，留出余量，不会每次写入都触发扫描
+CACHE_VERSION = 2                      # 渲染逻辑有不兼容改动时加 1，让旧缓存全部失效
+# 设为 off 关闭缓存（每次都重新渲染）
+ENABLED = os.environ.get("AUTOSHARE_RENDER_CACHE", "on").lower() != "off"
+# ==========================================
+
+# 素材哈希的持久化索引：绝对路径 -> [mtime_ns, size, sha256]。
+# 系统字体（PingFang.ttc、Apple Color Emoji 近 200MB）只在第一次或文件变化后读一遍，之后的进程直接查表
+HASH_INDEX_FILE = "file_hashes.json"
+
+# (绝对路径, mtime_ns, size) -> sha256，避免每次都重新读大图/字体
+_asset_hashes = {}
+_hash_index = None
+_lock = threading.Lock()
+_pipeline_tag = None    # 素材预处理 / 字体子集化的版本，见 _pipeline_version
+_total_bytes = None     # 缓存总大小（本进程第一次写入时扫描一次，之后按写入累加）
+
+
+def _load_hash_index():
+    """读取磁盘上的哈希索引（只读一次）；缓存关闭或文件损坏时为空"""
+    global _hash_index
+    if _hash_index is None:
+        _hash_index = {}
+        if ENABLED:
+            try:
+                with open(os.path.join(CACHE_DIR, HASH_INDEX_FILE), "r", encoding="utf-8") as f:
+                    _hash_index = json.load(f)
+            except (OSError, ValueError):
+                pass
+    return _hash_index
+
+
+def _save_hash_index(path, entry):
+    """新算出的哈希写回索引：先合并磁盘上其他进程写入的条目，再原子替换"""
+    if not ENABLED:
+        return
+    index_path = os.path.join(CACHE_DIR, HASH_INDEX_FILE)
+    with _lock:
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                merged = json.load(f)
+        except (OSError, ValueError):
+            merged = {}
+        merged.update(_hash_index)
+        merged[path] = entry
+        _hash_index.update(merged)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{index_path}.tmp.{os.getpid()}.{threading.get_ident()}"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(merged, f)
+            os.replace(tmp_path, index_path)
+        except OSError:
+            pass
+
+
+def file_hash(path):
+    """素材文件的 sha256（按路径 + 修改时间 + 大小缓存在内存和 .render_cache/file_hashes.json 里）"""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    cache_key = (path, stat.st_mtime_ns, stat.st_size)
+    digest = _asset_hashes.get(cache_key)
+    if digest is not None:
+        return digest
+
+    saved = _load_hash_index().get(path)
+    if saved and saved[0] == stat.st_mtime_ns and saved[1] == stat.st_size:
+        digest = saved[2]
+    else:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        _save_hash_index(path, [stat.st_mtime_ns, stat.st_size, digest])
+    _asset_hashes[cache_key] = digest
+    return digest
+
+
+def _pipeline_version():
+    """
+    截图之前的素材处理流程的版本：背景图预处理和字体子集化的逻辑一改，同样的 HTML 也会渲染出不同的 PNG。
+    asset_cache / font_subset 都依赖本模块，这里延迟导入。
+    """
+    global _pipeline_tag
+    if _pipeline_tag is None:
+        import asset_cache
+        import font_subset
+        _pipeline_tag = f"v{CACHE_VERSION}:assets{asset_cache.CACHE_VERSION}:fonts{font_subset.CACHE_VERSION}"
+    return _pipeline_tag
+
+
+def make_key(template_source, html, viewport, assets=(), extra=""):
+    """计算缓存键；assets 为 HTML 引用的本地文件（背景图、字体等）"""
+    h = hashlib.sha256()
+    h.update(f"{_pipeline_version()}\0".encode())
+    h.update(hashlib.sha256(template_source.encode("utf-8")).digest())
+    h.update(hashlib.sha256(html.encode("utf-8")).digest())
+    h.update(json.dumps(viewport, sort_keys=True).encode())
+    for asset in sorted(assets):
+        h.update(file_hash(asset).encode() if os.path.exists(asset) else b"missing")
+    h.update(str(extra).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _entry_path(key, ext):
+    return os.path.join(CACHE_DIR, key[:2], key + ext)
+
+
+def _touch(path):
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+def prepare_output(path):
+    """删除已有的输出文件：输出可能是缓存条目的硬链接，绝不能原地覆盖写"""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def write_output(path, data):
+    """把渲染结果（字节）写到输出位置；同样先删旧文件，避免改到缓存条目"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    prepare_output(path)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def fetch(key, dest_path, ext=".png"):
+    """命中则把缓存文件放到 dest_path 并返回 True"""
+    if not ENABLED:
+        return False
+    entry = _entry_path(key, ext)
+    if not os.path.exists(entry):
+        return False
+
+    dest_dir = os.path.dirname(os.path.abspath(dest_path))
+    os.makedirs(dest_dir, exist_ok=True)
+    prepare_output(dest_path)
+    try:
+        os.link(entry, dest_path)
+    except OSError:
+        shutil.copyfile(entry, dest_path)
+    _touch(entry)
+    return True
+
+
+def store(key, src_path, ext=".png"):
+    """把刚渲染出的文件复制进缓存（先写临时文件再原子替换），然后按需淘汰"""
+    if not ENABLED or not os.path.exists(src_path):
+        return
+    entry = _entry_path(key, ext)
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+    tmp_path = f"{entry}.tmp.{os.getpid()}.{threading.get_ident()}"
+    shutil.copyfile(src_path, tmp_path)
+    _commit(tmp_path, entry)
+
+
+def store_bytes(key, data, ext=".png"):
+    """直接把内存里的渲染结果写进缓存"""
+    if not ENABLED:
+        return
+    entry = _entry_path(key, ext)
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+    tmp_path = f"{entry}.tmp.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    _commit(tmp_path, entry)
+
+
+def fetch_json(key):
+    """读取缓存的 JSON 元数据（例如分页结果），未命中返回 None"""
+    if not ENABLED:
+        return None
+    entry = _entry_path(key, ".json")
+    try:
+        with open(entry, "r", encoding="utf-8") as f:
+            value = json.load(f)
+    except (OSError, ValueError):
+        return None
+    _touch(entry)
+    return value
+
+
+def store_json(key, value):
+    if not ENABLED:
+        return
+    entry = _entry_path(key, ".json")
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+    tmp_path = f"{entry}.tmp.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(value, f)
+    _commit(tmp_path, entry)
+
+
+def _file_size(path):
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return 0
+
+
+def _commit(tmp_path, entry):
+    """原子替换进缓存并累加总大小；只有越过上限时才扫描目录淘汰"""
+    global _total_bytes
+    old_size = _file_size(entry)
+    os.replace(tmp_path, entry)
+    with _lock:
+        if _total_bytes is None:
+            _total_bytes = _scan()[1]
+        else:
+            _total_bytes += _file_size(entry) - old_size
+        over = _total_bytes > MAX_CACHE_BYTES
+    if over:
+        evict()
+
+
+def _scan():
+    """遍历缓存目录 -> ([(mtime, size, path), ...], 总大小)"""
+    entries = []
+    total = 0
+    for root, _, files in os.walk(CACHE_DIR):
+        for name in files:
+            if ".tmp." in name or name == HASH_INDEX_FILE:
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+    return entries, total
+
+
+def evict(max_bytes=None):
+    """总大小超过上限时，按最近使用时间（mtime）从旧到新删除；顺便校正累加的总大小（其他进程也会写缓存）"""
+    global _total_bytes
+    if max_bytes is None:
+        max_bytes = MAX_CACHE_BYTES
+    with _lock:
+        entries, total = _scan()
+        _total_bytes = total
+        if total <= max_bytes:
+            return 0
+
+        target = max_bytes * EVICT_TO_RATIO
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        _total_bytes = total
+        return removed
+
+
+def clear():
+    global _total_bytes
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    _total_bytes = None
+    _asset_hashes.clear()
+    if _hash_index is not None:
+        _hash_index.clear()
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == "clear":
+        clear()
+        print(f"🧹 已清空渲染缓存：{CACHE_DIR}")
+    else:
+        print("用法: python render_cache.py clear")
@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+共享的 Chromium 渲染服务
+所有生成器（封面 / 长图 / 美股页）都从这里拿页面，不再各自 launch 浏览器
+
+用法：
+    from render_service import acquire_page
+    with acquire_page({'width': 1245, 'height': 1660}) as page:
+        page.goto(...)
+
+HTML 直接从内存加载（不落地临时文件），相对路径的素材由请求拦截从进程内缓存返回：
+    with acquire_page({'width': 1245, 'height': 1660}) as page:
+        load_html(page, html, "stock_output/cover.html")   # 决定 ../assets 这类相对路径如何解析
+        png_bytes = page.screenshot()
+
+一个进程只有一个 Chromium：没有常驻浏览器时，第一个使用者在专用线程里启动一个开放随机 localhost CDP 端口的浏览器，
+各线程的同步服务和 async_render 都通过 CDP 连接它，每个线程只各自持有连接和 context。
+
+常驻模式（连续多次跑流水线时跳过浏览器冷启动）：
+    python render_service.py serve
+    之后所有脚本会自动探测 127.0.0.1:9333 并通过 CDP 连接这个常驻浏览器
+"""
+
+import os
+import sys
+import time
+import atexit
+import socket
+import weakref
+import threading
+import urllib.request
+from urllib.parse import urlsplit, unquote
+from contextlib import contextmanager
+from playwright.sync_api import sync_playwright
+
+import tracing
+import asset_cache
+import font_subset
+
+# ================= 配置区 =================
+# 回收策略
+MAX_PAGES_PER_BROWSER = 200   # 累计创建这么多页面后断开重连一次（浏览器由整个进程共用，不会重启）
+MAX_PAGE_USES = 50            # 单个页面最多复用次数，超过就关闭重建
+MAX_PAGE_HEAP_MB = 256        # 单个页面 JS 堆超过这个值就关闭重建
+POOL_SIZE = 4                 # 空闲页面池的最大容量
+
+# 常驻服务（localhost CDP）
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = int(os.environ.get("AUTOSHARE_RENDER_PORT", "9333"))
+# 显式指定常驻浏览器地址，例如 http://127.0.0.1:9333；设为 "off" 则不找常驻浏览器，始终在进程内启动
+ENDPOINT_ENV = "AUTOSHARE_RENDER_ENDPOINT"
+
+DEFAULT_VIEWPORT = {"width": 1245, "height": 1660}
+
+# 渲染就绪等待的硬上限（毫秒），超时也会继续截图
+READY_TIMEOUT_MS = 5000
+
+# 内存渲染使用的虚拟站点：文档和素材都挂在这个地址下，由请求拦截返回，不会真的发网络请求
+VIRTUAL_ORIGIN = "http://autoshare.local"
+# 设为 1 时把 load_html 加载的 HTML 同时写到对应路径，方便用浏览器打开排查
+DEBUG_HTML = os.environ.get("AUTOSHARE_DEBUG_HTML", "0").lower() in ("1", "on", "true")
+# ==========================================
+
+# 等待页面真正画完：字体加载完成 → 图片/背景图解码完成 → 连续两帧布局尺寸不变
+READY_JS = """
+async (timeoutMs) => {
+    const deadline = new Promise(resolve => setTimeout(() => resolve(false), timeoutMs));
+    const ready = (async () => {
+        // 1. 主动加载所有 @font-face 声明的字体，再等 document.fonts.ready
+        await Promise.all(Array.from(document.fonts).map(f => f.load().catch(() => null)));
+        await document.fonts.ready;
+
+        // 2. <img> 全部解码
+        await Promise.all(Array.from(document.images).map(img => img.decode().catch(() => null)));
+
+        // 3. CSS 背景图：收集所有 url(...) 并等它们解码
+        const urls = new Set();
+        for (const el of document.querySelectorAll('*')) {
+            const bg = getComputedStyle(el).backgroundImage;
+            if (!bg || bg === 'none') continue;
+            for (const m of bg.matchAll(/url\\(["']?(.*?)["']?\\)/g)) urls.add(m[1]);
+        }
+        await Promise.all(Array.from(urls).map(url => {
+            const img = new Image();
+            img.src = url;
+            return img.decode().catch(() => null);
+        }));
+
+        // 4. 布局稳定：连续两帧文档尺寸一致
+        const frame = () => new Promise(resolve => requestAnimationFrame(() => requestAnimationFrame(resolve)));
+        let last = null;
+        for (let i = 0; i < 30; i++) {
+            await frame();
+            const el = document.documentElement;
+            const size = el.scrollWidth + 'x' + el.scrollHeight;
+            if (size === last) break;
+            last = size;
+        }
+        return true;
+    })();
+    return Promise.race([ready, deadline]);
+}
+"""
+
+# Playwright 同步 API 的对象不能跨线程使用，所以每个线程各自持有一个服务实例（连接同一个浏览器）
+_local = threading.local()
+
+# 进程内共用的本地浏览器，没有常驻浏览器时由第一个使用者启动
+_host = None
+_host_lock = threading.Lock()
+
+# 页面 -> 当前加载的内存文档 {虚拟路径: HTML}；页面关闭后自动回收
+_documents = weakref.WeakKeyDictionary()
+
+
+def _probe_endpoint(endpoint):
+    """检查常驻浏览器是否在线"""
+    try:
+        with urllib.request.urlopen(f"{endpoint}/json/version", timeout=0.3) as response:
+            return response.status == 200
+    except Exception:
+        return False
+
+
+def _resolve_endpoint():
+    """决定是连接常驻浏览器还是本地启动，返回 CDP 地址或 None"""
+    endpoint = os.environ.get(ENDPOINT_ENV, "").strip()
+    if endpoint.lower() == "off":
+        return None
+    if not endpoint:
+        endpoint = f"http://{SERVICE_HOST}:{SERVICE_PORT}"
+    return endpoint if _probe_endpoint(endpoint) else None
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind((SERVICE_HOST, 0))
+        return sock.getsockname()[1]
+
+
+def _debugging_args(port):
+    return [f"--remote-debugging-port={port}", f"--remote-debugging-address={SERVICE_HOST}"]
+
+
+class _BrowserHost:
+    """在专用线程里启动本地浏览器并保持到进程退出；Playwright 同步对象只能由这个线程关闭"""
+
+    def __init__(self):
+        self.endpoint = None
+        self.error = None
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="render-browser", daemon=True)
+
+    def _run(self):
+        port = _free_port()
+        try:
+            with sync_playwright() as p:
+                with tracing.span("browser.launch", cat="browser"):
+                    browser = p.chromium.launch(args=_debugging_args(port))
+                self.endpoint = f"http://{SERVICE_HOST}:{port}"
+                self._ready.set()
+                self._stop.wait()
+                browser.close()
+        except Exception as e:
+            self.error = e
+        finally:
+            self._ready.set()
+
+    def start(self, timeout=60):
+        self._thread.start()
+        if not self._ready.wait(timeout):
+            raise RuntimeError(f"本地浏览器 {timeout}s 内没有启动")
+        if self.error:
+            raise self.error
+        return self.endpoint
+
+    def alive(self):
+        return self._thread.is_alive() and self.error is None and _probe_endpoint(self.endpoint)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=10)
+
+
+def browser_endpoint():
+    """
+    本进程渲染用的 CDP 地址：有常驻浏览器（serve）就用它，否则启动或复用进程内唯一的本地浏览器。
+    同步服务的每个线程和异步后端都连接这里，一次运行只有一个 Chromium。
+    """
+    global _host
+    endpoint = _resolve_endpoint()
+    if endpoint:
+        print(f"🔌 连接常驻浏览器：{endpoint}")
+        return endpoint
+    with _host_lock:
+        if _host is None or not _host.alive():
+            if _host is not None:
+                # 浏览器崩溃或被关掉了，换一个新的
+                _host.stop()
+            _host = _BrowserHost()
+            _host.start()
+        return _host.endpoint
+
+
+def _stop_host():
+    """进程退出时关闭本地浏览器（在各线程断开连接之后）"""
+    global _host
+    with _host_lock:
+        if _host is not None:
+            _host.stop()
+            _host = None
+
+
+class RenderService:
+    """持有一条到共用浏览器的连接和一组可复用的页面（每个页面独占一个 context）"""
+
+    def __init__(self):
+        self._playwright = None
+        self._browser = None
+        self._idle = []           # 空闲页面：[(page, uses), ...]
+        self._in_use = 0
+        self._pages_created = 0
+
+    # ---------- 浏览器生命周期 ----------
+    def _ensure_browser(self):
+        # 回收：累计页面数到上限且当前没有页面在用时，断开重连
+        if self._browser and self._pages_created >= MAX_PAGES_PER_BROWSER and self._in_use == 0:
+            print(f"♻️ 已创建 {self._pages_created} 个页面，回收重连...")
+            self._close_browser()
+
+        if self._browser and self._browser.is_connected():
+            return self._browser
+
+        if self._playwright is None:
+            self._playwright = sync_playwright().start()
+
+        endpoint = browser_endpoint()
+        with tracing.span("browser.connect", cat="browser", endpoint=endpoint):
+            self._browser = self._playwright.chromium.connect_over_cdp(endpoint)
+
+        self._idle = []
+        self._pages_created = 0
+        return self._browser
+
+    def _close_browser(self):
+        for page, _ in self._idle:
+            self._discard(page)
+        self._idle = []
+        if self._browser:
+            try:
+                # 通过 CDP 连接的浏览器，close() 只会断开连接并清理我们创建的 context
+                self._browser.close()
+            except Exception:
+                pass
+        self._browser = None
+
+    def close(self):
+        """断开当前线程的浏览器连接并关闭 Playwright"""
+        self._close_browser()
+        if self._playwright:
+            try:
+                self._playwright.stop()
+            except Exception:
+                pass
+        self._playwright = None
+
+    # ---------- 页面池 ----------
+    def _new_page(self, viewport):
+        browser = self._ensure_browser()
+        context = browser.new_context(viewport=viewport)
+        self._pages_created += 1
+        return context.new_page()
+
+    @staticmethod
+    def _discard(page):
+        try:
+            page.context.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _heap_mb(page):
+        try:
+            used = page.evaluate("performance.memory ? performance.memory.usedJSHeapSize : 0")
+            return used / (1024 * 1024)
+        except Exception:
+            return 0
+
+    def _release(self, page, uses, broken):
+        self._in_use -= 1
+        if broken or page.is_closed():
+            self._discard(page)
+            return
+        if uses >= MAX_PAGE_USES or len(self._idle) >= POOL_SIZE:
+            self._discard(page)
+            return
+        if self._heap_mb(page) > MAX_PAGE_HEAP_MB:
+            self._discard(page)
+            return
+        try:
+            page.goto("about:blank")
+        except Exception:
+            self._discard(page)
+            return
+        self._idle.append((page, uses))
+
+    @contextmanager
+    def acquire_page(self, viewport=None):
+        """借出一个页面，用完自动归还到池中（或按回收策略关闭）"""
+        viewport = viewport or DEFAULT_VIEWPORT
+        self._ensure_browser()
+
+        if self._idle:
+            page, uses = self._idle.pop()
+            page.set_viewport_size(viewport)
+        else:
+            page, uses = self._new_page(viewport), 0
+
+        self._in_use += 1
+        broken = False
+        try:
+            yield page
+        except BaseException:
+            # 出错的页面状态不可信，直接丢弃
+            broken = True
+            raise
+        finally:
+            self._release(page, uses + 1, broken)
+
+
+def wait_until_ready(page, timeout_ms=READY_TIMEOUT_MS):
+    """
+    等待页面渲染就绪（字体、图片、背景图、布局稳定），最多 timeout_ms 毫秒。
+    取代固定的 wait_for_timeout 睡眠：资源到齐立刻返回，不会截到半成品。
+
+    Returns:
+        bool: True 表示就绪，False 表示超时
+    """
+    with tracing.span("render.wait_ready", cat="render"):
+        ready = page.evaluate(READY_JS, timeout_ms)
+    if not ready:
+        print(f"⚠️ 页面渲染等待超过 {timeout_ms}ms，直接截图")
+    return ready
+
+
+def respond(documents, url):
+    """
+    虚拟站点的请求 -> (状态码, content_type, body)；同步和异步后端共用。
+    documents 为该页面当前加载的内存文档 {虚拟路径: HTML}。
+    """
+    path = unquote(urlsplit(url).path).lstrip("/")
+    document = documents.get(path)
+    if document is not None:
+        return 200, "text/html; charset=utf-8", document
+    if path.startswith(font_subset.URL_PREFIX):
+        body = font_subset.read_subset(path[len(font_subset.URL_PREFIX):])
+    else:
+        # 背景图直接返回预处理好的 1245×1660 版本，其余素材从内存缓存返回
+        body = asset_cache.read_asset(path)
+    if body is None:
+        return 404, "text/plain", ""
+    return 200, asset_cache.content_type(path), body
+
+
+def _install_route(page):
+    """给页面装上虚拟站点的请求拦截（每个页面只装一次）"""
+    def handle(route, request):
+        status, content_type, body = respond(_documents.get(page, {}), request.url)
+        route.fulfill(status=status, content_type=content_type, body=body)
+
+    page.route(f"{VIRTUAL_ORIGIN}/**", handle)
+
+
+def prepare_document(html, doc_path, debug_dir=None):
+    """
+    规范化虚拟路径、按需写出调试 HTML、换上子集字体；返回 (doc_path, html)。
+    调试 HTML 写到 debug_dir（本次运行的目录）下的同名文件，不传时写到虚拟路径本身。
+    """
+    doc_path = doc_path.replace(os.sep, "/").lstrip("/")
+    if DEBUG_HTML:
+        # 写出的是子集化之前的 HTML，直接用浏览器打开也能加载完整字体
+        debug_path = os.path.join(debug_dir, os.path.basename(doc_path)) if debug_dir else doc_path
+        os.makedirs(os.path.dirname(os.path.abspath(debug_path)), exist_ok=True)
+        with open(debug_path, "w", encoding="utf-8") as f:
+            f.write(html)
+        print(f"🐞 调试 HTML 已写入：{debug_path}")
+    return doc_path, font_subset.subset_html(html, doc_path)
+
+
+def load_html(page, html, doc_path="index.html", timeout_ms=READY_TIMEOUT_MS, debug_dir=None):
+    """
+    从内存加载 HTML 并等待渲染就绪，不写任何临时文件。
+    doc_path 是文档的虚拟路径（相对项目根目录），HTML 里的相对地址按它解析：
+    例如 "stock_output/cover.html" 里的 ../assets/stock_bg.png 会映射到 assets/stock_bg.png。
+    虚拟路径与实际输出目录无关；AUTOSHARE_DEBUG_HTML=1 时调试 HTML 写到 debug_dir 下。
+    @font-face 引用的本地字体会换成只包含页面文字的子集（见 font_subset.py）。
+    """
+    doc_path, html = prepare_document(html, doc_path, debug_dir)
+    if page not in _documents:
+        _install_route(page)
+    _documents[page] = {doc_path: html}
+
+    with tracing.span("render.load_html", cat="render", doc=doc_path):
+        page.goto(f"{VIRTUAL_ORIGIN}/{doc_path}")
+    return wait_until_ready(page, timeout_ms)
+
+
+def get_service():
+    """获取当前线程的渲染服务（懒加载，第一次借页面时才启动浏览器）"""
+    service = getattr(_local, "service", None)
+    if service is None:
+        service = RenderService()
+        _local.service = service
+    return service
+
+
+def acquire_page(viewport=None):
+    """快捷方式：从当前线程的渲染服务借一个页面"""
+    return get_service().acquire_page(viewport)
+
+
+def shutdown():
+    """关闭当前线程的渲染服务；工作线程结束前应自行调用"""
+    service = getattr(_local, "service", None)
+    if service is not None:
+        service.close()
+        _local.service = None
+
+
+# atexit 后注册的先执行：先断开各服务的连接，最后再关浏览器
+atexit.register(_stop_host)
+atexit.register(shutdown)
+
+
+def serve(port=SERVICE_PORT):
+    """常驻模式：启动一个开放 localhost CDP 端口的浏览器，直到 Ctrl+C"""
+    print(f"🚀 渲染服务常驻模式启动：http://{SERVICE_HOST}:{port}")
+    with sync_playwright() as p:
+        browser = p.chromium.launch(args=_debugging_args(port))
+        print("✅ 浏览器已就绪，后续流水线会自动连接（Ctrl+C 退出）")
+        try:
+            while browser.is_connected():
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        browser.close()
+    print("👋 渲染服务已退出")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        serve(int(sys.argv[2]) if len(sys.argv) > 2 else SERVICE_PORT)
+    else:
+        print("用法: python render_service.py serve [port]")
@@ -1,30 +1,67 @@
-import os
 import sys
+from functools import partial
+
+import main
+import main_github
+import main_stock
+from pipeline import Pipeline
+import tracing
+
+def build_pipeline():
+    """
+    三个任务的阶段依赖图：
+        PH:     load → audit → cover / slides → publish
+        GitHub: fetch → parse → cover / slides → publish
+        美股:   market_check → fetch → load → cover → slides → publish
+    三个来源的抓取互不依赖，会并发执行；浏览器阶段在 browser 通道里并发。
+    每个任务的图片写到自己的 runs/<任务>/<日期>/<运行编号>/（见 workspace.py），互不覆盖。
+    """
+    pipe = Pipeline()
+
+    # 1. Product Hunt
+    ph = {}
+    pipe.add("ph.load", partial(main.stage_load, ph))
+    pipe.add("ph.audit", partial(main.stage_audit, ph), deps=["ph.load"])
+    pipe.add("ph.cover", partial(main.stage_cover, ph), deps=["ph.audit"], lane="browser")
+    pipe.add("ph.slides", partial(main.stage_slides, ph), deps=["ph.audit"], lane="browser")
+    pipe.add("ph.publish", partial(main.stage_publish, ph), deps=["ph.cover", "ph.slides"])
+
+    # 2. GitHub Trending
+    gh = {}
+    pipe.add("github.fetch", partial(main_github.stage_fetch, gh))
+    pipe.add("github.parse", partial(main_github.stage_parse, gh), deps=["github.fetch"])
+    pipe.add("github.cover", partial(main_github.stage_cover, gh), deps=["github.parse"], lane="browser")
+    pipe.add("github.slides", partial(main_github.stage_slides, gh), deps=["github.parse"], lane="browser")
+    pipe.add("github.publish", partial(main_github.stage_publish, gh), deps=["github.cover", "github.slides"])
+
+    # 3. 美股日报
+    # 封面 (Pillow) 与长图 (Playwright) 都会写本次运行目录里的 cover_final.png，
+    # 保持原来的先后顺序，让 Playwright 版本作为最终封面
+    stock = {}
+    pipe.add("stock.market_check", partial(main_stock.stage_market_check, stock))
+    pipe.add("stock.fetch", partial(main_stock.stage_fetch, stock), deps=["stock.market_check"])
+    pipe.add("stock.load", partial(main_stock.stage_load, stock), deps=["stock.fetch"])
+    pipe.add("stock.cover", partial(main_stock.stage_cover, stock), deps=["stock.load"])
+    pipe.add("stock.slides", partial(main_stock.stage_slides, stock), deps=["stock.cover"], lane="browser")
+    pipe.add("stock.publish", partial(main_stock.stage_publish, stock), deps=["stock.slides"])
+
+    return pipe
 
 def run_generation():
     print("\n" + "="*40)
     print("🏭 工厂启动：开始生成图片素材...")
     print("="*40 + "\n")
 
-    # 1. 生成 Product Hunt 图片
-    print("📦 [1/2] 正在执行 PH 生成脚本...")
-    exit_code_ph = os.system("python main.py")
-    if exit_code_ph != 0:
-        print("❌ PH 生成失败！")
-        sys.exit(1)
-
-    print("\n" + "-"*20 + "\n")
-
-    # 2. 生成 美股日报 图片
-    print("📈 [2/2] 正在执行 美股 生成脚本...")
-    exit_code_stock = os.system("python main_stock.py")
-    if exit_code_stock != 0:
-        print("❌ 美股 生成失败！")
-        sys.exit(1)
+    ok = build_pipeline().run()
 
     print("\n" + "="*40)
-    print("✅ 素材生产完成！准备移交发布 MCP...")
+    if ok:
+        print("✅ 素材生产完成！准备移交发布 MCP...")
+    else:
+        print("⚠️ 部分任务失败，其余素材已生成，请查看上方汇总")
     print("="*40 + "\n")
+    return ok
 
 if __name__ == "__main__":
-    run_generation()
\ No newline at end of file
+    tracing.setup(sys.argv[1:])
+    sys.exit(0 if run_generation() else 1)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+美股历史数据库（SQLite，WAL 模式）
+stock_snapshots/ 只按交易日存当天的快照，这里把每天每只股票的记录都存进一个本地数据库，
+主键 (trading_date, name)，按日期 + 涨跌幅、按股票 + 日期各建一个索引，一年的历史查询也是毫秒级。
+封面标题、长图要用「连涨几天」「本周涨最多」这类趋势信息时直接查库，不用再请求 MCP 服务器。
+
+MCP 数据里没有股票代码，股票用公司名标识；当天只有涨跌幅较大的股票会出现在数据里，
+所以某只股票中间缺的交易日视为「没有出现」，连涨 / 连跌在缺席的那天中断。
+
+用法：
+    import stock_history
+    stock_history.record_snapshot(snapshot)            # 一个事务批量写入当天全部记录
+    stock_history.streaks(min_days=3)                  # 截至最新交易日的连涨 / 连跌
+    stock_history.moves(days=5)                        # 最近 5 个交易日的累计涨跌幅
+    stock_history.week_movers()                        # 本周涨 / 跌最多的股票
+
+命令行：
+    python stock_history.py import                     # 把 stock_snapshots/ 里已有的快照导入数据库
+    python stock_history.py streaks [--date YYYY-MM-DD] [--min-days 3]
+    python stock_history.py moves [--days 5] [--date YYYY-MM-DD]
+    python stock_history.py week [--date YYYY-MM-DD]
+"""
+
+import os
+import sys
+import sqlite3
+import argparse
+import threading
+import contextlib
+from datetime import date as date_cls, timedelta
+
+import stock_store
+
+# ================= 配置区 =================
+# 设为 off 时不写入历史库
+DB_PATH = os.environ.get("AUTOSHARE_STOCK_HISTORY", "stock_history.sqlite3")
+ENABLED = DB_PATH.lower() != "off"
+BUSY_TIMEOUT_S = 10      # 其他进程正在写入时最多等待的秒数
+DEFAULT_LIMIT = 10
+# ==========================================
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily (
+    trading_date   TEXT    NOT NULL,   -- YYYY-MM-DD
+    name           TEXT    NOT NULL,
+    change_percent REAL    NOT NULL,   -- 下跌为负数
+    previous_close REAL    NOT NULL,
+    price          REAL    NOT NULL,
+    is_up          INTEGER NOT NULL,
+    PRIMARY KEY (trading_date, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_daily_date_change ON daily (trading_date, change_percent);
+CREATE INDEX IF NOT EXISTS idx_daily_name_date ON daily (name, trading_date);
+-- 交易日列表单独存一份，取「最近 N 个交易日」不用扫描整张 daily
+CREATE TABLE IF NOT EXISTS trading_days (
+    trading_date TEXT PRIMARY KEY,
+    records      INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+_lock = threading.Lock()
+_initialized = set()   # 已建好表的数据库路径
+
+
+@contextlib.contextmanager
+def connect(db_path=DB_PATH):
+    """打开数据库（WAL 模式，首次使用时建表）；with 块结束时关闭连接"""
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_S)
+    try:
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with _lock:
+            if db_path not in _initialized:
+                # journal_mode 会写进数据库文件，只需设置一次
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                _initialized.add(db_path)
+        yield conn
+    finally:
+        conn.close()
+
+
+# ---------- 写入 ----------
+def record_snapshot(snapshot, db_path=DB_PATH):
+    """把一个交易日的快照整体写入（同一天重复写入时先删掉旧记录），返回写入的条数"""
+    rows = [(snapshot.date, r.name, r.change_percent, r.previous_close, r.price, int(r.is_up))
+            for r in snapshot.records]
+    with connect(db_path) as conn:
+        with conn:   # 一个事务：要么整天写入，要么不变
+            conn.execute("DELETE FROM daily WHERE trading_date = ?", (snapshot.date,))
+            conn.executemany(
+                "INSERT OR REPLACE INTO daily (trading_date, name, change_percent, previous_close, price, is_up) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows)
+            conn.execute("INSERT OR REPLACE INTO trading_days (trading_date, records) VALUES (?, ?)",
+                         (snapshot.date, len(rows)))
+    return len(rows)
+
+
+def import_snapshots(store_dir=stock_store.STORE_DIR, db_path=DB_PATH):
+    """把 stock_snapshots/ 里已有的全部快照导入数据库，返回 (天数, 记录数)"""
+    days = total = 0
+    for trading_date in stock_store.list_dates(store_dir):
+        total += record_snapshot(stock_store.load_snapshot(trading_date, store_dir), db_path)
+        days += 1
+    return days, total
+
+
+# ---------- 查询 ----------
+def trading_dates(db_path=DB_PATH):
+    """库里已有的交易日（升序）"""
+    with connect(db_path) as conn:
+        return [row[0] for row in conn.execute("SELECT trading_date FROM trading_days ORDER BY trading_date")]
+
+
+def latest_date(db_path=DB_PATH):
+    with connect(db_path) as conn:
+        return conn.execute("SELECT MAX(trading_date) FROM trading_days").fetchone()[0]
+
+
+def history(name, days=30, db_path=DB_PATH):
+    """某只股票最近 days 条记录（按日期升序）"""
+    with connect(db_path) as conn:
+        rows = conn.execute(
+            "SELECT * FROM daily WHERE name = ? ORDER BY trading_date DESC LIMIT ?", (name, days)).fetchall()
+    return [dict(row) for row in reversed(rows)]
+
+
+def streaks(date=None, min_days=2, limit=DEFAULT_LIMIT, db_path=DB_PATH):
+    """
+    截至 date（默认最新交易日）仍在持续的连涨 / 连跌，按天数、累计涨跌幅排序。
+    返回 [{"name", "is_up", "days", "start_date", "move_percent"}, ...]，move_percent 按首日昨收和当天价格计算。
+
+    从最近的交易日逐天往前看（每天一次主键范围查询），所有股票的连续段都断了就停，
+    不需要扫描整段历史。
+    """
+    with connect(db_path) as conn:
+        dates = conn.execute(
+            "SELECT trading_date FROM trading_days WHERE trading_date <= COALESCE(?, trading_date) "
+            "ORDER BY trading_date DESC", (date,))
+        day_query = "SELECT name, is_up, previous_close, price FROM daily WHERE trading_date = ?"
+        latest = next(dates, None)
+        if latest is None:
+            return []
+        # name -> [is_up, 天数, 起始日, 起始日昨收, 最新价格]
+        alive = {name: [is_up, 1, latest[0], previous_close, price]
+                 for name, is_up, previous_close, price in conn.execute(day_query, latest)}
+        ended = []
+        for (day,) in dates:
+            if not alive:
+                break
+            still = {}
+            for name, is_up, previous_close, _ in conn.execute(day_query, (day,)):
+                streak = alive.get(name)
+                if streak is not None and streak[0] == is_up:
+                    streak[1] += 1
+                    streak[2], streak[3] = day, previous_close
+                    still[name] = streak
+            ended.extend((name, streak) for name, streak in alive.items() if name not in still)
+            alive = still
+        ended.extend(alive.items())
+
+    result = []
+    for name, (is_up, days, start_date, previous_close, price) in ended:
+        if days >= min_days and previous_close > 0:
+            result.append({"name": name, "is_up": bool(is_up), "days": days, "start_date": start_date,
+                           "move_percent": (price / previous_close - 1) * 100})
+    result.sort(key=lambda row: (-row["days"], -abs(row["move_percent"])))
+    return result[:limit]
+
+
+def moves(days=5, date=None, start_date=None, limit=DEFAULT_LIMIT, up=True, db_path=DB_PATH):
+    """
+    累计涨跌幅排行：截至 date（默认最新交易日）的最近 days 个交易日，或 [start_date, date] 区间。
+    每只股票从区间内第一次出现时的昨收算到最后一次出现时的价格。
+    up=True 只返回累计上涨的（涨幅降序），up=False 只返回累计下跌的（跌幅降序）。
+    返回 [{"name", "days", "first_date", "last_date", "previous_close", "price", "move_percent"}, ...]
+    """
+    if start_date:
+        window = "SELECT trading_date FROM trading_days WHERE trading_date BETWEEN :start AND :date"
+    else:
+        window = ("SELECT trading_date FROM trading_days WHERE trading_date <= :date "
+                  "ORDER BY trading_date DESC LIMIT :days")
+    sql = f"""
+    WITH span_dates AS ({window}),
+    span AS (
+        SELECT name, COUNT(*) AS days, MIN(trading_date) AS first_date, MAX(trading_date) AS last_date
+        FROM daily WHERE trading_date IN (SELECT trading_date FROM span_dates)
+        GROUP BY name
+    )
+    SELECT s.name, s.days, s.first_date, s.last_date, a.previous_close, b.price,
+           (b.price / a.previous_close - 1) * 100 AS move_percent
+    FROM span s
+    JOIN daily a ON a.trading_date = s.first_date AND a.name = s.name
+    JOIN daily b ON b.trading_date = s.last_date AND b.name = s.name
+    WHERE a.previous_close > 0 AND move_percent {"> 0" if up else "< 0"}
+    ORDER BY move_percent {"DESC" if up else "ASC"}
+    LIMIT :limit
+    """
+    with connect(db_path) as conn:
+        date = date or conn.execute("SELECT MAX(trading_date) FROM trading_days").fetchone()[0]
+        if date is None:
+            return []
+        rows = conn.execute(sql, {"date": date, "start": start_date, "days": days, "limit": limit}).fetchall()
+    return [dict(row) for row in rows]
+
+
+def week_movers(date=None, limit=DEFAULT_LIMIT, db_path=DB_PATH):
+    """date 所在那一周（周一到 date）涨 / 跌最多的股票，返回 (涨幅榜, 跌幅榜)"""
+    date = date or latest_date(db_path)
+    if date is None:
+        return [], []
+    day = date_cls.fromisoformat(date)
+    monday = (day - timedelta(days=day.weekday())).isoformat()
+    gainers = moves(date=date, start_date=monday, limit=limit, db_path=db_path)
+    losers = moves(date=date, start_date=monday, limit=limit, up=False, db_path=db_path)
+    return gainers, losers
+
+
+# ---------- 命令行 ----------
+def _print_moves(title, rows):
+    print(title)
+    for i, row in enumerate(rows, 1):
+        print(f"  {i:>2}. {row['name']:<40} {row['move_percent']:+8.2f}%  "
+              f"({row['first_date']} ~ {row['last_date']}，出现 {row['days']} 天)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="美股历史数据库")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("import", help="导入 stock_snapshots/ 里已有的快照")
+    p = sub.add_parser("streaks", help="连涨 / 连跌")
+    p.add_argument("--date")
+    p.add_argument("--min-days", type=int, default=3)
+    p.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    p = sub.add_parser("moves", help="最近 N 个交易日累计涨跌幅")
+    p.add_argument("--date")
+    p.add_argument("--days", type=int, default=5)
+    p.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    p = sub.add_parser("week", help="本周涨 / 跌最多")
+    p.add_argument("--date")
+    p.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        days, total = import_snapshots()
+        print(f"✅ 已导入 {days} 个交易日，共 {total} 条记录 -> {DB_PATH}")
+    elif args.command == "streaks":
+        for row in streaks(args.date, args.min_days, args.limit):
+            arrow = "📈 连涨" if row["is_up"] else "📉 连跌"
+            print(f"  {arrow} {row['days']} 天  {row['name']:<40} {row['move_percent']:+8.2f}%  (自 {row['start_date']})")
+    elif args.command == "moves":
+        _print_moves(f"📈 最近 {args.days} 个交易日涨幅榜", moves(args.days, args.date, limit=args.limit))
+        _print_moves(f"📉 最近 {args.days} 个交易日跌幅榜", moves(args.days, args.date, limit=args.limit, up=False))
+    elif args.command == "week":
+        gainers, losers = week_movers(args.date, args.limit)
+        _print_moves("📈 本周涨幅榜", gainers)
+        _print_moves("📉 本周跌幅榜", losers)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
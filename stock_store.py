@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+美股数据快照存储
+每个交易日一个 JSON 文件（stock_snapshots/YYYY-MM-DD.json），取代自动生成的 data_stock.py。
+读取时按需加载、按文件修改时间缓存，不再需要 import / importlib.reload。
+
+用法：
+    import stock_store
+    snapshot = stock_store.load_latest()
+    snapshot.up                      # 上涨股票记录（已按涨幅排序）
+    snapshot.stock_content_formatted # 图片专用 - 详细数据
+    snapshot.stock_data              # 兼容旧 data_stock.stock_data 的字典
+"""
+
+import os
+import re
+import json
+from dataclasses import dataclass, field, asdict
+
+# ================= 配置区 =================
+STORE_DIR = "stock_snapshots"
+LATEST_FILE = "LATEST"          # 记录最新交易日的指针文件
+SCHEMA_VERSION = 1
+DEFAULT_TOPICS = ["纳斯达克", "未来科技趋势", "投资理财", "我的理财日记", "纳指"]
+# ==========================================
+
+_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+# 路径 -> (mtime_ns, StockSnapshot)
+_cache = {}
+
+
+@dataclass(frozen=True)
+class StockRecord:
+    name: str
+    change_percent: float   # 下跌为负数
+    previous_close: float
+    price: float
+    is_up: bool
+
+
+@dataclass
+class StockSnapshot:
+    date: str
+    records: list = field(default_factory=list)   # 上涨（按涨幅降序）在前，下跌（按跌幅降序）在后
+    topics: list = field(default_factory=lambda: list(DEFAULT_TOPICS))
+    source: str = "ph-mcp-server"
+
+    @property
+    def up(self):
+        return [r for r in self.records if r.is_up]
+
+    @property
+    def down(self):
+        return [r for r in self.records if not r.is_up]
+
+    # ---------- 派生的文本格式（与旧 data_stock.py 完全一致） ----------
+    @property
+    def stock_list_text(self):
+        return build_list_text(self.up)
+
+    @property
+    def stock_content_formatted(self):
+        return build_content_text(self.up, self.down)
+
+    @property
+    def up_list(self):
+        return [line for line in self.stock_list_text.strip().split('\n') if line.strip()]
+
+    @property
+    def down_list(self):
+        return [format_content_line(r) for r in self.down]
+
+    @property
+    def stock_data(self):
+        return {
+            "date_str": self.date,
+            "up_list": self.up_list,
+            "down_list": self.down_list,
+            "stock_content_formatted": self.stock_content_formatted,
+            "TOPICS": list(self.topics),
+        }
+
+
+# ---------- 文本格式 ----------
+# 按字段格式化（stock_table 的列式数据直接调用，不用先拼成 StockRecord）
+def list_line(index, name, change_percent):
+    """发布专用：1. 公司名 : +涨幅% (极简)"""
+    return f"{index}. {name} : +{change_percent:.2f}%"
+
+
+def content_line(name, change_percent, previous_close, price, is_up):
+    """图片专用：📈 公司名 +涨幅% (旧价格->新价格)"""
+    if is_up:
+        return f"📈 {name} +{change_percent:.2f}% ({previous_close:.2f}->{price:.2f})"
+    # 下跌的 change_percent 已经是负数
+    return f"📉 {name} {change_percent:.2f}% ({previous_close:.2f}->{price:.2f})"
+
+
+def format_list_line(index, record):
+    return list_line(index, record.name, record.change_percent)
+
+
+def format_content_line(record):
+    return content_line(record.name, record.change_percent, record.previous_close, record.price, record.is_up)
+
+
+def build_list_text(up_records):
+    return "\n".join(format_list_line(i, r) for i, r in enumerate(up_records, 1))
+
+
+def build_content_text(up_records, down_records):
+    lines = []
+    for record in list(up_records) + list(down_records):
+        lines.append(format_content_line(record))
+        lines.append("")  # 空行
+    return "\n".join(lines)
+
+
+# ---------- 读写 ----------
+def _snapshot_path(date, store_dir):
+    if not _DATE_RE.match(date):
+        raise ValueError(f"交易日期格式错误: {date!r}，应为 YYYY-MM-DD")
+    return os.path.join(store_dir, f"{date}.json")
+
+
+def _atomic_write(path, text):
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def save_snapshot(snapshot, store_dir=STORE_DIR):
+    """写入某个交易日的快照，并把 LATEST 指向它，返回文件路径"""
+    os.makedirs(store_dir, exist_ok=True)
+    path = _snapshot_path(snapshot.date, store_dir)
+    payload = {
+        "version": SCHEMA_VERSION,
+        "date": snapshot.date,
+        "source": snapshot.source,
+        "topics": list(snapshot.topics),
+        "records": [asdict(r) for r in snapshot.records],
+    }
+    _atomic_write(path, json.dumps(payload, ensure_ascii=False, indent=1))
+    _atomic_write(os.path.join(store_dir, LATEST_FILE), snapshot.date)
+    return path
+
+
+def load_snapshot(date, store_dir=STORE_DIR):
+    """读取某个交易日的快照（按文件修改时间缓存）"""
+    path = _snapshot_path(date, store_dir)
+    mtime = os.stat(path).st_mtime_ns
+    cached = _cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    if payload.get("version") != SCHEMA_VERSION:
+        raise ValueError(f"不支持的快照版本: {payload.get('version')}")
+
+    snapshot = StockSnapshot(
+        date=payload["date"],
+        records=[StockRecord(**r) for r in payload["records"]],
+        topics=payload.get("topics", DEFAULT_TOPICS),
+        source=payload.get("source", "ph-mcp-server"),
+    )
+    _cache[path] = (mtime, snapshot)
+    return snapshot
+
+
+def list_dates(store_dir=STORE_DIR):
+    """已保存的交易日（升序）"""
+    if not os.path.isdir(store_dir):
+        return []
+    return sorted(name[:-5] for name in os.listdir(store_dir)
+                  if name.endswith(".json") and _DATE_RE.match(name[:-5]))
+
+
+def latest_date(store_dir=STORE_DIR):
+    pointer = os.path.join(store_dir, LATEST_FILE)
+    if os.path.exists(pointer):
+        with open(pointer, "r", encoding="utf-8") as f:
+            date = f.read().strip()
+        if date and os.path.exists(_snapshot_path(date, store_dir)):
+            return date
+    dates = list_dates(store_dir)
+    return dates[-1] if dates else None
+
+
+def load_latest(store_dir=STORE_DIR):
+    """读取最新快照；没有任何快照时抛出 FileNotFoundError"""
+    date = latest_date(store_dir)
+    if date is None:
+        raise FileNotFoundError(f"{store_dir}/ 下没有美股快照，请先运行 fetch_stock_data.py")
+    return load_snapshot(date, store_dir)
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+列式美股数据表
+get_latest_stock_news 的所有新闻正文拼成一段文本，用一个预编译的正则一次扫完，
+结果按列存放（名字编号 / 涨跌幅 / 昨收 / 现价 / 涨跌方向），不再为每只股票建 dict。
+去重（同名保留 |涨跌幅| 最大的一条）和排序直接在整列上做：装了 numpy（可选依赖）时用 lexsort / argsort，
+取前 N 名用 argpartition；没装时退回 array 列 + 内置排序，结果完全一致。
+全市场上万只股票，去重和排序过程中也不会为每一行创建 Python 对象。
+
+解析规则、去重和排序结果与原来 fetch_stock_data 逐行 re.search + 按 dict 去重排序的结果完全一致。
+
+用法：
+    import stock_table
+    table = stock_table.parse_news(stock_news["news"])
+    ranked = table.ranked()          # 去重 + 排序：上涨（涨幅降序）在前，下跌（跌幅降序）在后
+    ranked.content_text()            # 图片专用 - 详细数据
+    ranked.top(3)                    # 涨幅前 3 名
+"""
+
+import os
+import re
+from array import array
+from itertools import compress
+
+import stock_store
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# ================= 配置区 =================
+# 设为 off 时即使装了 numpy 也使用纯 Python 实现
+USE_NUMPY = np is not None and os.environ.get("AUTOSHARE_NUMPY", "on").lower() != "off"
+# ==========================================
+
+# 与原来逐行解析用的正则相同，只是把 \s 换成「除换行外的空白」：整段文本一起扫描时匹配不会跨行，
+# 每行再只取第一个匹配，效果等同于逐行 re.search
+_WS = r"[^\S\n]"
+_LINE_RE = re.compile(
+    rf"([📈📉]){_WS}*(?:本周{_WS}+)?(.+?){_WS}+"
+    rf"(?:涨了，涨了|咔咔涨，一下|跌了,?{_WS}*跌了|咔咔跌,{_WS}*一下){_WS}+"
+    rf"([\d.]+)%,{_WS}*从{_WS}+([\d.]+){_WS}+(?:涨到|跌到){_WS}+([\d.]+)"
+)
+
+
+COLUMNS = ("name_id", "change", "previous", "price", "is_up")
+
+
+def _view(column):
+    """array 列的 numpy 零拷贝视图（dtype 由 array 的 typecode 决定）"""
+    return np.asarray(memoryview(column))
+
+
+class StockTable:
+    """
+    按列存放的股票数据，每一行是一条解析结果。
+    names 里每个名字只存一次，name_id 是它第一次出现的顺序；其余列用 array 存放（numpy 可零拷贝读取）。
+    """
+
+    def __init__(self, names=None):
+        self.names = names if names is not None else []
+        self.name_id = array("q")
+        self.change = array("d")     # 涨跌幅，下跌为负数
+        self.previous = array("d")
+        self.price = array("d")
+        self.is_up = array("b")
+
+    def __len__(self):
+        return len(self.change)
+
+    def _take(self, rows):
+        """按行号取出子表（保留行号给定的顺序），names 共用"""
+        table = StockTable(self.names)
+        for column in COLUMNS:
+            source = getattr(self, column)
+            if USE_NUMPY:
+                taken = array(source.typecode)
+                taken.frombytes(_view(source)[rows].tobytes())
+            else:
+                taken = array(source.typecode, [source[i] for i in rows])
+            setattr(table, column, taken)
+        return table
+
+    # ---------- 去重 + 排序 ----------
+    def _winners(self):
+        """每个名字保留 |涨跌幅| 最大的一行（相同时保留先出现的），按名字第一次出现的顺序返回行号"""
+        if USE_NUMPY:
+            ids = _view(self.name_id)
+            magnitude = np.abs(_view(self.change))
+            # 主键名字编号，其次 |涨跌幅| 降序，再次行号：每组的第一行就是要保留的
+            order = np.lexsort((np.arange(len(ids)), -magnitude, ids))
+            first = np.ones(len(order), dtype=bool)
+            first[1:] = ids[order[1:]] != ids[order[:-1]]
+            return order[first]
+        best = {}
+        change = self.change
+        for row, name_id in enumerate(self.name_id):
+            kept = best.get(name_id)
+            if kept is None or abs(change[row]) > abs(change[kept]):
+                best[name_id] = row
+        return list(best.values())
+
+    def _rank(self, rows, up):
+        """上涨按涨幅降序，下跌按跌幅降序（涨跌幅升序）；相同时保持 rows 原来的顺序"""
+        if USE_NUMPY:
+            values = _view(self.change)[rows]
+            return rows[np.argsort(-values if up else values, kind="stable")]
+        return sorted(rows, key=self.change.__getitem__, reverse=up)
+
+    def ranked(self):
+        """去重并排序后的新表：上涨在前，下跌在后（与旧 format_stock_data 的顺序一致）"""
+        rows = self._winners()
+        if USE_NUMPY:
+            up_mask = _view(self.is_up)[rows] != 0
+            order = np.concatenate([self._rank(rows[up_mask], True), self._rank(rows[~up_mask], False)])
+            return self._take(order)
+        is_up = self.is_up
+        ups = [r for r in rows if is_up[r]]
+        downs = [r for r in rows if not is_up[r]]
+        return self._take(self._rank(ups, True) + self._rank(downs, False))
+
+    def top(self, n, up=True):
+        """
+        涨幅（up=True）或跌幅前 n 名的行号，顺序与 ranked() 一致。
+        numpy 下用 argpartition 只挑出前 n 名再排序，不对整列排序。
+        """
+        rows = self._winners()
+        if USE_NUMPY:
+            rows = rows[(_view(self.is_up)[rows] != 0) == up]
+            if n >= len(rows):
+                return self._rank(rows, up).tolist()
+            if n <= 0:
+                return []
+            keys = _view(self.change)[rows]
+            keys = -keys if up else keys
+            cutoff = np.partition(keys, n - 1)[n - 1]
+            # 比分界值好的全部入选，与分界值相等的按原顺序补足 n 个（和完整排序的结果一致）
+            ties = rows[keys == cutoff][:n - int((keys < cutoff).sum())]
+            return self._rank(np.concatenate([rows[keys < cutoff], ties]), up).tolist()
+        rows = [r for r in rows if bool(self.is_up[r]) == up]
+        return self._rank(rows, up)[:max(n, 0)]
+
+    # ---------- 计数 ----------
+    def count_up(self):
+        if USE_NUMPY:
+            return int(np.count_nonzero(_view(self.is_up)))
+        return sum(self.is_up)
+
+    def count_down(self):
+        return len(self) - self.count_up()
+
+    # ---------- 输出 ----------
+    def row(self, i):
+        return (self.names[self.name_id[i]], self.change[i], self.previous[i], self.price[i], bool(self.is_up[i]))
+
+    def _name_column(self):
+        names = self.names
+        return map(names.__getitem__, self.name_id)
+
+    def rows(self):
+        """按行遍历 (name, change_percent, previous_close, price, is_up)"""
+        return zip(self._name_column(), self.change, self.previous, self.price, map(bool, self.is_up))
+
+    def records(self):
+        """转换成 stock_store.StockRecord 列表：只在写快照 JSON / 历史库时用（两者都按记录存储）"""
+        return [stock_store.StockRecord(*row) for row in self.rows()]
+
+    def list_text(self):
+        """发布专用：上涨股票的极简列表（与 StockSnapshot.stock_list_text 一致），直接按列格式化"""
+        ups = self.is_up
+        names = compress(self._name_column(), ups)
+        changes = compress(self.change, ups)
+        return "\n".join(map(stock_store.list_line, range(1, len(self) + 1), names, changes))
+
+    def content_text(self):
+        """图片专用：每行一只股票、行间空一行（与 StockSnapshot.stock_content_formatted 一致），直接按列格式化"""
+        lines = map(stock_store.content_line, self._name_column(), self.change, self.previous, self.price,
+                    map(bool, self.is_up))
+        return "\n\n".join(lines) + "\n" if len(self) else ""
+
+
+def parse_text(text):
+    """
+    一次扫描整段文本 -> StockTable（未去重）；每行只取第一个匹配，与逐行 re.search 一致。
+    匹配结果直接追加到各列，不为每行建中间对象。
+    """
+    table = StockTable()
+    ids = {}
+    name_id, is_up, change, previous, price = table.name_id, table.is_up, table.change, table.previous, table.price
+    line_end = -1
+    for match in _LINE_RE.finditer(text):
+        start = match.start()
+        if start < line_end:
+            continue
+        line_end = text.find("\n", match.end())
+        if line_end < 0:
+            line_end = len(text)
+        # 下跌行里出现「涨」字时按上涨处理（旧逻辑检查的是整行）
+        up = match[1] == "📈" or "涨" in text[text.rfind("\n", 0, start) + 1:line_end]
+        name_id.append(ids.setdefault(match[2].strip(), len(ids)))
+        is_up.append(up)
+        change.append(float(match[3]) if up else -float(match[3]))
+        previous.append(float(match[4]))
+        price.append(float(match[5]))
+    table.names = list(ids)
+    return table
+
+
+def parse_news(news):
+    """get_latest_stock_news 返回的 news 列表 -> StockTable（未去重）"""
+    return parse_text("\n".join(content for content in (item.get("content", "") for item in news) if content))
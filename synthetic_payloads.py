@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+合成测试数据
+按真实格式批量生成 Product Hunt 长文、GitHub Trending 日报和美股新闻，供基准测试和本地联调使用。
+同一个 (size, seed) 每次生成的内容完全一致。
+
+用法：
+    import synthetic_payloads as sp
+    md = sp.ph_article_markdown(100)          # data.article_content_formatted 格式
+    report = sp.github_report_markdown(500)   # get_github_trending_report 的 markdown_content
+    news = sp.stock_news_payload(1000)        # get_latest_stock_news 的返回值
+"""
+
+import random
+from datetime import date, timedelta
+
+# ================= 配置区 =================
+DEFAULT_SEED = 42
+BENCH_SIZES = [20, 100, 500, 1000, 5000]
+# ==========================================
+
+_WORDS = ["Nova", "Pixel", "Flow", "Quant", "Echo", "Orbit", "Lumen", "Vertex", "Atlas", "Pulse",
+          "Forge", "Drift", "Spark", "Delta", "Prism", "Cortex", "Bolt", "Mosaic", "Zen", "Kite"]
+_SUFFIXES = ["AI", "Studio", "Labs", "Hub", "Kit", "OS", "Cloud", "Agent", "Notes", "Desk"]
+_CATEGORIES = ["效率工具", "开发者工具", "人工智能", "设计工具", "生产力", "营销", "金融科技", "健康"]
+_TAGLINES = ["让团队协作像聊天一样简单", "用 AI 自动整理你的收件箱", "几分钟内搭建可上线的应用",
+             "把会议记录变成可执行的任务", "为独立开发者准备的一站式工具箱", "实时监控你的云成本"]
+_SENTENCES = ["它把常见的重复操作自动化，帮你节省大量时间。", "支持与主流办公软件无缝集成。",
+              "内置的智能助手可以理解自然语言指令。", "界面简洁，上手几乎没有学习成本。",
+              "提供免费的个人版和面向团队的付费方案。", "所有数据都在本地加密保存。"]
+_LANGS = ["Python", "TypeScript", "Rust", "Go", "JavaScript", "C++", "Java", "Kotlin", "Swift"]
+_COMPANY_TAILS = ["Inc.", "Corporation", "Holdings, Inc.", "Technologies Inc.", "Ltd.", "N.V.", "Platforms, Inc."]
+
+
+def _name(rng, index, parts=2):
+    words = [rng.choice(_WORDS) for _ in range(parts - 1)] + [rng.choice(_SUFFIXES)]
+    # 带上序号保证名字唯一（解析逻辑按名字去重）
+    return f"{''.join(words)}{index}"
+
+
+# ---------- Product Hunt ----------
+def ph_products(size, seed=DEFAULT_SEED):
+    """get_latest_products 返回的产品列表"""
+    rng = random.Random(seed)
+    products = []
+    for i in range(size):
+        products.append({
+            "rank": i + 1,
+            "name": _name(rng, i + 1),
+            "tagline": rng.choice(_TAGLINES),
+            "category": rng.choice(_CATEGORIES),
+            "votes_count": rng.randint(50, 3000),
+            "description": "".join(rng.choice(_SENTENCES) for _ in range(rng.randint(1, 4))),
+            "url": f"https://www.producthunt.com/posts/product-{i + 1}",
+        })
+    return products
+
+
+def ph_api_payload(size, seed=DEFAULT_SEED, day=None):
+    day = day or date.today() - timedelta(days=1)
+    products = ph_products(size, seed)
+    return {"date": day.isoformat(), "total_count": len(products), "products": products}
+
+
+def ph_article_markdown(size, seed=DEFAULT_SEED):
+    """data.article_content_formatted 格式（见 MASTER_WORKFLOW：灰色数据行与简介之间空一行）"""
+    blocks = []
+    for p in ph_products(size, seed):
+        blocks.append(
+            f"## {p['name']}\n"
+            f"**{p['tagline']}**\n"
+            f"> 分类：{p['category']} | 投票数：{p['votes_count']} 👍\n"
+            f"\n"
+            f"{p['description']}\n"
+        )
+    return "\n".join(blocks)
+
+
+# ---------- GitHub Trending ----------
+def github_repos(size, seed=DEFAULT_SEED):
+    rng = random.Random(seed)
+    repos = []
+    for i in range(size):
+        owner = rng.choice(_WORDS).lower() + str(rng.randint(1, 99))
+        repos.append({
+            "rank": i + 1,
+            "name": f"{owner}/{_name(rng, i + 1).lower()}",
+            "stars": f"{rng.randint(100, 200000):,}",
+            "pr": str(rng.randint(0, 500)),
+            "lang": rng.choice(_LANGS),
+            "desc": rng.choice(_SENTENCES),
+        })
+    return repos
+
+
+def github_report_markdown(size, seed=DEFAULT_SEED, new_count=None, dropped_count=None):
+    """get_github_trending_report 的 markdown_content：新上榜 / 跌出榜 / 今日榜单"""
+    rng = random.Random(seed + 1)
+    repos = github_repos(size, seed)
+    new_count = min(size, max(1, size // 10)) if new_count is None else new_count
+    dropped_count = new_count if dropped_count is None else dropped_count
+
+    lines = [f"# GitHub Trending 日报 {date.today().isoformat()}", ""]
+    lines += ["## 🆕 新上榜", ""]
+    for repo in sorted(rng.sample(repos, new_count), key=lambda r: r["rank"]):
+        lines.append(f"- #{repo['rank']} {repo['name']}")
+    lines += ["", "## 📉 跌出榜", ""]
+    for i in range(dropped_count):
+        lines.append(f"- {rng.choice(_WORDS).lower()}/{_name(rng, size + i + 1).lower()}")
+    lines += ["", "## 📊 今日榜单", ""]
+    for repo in repos:
+        lines += [
+            f"### #{repo['rank']} {repo['name']}",
+            f"⭐ {repo['stars']} | PR: {repo['pr']} | {repo['lang']}",
+            f"**简介**: {repo['desc']}",
+            "",
+        ]
+    return "\n".join(lines)
+
+
+# ---------- 美股 ----------
+def stock_lines(size, seed=DEFAULT_SEED):
+    """📈 XXX 咔咔涨，一下 X%, 从 A 涨到 B / 📉 XXX 咔咔跌, 一下 X%, 从 A 跌到 B"""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(size):
+        name = f"{_name(rng, i + 1, parts=1)} {rng.choice(_COMPANY_TAILS)}"
+        old = round(rng.uniform(1, 900), 3)
+        pct = round(rng.uniform(3, 15), 3)
+        if rng.random() < 0.7:
+            new = round(old * (1 + pct / 100), 3)
+            lines.append(f"📈 {name} 咔咔涨，一下 {pct:.3f}%, 从 {old:.3f} 涨到 {new:.3f}")
+        else:
+            new = round(old * (1 - pct / 100), 3)
+            lines.append(f"📉 {name} 咔咔跌, 一下 {pct:.3f}%, 从 {old:.3f} 跌到 {new:.3f}")
+    return lines
+
+
+def stock_news_payload(size, seed=DEFAULT_SEED, chunk=25, duplicate_ratio=0.1, day=None):
+    """
+    get_latest_stock_news 的返回值：每条新闻 chunk 行，
+    并按 duplicate_ratio 重复一部分股票（真实数据里同一只股票会出现在多条新闻中）。
+    """
+    rng = random.Random(seed + 2)
+    lines = stock_lines(size, seed)
+    lines += rng.sample(lines, int(size * duplicate_ratio))
+    rng.shuffle(lines)
+    news = [{"content": "\n".join(lines[i:i + chunk])} for i in range(0, len(lines), chunk)]
+    day = (day or date.today() - timedelta(days=1)).isoformat()
+    return {"date": day, "trading_date": day, "news_count": len(news), "news": news}
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Jinja 模板注册表
+进程内只有一个 Environment：文件模板编译一次，之后只在文件修改时间变化时重新编译；
+内联模板（例如 gen_cover_github.HTML_TEMPLATE）按源码哈希缓存编译结果。
+可选的磁盘字节码缓存（.jinja_cache/）让新进程也不用重新编译文件模板。
+
+用法：
+    import template_registry
+    html = template_registry.render("stock_article.html", pages=pages, layout=layout)
+    template = template_registry.from_string(HTML_TEMPLATE)
+    source = template_registry.template_source("cover_template.html")   # 参与渲染缓存键
+"""
+
+import os
+import hashlib
+import threading
+
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+
+# ================= 配置区 =================
+# 按顺序查找：根目录（PH 封面 / 长图模板）、templates/（美股模板）
+SEARCH_PATH = [".", "templates"]
+BYTECODE_CACHE_DIR = os.environ.get("AUTOSHARE_JINJA_CACHE_DIR", ".jinja_cache")
+# 设为 off 关闭磁盘字节码缓存
+BYTECODE_CACHE_ENABLED = os.environ.get("AUTOSHARE_JINJA_CACHE", "on").lower() != "off"
+MAX_INLINE_TEMPLATES = 64   # 内联模板缓存的最大条数
+# ==========================================
+
+_env = None
+_lock = threading.Lock()
+_inline = {}      # sha256(源码) -> Template
+_sources = {}     # 模板名 -> (mtime_ns, 文件路径, 源码)
+
+
+def get_environment():
+    """共享的 Environment（auto_reload：每次取模板时检查修改时间，未变化就直接用已编译的版本）"""
+    global _env
+    with _lock:
+        if _env is None:
+            bytecode_cache = None
+            if BYTECODE_CACHE_ENABLED:
+                os.makedirs(BYTECODE_CACHE_DIR, exist_ok=True)
+                bytecode_cache = FileSystemBytecodeCache(BYTECODE_CACHE_DIR)
+            _env = Environment(
+                loader=FileSystemLoader(SEARCH_PATH),
+                auto_reload=True,
+                bytecode_cache=bytecode_cache,
+            )
+        return _env
+
+
+def get_template(name):
+    return get_environment().get_template(name)
+
+
+def from_string(source):
+    """编译内联模板；同样的源码只编译一次"""
+    key = hashlib.sha256(source.encode("utf-8")).hexdigest()
+    template = _inline.get(key)
+    if template is None:
+        template = get_environment().from_string(source)
+        with _lock:
+            if len(_inline) >= MAX_INLINE_TEMPLATES:
+                _inline.pop(next(iter(_inline)))
+            _inline[key] = template
+    return template
+
+
+def render(name, **context):
+    return get_template(name).render(**context)
+
+
+def render_string(source, **context):
+    return from_string(source).render(**context)
+
+
+def template_source(name):
+    """文件模板的源码（按修改时间缓存），用于计算渲染缓存键"""
+    cached = _sources.get(name)
+    if cached:
+        mtime, filename, source = cached
+        if os.stat(filename).st_mtime_ns == mtime:
+            return source
+    env = get_environment()
+    source, filename, _ = env.loader.get_source(env, name)
+    _sources[name] = (os.stat(filename).st_mtime_ns, filename, source)
+    return source
+
+
+def clear():
+    """清空内存中的编译结果（磁盘字节码缓存不受影响）"""
+    global _env
+    with _lock:
+        _env = None
+        _inline.clear()
+        _sources.clear()
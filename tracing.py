@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+轻量级阶段追踪
+用 span 记录每一段工作的墙钟时间、CPU 时间和进程峰值内存（RSS），
+每次运行结束写出一份 Chrome trace-event 格式的 JSON（chrome://tracing 或 https://ui.perfetto.dev 打开）。
+
+用法：
+    import tracing
+
+    with tracing.span("ph.layout", cat="layout", blocks=20):
+        ...
+
+    @tracing.traced("github.parse", cat="parse")
+    def parse(...):
+        ...
+
+入口脚本在 __main__ 里调用 tracing.setup(sys.argv[1:]) 开启追踪：
+    python main.py                          # 写出 traces/trace_<时间>_<pid>.json
+    python run_all.py --profile             # 每个流水线阶段都套一层 cProfile
+    python run_all.py --profile=ph.slides   # 只分析指定阶段（逗号分隔）
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import pstats
+import atexit
+import cProfile
+import threading
+from contextlib import ContextDecorator
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，峰值内存记为 0
+    resource = None
+
+# ================= 配置区 =================
+TRACE_DIR = "traces"
+# 设为 off 关闭追踪（不记录 span，也不写 trace 文件）
+TRACE_ENV = "AUTOSHARE_TRACE"
+PROFILE_TOP_N = 25        # cProfile 报告打印的函数条数
+# ==========================================
+
+# span 分类：fetch / parse / audit / layout / render / screenshot / encode / browser，
+# 流水线阶段统一用 "stage"，--profile 只作用于 stage
+STAGE = "stage"
+
+_lock = threading.Lock()
+_events = []
+_thread_names = {}
+_enabled = False
+_profile_all = False
+_profile_names = set()
+_origin = time.perf_counter()
+_local = threading.local()
+# 同一进程同时只能有一个 cProfile 在运行（Python 3.12+ 基于 sys.monitoring，第二个 enable() 会抛 ValueError），
+# 并发的阶段拿不到这把锁时不做 profile，只记录 span
+_profile_lock = threading.Lock()
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位是 KB，macOS 是字节
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _should_profile(name, cat):
+    if cat != STAGE or getattr(_local, "profiler", None) is not None:
+        return False
+    return _profile_all or name in _profile_names
+
+
+class span(ContextDecorator):
+    """记录一段工作；既可以 with tracing.span(...)，也可以当装饰器用"""
+
+    def __init__(self, name, cat="general", **args):
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def _recreate_cm(self):
+        # 作为装饰器时每次调用用新实例，多线程同时调用也不会互相覆盖计时
+        return span(self.name, self.cat, **self.args)
+
+    def __enter__(self):
+        if not _enabled:
+            return self
+        self._profiler = None
+        if _should_profile(self.name, self.cat):
+            self._profiler = _start_profiler(self.name)
+        self._rss_start = _peak_rss_mb()
+        self._cpu_start = time.thread_time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not _enabled or not hasattr(self, "_start"):
+            return False
+        end = time.perf_counter()
+        cpu = time.thread_time() - self._cpu_start
+        rss = _peak_rss_mb()
+        if self._profiler is not None:
+            _stop_profiler(self.name, self._profiler)
+
+        thread = threading.current_thread()
+        args = dict(self.args)
+        args.update({
+            "wall_ms": round((end - self._start) * 1000, 3),
+            "cpu_ms": round(cpu * 1000, 3),
+            "peak_rss_mb": round(rss, 1),
+            "rss_growth_mb": round(rss - self._rss_start, 1),
+        })
+        if exc_type is not None:
+            args["error"] = f"{exc_type.__name__}: {exc}"
+        event = {
+            "name": self.name,
+            "cat": self.cat,
+            "ph": "X",
+            "ts": round((self._start - _origin) * 1e6, 1),
+            "dur": round((end - self._start) * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": thread.ident,
+            "args": args,
+        }
+        with _lock:
+            _events.append(event)
+            _thread_names.setdefault(thread.ident, thread.name)
+        return False
+
+
+def traced(name=None, cat="general", **args):
+    """装饰器形式：name 缺省时用函数的 模块.函数名"""
+    def decorator(func):
+        span_name = name or f"{func.__module__}.{func.__name__}"
+        return span(span_name, cat, **args)(func)
+    return decorator
+
+
+def _start_profiler(name):
+    """拿到进程级的 profile 锁并启动 cProfile；已有其他阶段在 profile 时返回 None（跳过）"""
+    if not _profile_lock.acquire(blocking=False):
+        print(f"⚠️ [{name}] 其他阶段正在 profile，本阶段跳过（同一进程只能有一个 cProfile）")
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # 其他工具（调试器、coverage 等）占用了 profiler
+        _profile_lock.release()
+        print(f"⚠️ [{name}] 无法启动 cProfile ({e})，本阶段跳过")
+        return None
+    _local.profiler = profiler
+    return profiler
+
+
+def _stop_profiler(name, profiler):
+    """停止 cProfile 并释放锁；写报告失败也不会让 profiler 或锁残留"""
+    try:
+        profiler.disable()
+    finally:
+        _local.profiler = None
+        _profile_lock.release()
+    _dump_profile(name, profiler)
+
+
+def _dump_profile(name, profiler):
+    os.makedirs(TRACE_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    path = os.path.join(TRACE_DIR, f"profile_{name}_{stamp}.prof")
+    profiler.dump_stats(path)
+
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+    print(f"\n🔬 [{name}] cProfile（按累计时间，前 {PROFILE_TOP_N} 项），完整数据：{path}")
+    print(out.getvalue())
+
+
+def events():
+    """已记录的 span（副本）"""
+    with _lock:
+        return list(_events)
+
+
+def write_trace(path=None):
+    """写出 Chrome trace-event JSON，返回文件路径；没有任何 span 时返回 None"""
+    with _lock:
+        recorded = list(_events)
+        names = dict(_thread_names)
+    if not recorded:
+        return None
+
+    if path is None:
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(TRACE_DIR, f"trace_{stamp}_{os.getpid()}.json")
+
+    pid = os.getpid()
+    metadata = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0,
+                 "args": {"name": os.path.basename(sys.argv[0]) or "python"}}]
+    for tid, thread_name in names.items():
+        metadata.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                         "args": {"name": thread_name}})
+
+    payload = {"traceEvents": metadata + sorted(recorded, key=lambda e: e["ts"]),
+               "displayTimeUnit": "ms"}
+    tmp_path = f"{path}.tmp.{pid}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _write_at_exit():
+    path = write_trace()
+    if path:
+        print(f"🧭 运行追踪已写入：{path}（可用 chrome://tracing 或 ui.perfetto.dev 打开）")
+
+
+def setup(argv=None):
+    """
+    入口脚本调用：开启追踪并在进程退出时写出 trace。
+    支持 --profile（所有阶段）和 --profile=阶段1,阶段2；返回去掉这些开关后的参数列表。
+    """
+    global _enabled, _profile_all
+    rest = []
+    for arg in argv or []:
+        if arg == "--profile":
+            _profile_all = True
+        elif arg.startswith("--profile="):
+            _profile_names.update(n.strip() for n in arg.split("=", 1)[1].split(",") if n.strip())
+        else:
+            rest.append(arg)
+
+    if os.environ.get(TRACE_ENV, "on").lower() == "off":
+        return rest
+    if not _enabled:
+        _enabled = True
+        atexit.register(_write_at_exit)
+    return rest
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+每次运行独立的输出目录
+每条流水线的每次运行都有自己的目录 runs/<流水线>/<日期>/<运行编号>/，生成器把图片写到显式传入的目录里，
+不再往当前目录或固定的 stock_output/ 里写，也不用在开始前 glob 删除旧图：
+PH 和 GitHub 同时跑、或者同一条流水线补跑不同日期，都不会互相覆盖。
+
+运行成功后 publish() 把 runs/<流水线>/latest 原子地切换到这次的目录（先建临时符号链接再 rename），
+同时写一份 LATEST 指针文件（不支持符号链接的系统用它）；补跑更早的日期不会把 latest 指回旧数据。
+「读 LATEST → 比较日期 → 切换」整段持有 runs/<流水线>/.latest.lock 上的文件锁，多个进程同时发布也不会交错。
+
+用法：
+    import workspace
+    ws = workspace.create("stock", "2025-11-21")
+    generate(..., output_dir=ws.path)
+    ws.publish()
+    workspace.latest_path("stock")     # runs/stock/2025-11-21/153012-3fa9c1
+"""
+
+import os
+import re
+import secrets
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from dataclasses import dataclass
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# ================= 配置区 =================
+RUNS_DIR = os.environ.get("AUTOSHARE_RUNS_DIR", "runs")
+LATEST_LINK = "latest"
+LATEST_FILE = "LATEST"
+LOCK_FILE = ".latest.lock"
+# ==========================================
+
+_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class RunWorkspace:
+    pipeline: str
+    date: str       # YYYY-MM-DD
+    run_id: str
+    root: str = RUNS_DIR
+
+    @property
+    def relative(self):
+        """相对 runs/<流水线>/ 的路径，latest 指向它"""
+        return f"{self.date}/{self.run_id}"
+
+    @property
+    def path(self):
+        return os.path.abspath(os.path.join(self.root, self.pipeline, self.date, self.run_id))
+
+    def file(self, name):
+        return os.path.join(self.path, name)
+
+    def publish(self):
+        """把 latest 切换到这次运行的目录；已有更新日期的运行时不动 latest。返回是否切换"""
+        base = os.path.join(self.root, self.pipeline)
+        with _lock, _file_lock(os.path.join(base, LOCK_FILE)):
+            current = _read_pointer(base)
+            if current and current.split("/", 1)[0] > self.date:
+                return False
+            _atomic_write(os.path.join(base, LATEST_FILE), self.relative)
+            _swap_link(os.path.join(base, LATEST_LINK), os.path.join(self.date, self.run_id))
+        return True
+
+
+def new_run_id():
+    """时间 + 随机后缀，同一秒内启动的多次运行也不会撞名"""
+    return f"{datetime.now().strftime('%H%M%S')}-{secrets.token_hex(3)}"
+
+
+def create(pipeline, date=None, run_id=None, root=RUNS_DIR):
+    """新建一次运行的目录；date 默认今天"""
+    date = date or datetime.now().strftime("%Y-%m-%d")
+    if not _DATE_RE.match(date):
+        raise ValueError(f"日期格式错误: {date!r}，应为 YYYY-MM-DD")
+    ws = RunWorkspace(pipeline, date, run_id or new_run_id(), root)
+    os.makedirs(ws.path)   # 已存在说明运行编号冲突，直接报错而不是混写到别人的目录里
+    return ws
+
+
+def latest_path(pipeline, root=RUNS_DIR):
+    """某条流水线最近一次成功运行的目录；没有时返回 None"""
+    base = os.path.join(root, pipeline)
+    relative = _read_pointer(base)
+    if relative is None:
+        return None
+    return os.path.abspath(os.path.join(base, *relative.split("/")))
+
+
+@contextmanager
+def _file_lock(path):
+    """跨进程的排他锁（阻塞等待）；threading.Lock 只管得住同一进程里的线程"""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        else:
+            # msvcrt.locking 的 LK_LOCK 只重试 10 秒，锁住第一个字节，拿不到就继续等
+            while True:
+                try:
+                    msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    finally:
+        os.close(fd)
+
+
+def _read_pointer(base):
+    try:
+        with open(os.path.join(base, LATEST_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _atomic_write(path, text):
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _swap_link(link_path, target):
+    """新建临时符号链接后 rename 覆盖，读者看到的 latest 要么是旧目录、要么是新目录"""
+    tmp_path = f"{link_path}.tmp.{os.getpid()}"
+    try:
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        os.symlink(target, tmp_path, target_is_directory=True)
+        os.replace(tmp_path, link_path)
+    except OSError as e:
+        # Windows 默认没有建符号链接的权限，只用 LATEST 指针文件
+        print(f"⚠️ 无法更新 {link_path} 符号链接 ({e})，请以 {LATEST_FILE} 文件为准")